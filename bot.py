@@ -1,23 +1,22 @@
 # bot.py
-import logging
 from aiogram import Bot, Dispatcher
 from aiogram.client.bot import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage # <--- ИМПОРТИРУЙ ЭТО
 
-from config import API_TOKEN
+from config import API_TOKEN, TELEGRAM_API_SERVER
+from modules.logs import setup_logging
+
+# Уровень, формат и лимиты логов — в config.py (LOG_LEVEL, LOG_JSON, LOG_RATE_LIMITS)
+setup_logging()
 
-# Настройка логирования для отладки (можно INFO или DEBUG)
-logging.basicConfig(
-    level=logging.INFO, # Поставь DEBUG для максимальной детализации
-    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-)
-# Отключаем слишком подробные логи от http-клиента, если нужно
-# logging.getLogger('httpx').setLevel(logging.WARNING)
-# logging.getLogger('aiogram.client.session.aiohttp').setLevel(logging.WARNING)
 
+session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_SERVER)) if TELEGRAM_API_SERVER else None
 
 bot = Bot(
     token=API_TOKEN,
+    session=session,
     default=DefaultBotProperties(parse_mode="HTML")
 )
 
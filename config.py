@@ -3,15 +3,81 @@ from pathlib import Path
 BASE_DIR = Path(__file__).parent.resolve()
 
 API_TOKEN = ""
+# Адрес Bot API; пусто — официальный api.telegram.org (для нагрузочных тестов — фейковый сервер)
+TELEGRAM_API_SERVER = ""
+
+# Telegram id администраторов (служебные команды вроде /perf)
+ADMIN_IDS: list[int] = []
 
 BASE_DIR = Path(__file__).parent
 DB_PATH = BASE_DIR / "bot.db"
+ARCHIVE_DB_PATH = BASE_DIR / "bot_archive.db"  # сюда переезжают старые завершённые игры
 
 DUEL_WORDS_JSON = BASE_DIR / "data" / "duel_words.json"
 
+DATA_DIR = BASE_DIR / "data"
 CLUB_PLAYERS_JSON = BASE_DIR / "data" / "club_players.json"
 DUEL_WORDS_JSON = BASE_DIR / "data" / "duel_words.json"
 DUEL_PHOTOS_JSON = BASE_DIR / "data" / "duel_photos.json"
 SOLO_PLAYERS_JSON = BASE_DIR / "data" / "solo_players.json"
+FOOTLE_LIST_CSV = BASE_DIR / "data" / "footle_list.csv"
+
+SALAM_DIR = BASE_DIR / "salam"
+
+# Горячая перезагрузка данных из data/ (интервал опроса в секундах, 0 — выключено)
+DATA_RELOAD_INTERVAL = 5
+
+# Режим вебхука вместо long polling (python main.py сам выберет режим)
+USE_WEBHOOK = False
+WEBHOOK_BASE_URL = ""  # публичный https-адрес бота; пусто — setWebhook не вызывается (локальный тест)
+WEBHOOK_PATH = "/webhook"
+WEBHOOK_SECRET = ""  # X-Telegram-Bot-Api-Secret-Token; пусто — проверка выключена
+WEBAPP_HOST = "0.0.0.0"
+WEBAPP_PORT = 8080
+WEBHOOK_QUEUE_SIZE = 1000  # сколько апдейтов ждут обработки, дальше отвечаем 503
+WEBHOOK_WORKERS = 8  # сколько апдейтов обрабатываются одновременно
+
+# Шардирование чатов по процессам: 0 или 1 — один процесс, N — фронт + N воркеров
+SHARD_WORKERS = 0
+SHARD_VNODES = 64  # виртуальных узлов на воркер в кольце консистентного хэширования
+SHARD_REPORT_INTERVAL = 30  # как часто воркеры присылают отчёт о нагрузке, сек
+
+# Замеры хэндлеров (время, SQLite, Bot API) и отдача метрик в формате Prometheus
+PERF_ENABLED = True
+PERF_METRICS_HOST = "127.0.0.1"
+PERF_METRICS_PORT = 9100  # GET /metrics; 0 — без HTTP-эндпоинта (остаётся /perf); у шарда i порт + i
+
+# Индекс маршрутизации текстовых сообщений (modules/dispatch_index.py) вместо перебора фильтров
+DISPATCH_INDEX_ENABLED = True
+
+# Логирование (modules/logs.py): вывод в отдельном потоке, JSON по строке на запись
+LOG_LEVEL = "INFO"
+LOG_JSON = True  # False — прежний текстовый формат
+# Не больше N записей в секунду уровня INFO/DEBUG на логгер (и его дочерние); WARNING и выше — всегда
+LOG_RATE_LIMITS = {
+    "modules.club_connect": 50,
+    "aiogram.event": 20,
+}
+
+# Журнал событий партий (modules/game_log.py): события пишутся пачками, раз в N событий — снимок состояния
+GAME_LOG_FLUSH_INTERVAL = 0.5  # сек
+GAME_LOG_BATCH_SIZE = 200  # столько событий в очереди — пишем сразу, не дожидаясь интервала
+GAME_SNAPSHOT_EVERY = 10
+
+# Архивация завершённых игр (modules/archive.py)
+ARCHIVE_AFTER_DAYS = 30  # игры, закончившиеся раньше, уезжают в ARCHIVE_DB_PATH
+ARCHIVE_INTERVAL = 3600  # как часто запускать, сек; 0 — выключено
+ARCHIVE_BATCH_SIZE = 2000  # игр в одной транзакции
+
+# Фото игроков (modules/photos.py, modules/imaging.py): варианты сложности и размеры для Telegram
+PHOTO_CACHE_DIR = BASE_DIR / "photo_cache"  # кэш по хэшу содержимого, можно удалять целиком
+PHOTO_WORKERS = 2  # процессов для обработки картинок
+PHOTO_MAX_SIDE = 1280  # больше Telegram всё равно не покажет
+PHOTO_JPEG_QUALITY = 85
+PHOTO_PREBUILD = True  # собрать все варианты при старте (иначе — при первой отправке)
 
-SALAM_DIR = BASE_DIR / "salam"
\ No newline at end of file
+# Игра против бота в Club Connect (/ttt_ai, modules/ttt_ai.py)
+TTT_AI_KNOWLEDGE = 0.6  # вероятность, что бот вспомнит каждого подходящего игрока клетки (/ttt_ai 80 — 0.8)
+TTT_AI_HUMAN_KNOWLEDGE = 0.4  # то же для человека — как бот оценивает соперника
+TTT_AI_MOVE_DELAY = 1.0  # сек: пауза перед ходом бота, чтобы ход не появлялся мгновенно
+TTT_AI_WORKERS = 1  # процессов для решения сеток бота Club Connect
@@ -1,24 +1,66 @@
 # main.py
 import asyncio
-import logging
+
+from aiogram import Dispatcher
 
 from bot import bot, dp
+from config import USE_WEBHOOK, SHARD_WORKERS, PERF_ENABLED, DISPATCH_INDEX_ENABLED
+from modules import perf
+from modules.dispatch_index import dispatch_index
+from modules.data_registry import data_registry
+from modules.game_log import game_log
+from modules import archive
+from modules.photos import photo_pipeline
 from modules.start import router as start_router
+from modules.admin import router as admin_router
 from modules.footle import router as footle_router
 from modules.club_connect import router as ttt_router
 from modules.duel import router as duel_router
+from modules.quiz import router as quiz_router
 from modules.solo_guess import router as solo_guess_router
+from modules.rating import router as rating_router
+from modules.inline_search import router as inline_router
 
-logging.basicConfig(level=logging.WARNING)
 
-async def main():
-    dp.include_router(start_router)
-    dp.include_router(footle_router)
-    dp.include_router(solo_guess_router)
-    dp.include_router(ttt_router)
-    dp.include_router(duel_router)
+def setup_dispatcher(dispatcher: Dispatcher) -> Dispatcher:
+    """Подключает роутеры игр и служебные хуки. Порядок роутеров важен."""
+    dispatcher.include_router(start_router)
+    dispatcher.include_router(admin_router)
+    dispatcher.include_router(footle_router)
+    dispatcher.include_router(solo_guess_router)
+    dispatcher.include_router(ttt_router)
+    dispatcher.include_router(quiz_router)  # до дуэлей: ответы викторины забирает первым
+    dispatcher.include_router(duel_router)
+    dispatcher.include_router(inline_router)
+    # Последним: при первом запуске рейтинг переносится из game_history, которую заполняют дуэли и Club Connect
+    dispatcher.include_router(rating_router)
+    if DISPATCH_INDEX_ENABLED:
+        dispatch_index.setup(dispatcher)
+
+    dispatcher.startup.register(data_registry.start_watching)
+    dispatcher.shutdown.register(data_registry.stop_watching)
+    # Журнал партий поднимается раньше игровых роутеров: они восстанавливают игры из него
+    dispatcher.startup.register(game_log.start)
+    dispatcher.shutdown.register(game_log.stop)
+    dispatcher.startup.register(archive.start_archiver)
+    dispatcher.shutdown.register(archive.stop_archiver)
+    dispatcher.startup.register(photo_pipeline.start)
+    dispatcher.shutdown.register(photo_pipeline.stop)
+    if PERF_ENABLED:
+        perf.setup(dispatcher)
+    return dispatcher
 
+
+async def main():
+    setup_dispatcher(dp)
     await dp.start_polling(bot, skip_updates=True)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if SHARD_WORKERS > 1:
+        from sharding import run_sharded
+        run_sharded(SHARD_WORKERS)
+    elif USE_WEBHOOK:
+        from webhook import run_webhook
+        run_webhook(setup_dispatcher(dp), bot)
+    else:
+        asyncio.run(main())
@@ -0,0 +1,49 @@
+# modules/admin.py
+#
+# Служебные команды для администраторов бота (ADMIN_IDS в config.py).
+
+import html
+import logging
+import time
+
+from aiogram import F, Router, types
+from aiogram.filters import Command, CommandObject
+
+from config import ADMIN_IDS, DB_PATH, ARCHIVE_DB_PATH
+from modules import archive, perf
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+# Не-админам команды не видны: апдейт уходит дальше, как будто хэндлера нет
+router.message.filter(F.from_user.id.in_(set(ADMIN_IDS)))
+
+
+@router.message(Command("perf"))
+async def cmd_perf(message: types.Message, command: CommandObject):
+    """/perf — сводка по хэндлерам, /perf reset — сбросить накопленное."""
+    if (command.args or "").strip() == "reset":
+        perf.reset()
+        logger.info(f"Статистика производительности сброшена админом {message.from_user.id}")
+        await message.answer("Статистика производительности сброшена.")
+        return
+    report = perf.format_report()
+    await message.answer(f"<b>Производительность (мс)</b>\n<pre>{html.escape(report)}</pre>")
+
+
+@router.message(Command("admin_db_stats"))
+async def cmd_admin_db_stats(message: types.Message):
+    """/admin_db_stats — размеры таблиц основной БД и архива, итог последней архивации."""
+    lines = [f"{'база':<8} {'таблица':<24} {'строк':>9}"]
+    for schema, table, rows in await archive.table_stats():
+        lines.append(f"{schema:<8} {table:<24} {rows:>9}")
+    for path in (DB_PATH, ARCHIVE_DB_PATH):
+        if path.exists():
+            lines.append(f"{path.name}: {path.stat().st_size / 1024 / 1024:.1f} МБ")
+    if archive.last_run_at:
+        ago = int(time.time() - archive.last_run_at)
+        lines.append(f"Архивация {ago} с назад: {archive.last_run}")
+    else:
+        lines.append("Архивация ещё не запускалась.")
+    report = "\n".join(lines)
+    await message.answer(f"<b>База данных</b>\n<pre>{html.escape(report)}</pre>")
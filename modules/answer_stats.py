@@ -0,0 +1,183 @@
+# modules/answer_stats.py
+#
+# Частота ответов Club Connect: сколько раз каждого игрока называли для каждой
+# пары клубов. По ней в конце партии считается редкость ответа (как в Immaculate
+# Grid): доля ответов этой клетки, пришедшихся на этого игрока. Чем меньше
+# процент, тем оригинальнее ответ.
+#
+# Счётчики в памяти:
+#   - всего ответов по паре клубов — точно (пар немного: клубов^2),
+#   - по (пара, игрок) для «горячих» пар (от HOT_PAIR_USES ответов) — точно,
+#   - для остальных пар — count-min sketch: фиксированная память на длинный
+#     хвост редких пар, оценка сверху с небольшой погрешностью.
+# Когда пара становится горячей, точный счётчик игрока заводится при первом его
+# ответе, начальное значение — оценка из скетча.
+#
+# В БД (ttt_answer_usage, ttt_pair_usage) раз в FLUSH_INTERVAL секунд уходят
+# приращения одним executemany (modules/batching.py); при старте таблицы
+# читаются целиком, так что для редкости не нужен GROUP BY по истории партий.
+
+import logging
+import time
+from array import array
+
+import aiosqlite
+
+from config import DB_PATH
+from modules.batching import DeltaBatcher, add_delta
+
+logger = logging.getLogger(__name__)
+
+HOT_PAIR_USES = 50  # с какого числа ответов пара клубов считается точно
+SKETCH_WIDTH = 1 << 14
+SKETCH_DEPTH = 4
+FLUSH_INTERVAL = 5.0  # сек
+RELOAD_INTERVAL = 60.0  # сек: как часто шарды подтягивают чужие ответы
+
+Pair = tuple[str, str]
+
+
+def pair_key(club_a: str, club_b: str) -> Pair:
+    """Пара клубов без учёта порядка: строка и столбец взаимозаменяемы."""
+    return (club_a, club_b) if club_a <= club_b else (club_b, club_a)
+
+
+class CountMinSketch:
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH):
+        self.width = width
+        self._rows = [array("I", [0]) * width for _ in range(depth)]
+
+    def _cells(self, key: str):
+        # hash() в каждом процессе свой, но скетч живёт только в памяти и строится из БД заново
+        return ((row, hash((seed, key)) % self.width) for seed, row in enumerate(self._rows))
+
+    def add(self, key: str, count: int = 1):
+        # Консервативное обновление: поднимаем только минимальные ячейки — меньше завышение
+        cells = list(self._cells(key))
+        target = min(row[i] for row, i in cells) + count
+        for row, i in cells:
+            if row[i] < target:
+                row[i] = target
+
+    def estimate(self, key: str) -> int:
+        return min(row[i] for row, i in self._cells(key))
+
+
+class AnswerStats(DeltaBatcher):
+    label = "ClubConnect: частота ответов"
+    delta_attrs = ("_answer_delta", "_pair_delta")
+    flush_interval = FLUSH_INTERVAL
+    reload_interval = RELOAD_INTERVAL
+
+    def __init__(self):
+        super().__init__()
+        self._pair_uses: dict[Pair, int] = {}
+        self._hot: dict[Pair, dict[str, int]] = {}
+        self._sketch = CountMinSketch()
+        self._answer_delta: dict[tuple[str, str, str], int] = {}
+        self._pair_delta: dict[Pair, int] = {}
+
+    @staticmethod
+    def _sketch_key(pair: Pair, player: str) -> str:
+        return f"{pair[0]}|{pair[1]}|{player}"
+
+    def _add(self, pair: Pair, player: str, count: int):
+        total = self._pair_uses.get(pair, 0) + count
+        self._pair_uses[pair] = total
+        exact = self._hot.get(pair)
+        if exact is None and total >= HOT_PAIR_USES:
+            exact = self._hot[pair] = {}
+        if exact is None:
+            self._sketch.add(self._sketch_key(pair, player), count)
+            return
+        current = exact.get(player)
+        if current is None:
+            current = self._sketch.estimate(self._sketch_key(pair, player))
+        exact[player] = current + count
+
+    def record(self, club_a: str, club_b: str, player: str):
+        """Учитывает принятый ответ. O(1), без обращений к БД."""
+        pair = pair_key(club_a, club_b)
+        self._add(pair, player, 1)
+        add_delta(self._pair_delta, pair, 1)
+        add_delta(self._answer_delta, (pair[0], pair[1], player), 1)
+
+    def uses(self, club_a: str, club_b: str, player: str) -> int:
+        pair = pair_key(club_a, club_b)
+        exact = self._hot.get(pair)
+        if exact is not None and player in exact:
+            return exact[player]
+        return self._sketch.estimate(self._sketch_key(pair, player))
+
+    def rarity(self, club_a: str, club_b: str, player: str) -> float:
+        """Доля ответов клетки (в процентах), пришедшихся на этого игрока."""
+        total = self._pair_uses.get(pair_key(club_a, club_b), 0)
+        if not total:
+            return 0.0
+        return min(100.0, 100.0 * self.uses(club_a, club_b, player) / total)
+
+    # --- Запись в БД ---
+
+    async def _write(self, db: aiosqlite.Connection, answers: dict, pairs: dict):
+        now = int(time.time())
+        await db.executemany(
+            "INSERT INTO ttt_answer_usage (club_a, club_b, player, uses) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(club_a, club_b, player) DO UPDATE SET uses=uses+excluded.uses",
+            [(a, b, player, n) for (a, b, player), n in answers.items()])
+        await db.executemany(
+            "INSERT INTO ttt_pair_usage (club_a, club_b, uses, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(club_a, club_b) DO UPDATE SET uses=uses+excluded.uses, updated_at=excluded.updated_at",
+            [(a, b, n, now) for (a, b), n in pairs.items()])
+
+    async def _load(self):
+        async with aiosqlite.connect(DB_PATH) as db:
+            cursor = await db.execute("SELECT club_a, club_b, uses FROM ttt_pair_usage")
+            pair_rows = await cursor.fetchall()
+            cursor = await db.execute("SELECT club_a, club_b, player, uses FROM ttt_answer_usage")
+            answer_rows = await cursor.fetchall()
+        # Строим заново и поверх — то, что накоплено в памяти и ещё не записано
+        totals = {(club_a, club_b): uses for club_a, club_b, uses in pair_rows}
+        for pair, n in self._pair_delta.items():
+            add_delta(totals, pair, n)
+        self._pair_uses = totals
+        self._hot = {pair: {} for pair, total in totals.items() if total >= HOT_PAIR_USES}
+        self._sketch = CountMinSketch()
+        pending = [(club_a, club_b, player, n) for (club_a, club_b, player), n in self._answer_delta.items()]
+        for club_a, club_b, player, uses in list(answer_rows) + pending:
+            exact = self._hot.get((club_a, club_b))
+            if exact is None:
+                self._sketch.add(self._sketch_key((club_a, club_b), player), uses)
+            else:
+                exact[player] = exact.get(player, 0) + uses
+
+    async def start(self):
+        await init_db()
+        await super().start()
+        logger.info(f"ClubConnect: частота ответов загружена, пар клубов: {len(self._pair_uses)}, "
+                    f"точных: {len(self._hot)}")
+
+
+answer_stats = AnswerStats()
+
+
+async def init_db():
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS ttt_answer_usage (
+                club_a TEXT NOT NULL,
+                club_b TEXT NOT NULL,
+                player TEXT NOT NULL,
+                uses INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (club_a, club_b, player)
+            );
+        """)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS ttt_pair_usage (
+                club_a TEXT NOT NULL,
+                club_b TEXT NOT NULL,
+                uses INTEGER NOT NULL DEFAULT 0,
+                updated_at INTEGER,
+                PRIMARY KEY (club_a, club_b)
+            );
+        """)
+        await db.commit()
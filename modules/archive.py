@@ -0,0 +1,155 @@
+# modules/archive.py
+#
+# Архивация завершённых партий. duel_games и ttt_games хранят все игры
+# навсегда, а горячие запросы (поиск активной игры чата) ходят в те же
+# таблицы. Раз в ARCHIVE_INTERVAL секунд фоновая задача переносит
+# завершённые/отменённые/сломанные игры старше ARCHIVE_AFTER_DAYS дней в
+# отдельный файл ARCHIVE_DB_PATH (ATTACH + INSERT ... SELECT + DELETE пачками
+# по ARCHIVE_BATCH_SIZE строк, каждая пачка — одна транзакция). Вместе с
+# игрой уезжают её события и снимок из журнала (modules/game_log.py).
+# Краткий архив game_history остаётся в основной БД — по нему работает /ttt_history.
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import aiosqlite
+
+from config import DB_PATH, ARCHIVE_DB_PATH, ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL, ARCHIVE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# таблица -> ключ игры; порядок важен только для читаемости отчёта
+GAME_TABLES = {
+    "ttt_games": "game_id",
+    "duel_games": "id",
+}
+# Журнал партий: строки переносятся вместе с играми по game_id
+JOURNAL_TABLES = ("game_events", "game_snapshots")
+
+last_run: dict[str, int] = {}  # таблица -> сколько игр перенесено при последнем проходе
+last_run_at: Optional[float] = None
+_task: Optional[asyncio.Task] = None
+
+
+async def _columns(db: aiosqlite.Connection, schema: str, table: str) -> list[str]:
+    cursor = await db.execute(f"PRAGMA {schema}.table_info({table})")
+    return [row[1] for row in await cursor.fetchall()]
+
+
+async def _ensure_archive_table(db: aiosqlite.Connection, table: str) -> Optional[list[str]]:
+    """
+    Создаёт таблицу в архиве по образцу основной и досоздаёт недостающие колонки
+    (основные таблицы растут через ALTER TABLE ADD COLUMN). None — таблицы нет и в основной БД.
+    """
+    columns = await _columns(db, "main", table)
+    if not columns:
+        return None
+    await db.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} AS SELECT * FROM main.{table} WHERE 0")
+    archived = set(await _columns(db, "archive", table))
+    for column in columns:
+        if column not in archived:
+            await db.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column}")
+    return columns
+
+
+async def _archive_table(db: aiosqlite.Connection, table: str, key: str, cutoff: int,
+                         journal: dict[str, list[str]]) -> int:
+    columns = await _ensure_archive_table(db, table)
+    if columns is None:
+        return 0
+    cols = ", ".join(columns)
+    moved = 0
+    while True:
+        await db.execute("DELETE FROM temp.archive_batch")
+        cursor = await db.execute(
+            f"""INSERT INTO temp.archive_batch (game_id)
+                SELECT {key} FROM main.{table}
+                WHERE status != 'active' AND COALESCE(ended_at, created_at) < ?
+                LIMIT ?""",
+            (cutoff, ARCHIVE_BATCH_SIZE))
+        batch = cursor.rowcount
+        if batch <= 0:
+            await db.commit()
+            return moved
+        await db.execute(
+            f"INSERT INTO archive.{table} ({cols}) SELECT {cols} FROM main.{table} "
+            f"WHERE {key} IN (SELECT game_id FROM temp.archive_batch)")
+        for journal_table, journal_columns in journal.items():
+            jcols = ", ".join(journal_columns)
+            await db.execute(
+                f"INSERT OR IGNORE INTO archive.{journal_table} ({jcols}) SELECT {jcols} FROM main.{journal_table} "
+                f"WHERE game_id IN (SELECT game_id FROM temp.archive_batch)")
+            await db.execute(
+                f"DELETE FROM main.{journal_table} WHERE game_id IN (SELECT game_id FROM temp.archive_batch)")
+        await db.execute(f"DELETE FROM main.{table} WHERE {key} IN (SELECT game_id FROM temp.archive_batch)")
+        await db.commit()
+        moved += batch
+        if batch < ARCHIVE_BATCH_SIZE:
+            return moved
+        await asyncio.sleep(0)  # между пачками даём поработать хэндлерам
+
+
+async def archive_once(now: Optional[float] = None) -> dict[str, int]:
+    """Один проход архивации. Возвращает число перенесённых игр по таблицам."""
+    global last_run, last_run_at
+    cutoff = int((now or time.time()) - ARCHIVE_AFTER_DAYS * 86400)
+    result = {}
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("ATTACH DATABASE ? AS archive", (str(ARCHIVE_DB_PATH),))
+        await db.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (game_id TEXT PRIMARY KEY)")
+        journal = {}
+        for journal_table in JOURNAL_TABLES:
+            columns = await _ensure_archive_table(db, journal_table)
+            if columns:
+                journal[journal_table] = columns
+        await db.commit()
+        for table, key in GAME_TABLES.items():
+            result[table] = await _archive_table(db, table, key, cutoff, journal)
+    last_run, last_run_at = result, time.time()
+    if any(result.values()):
+        logger.info(f"Архивация: перенесено {result} (старше {ARCHIVE_AFTER_DAYS} дн.) в {ARCHIVE_DB_PATH.name}")
+    return result
+
+
+async def _archive_loop():
+    while True:
+        try:
+            await archive_once()
+        except Exception as e:
+            logger.error(f"Ошибка архивации игр: {e}", exc_info=True)
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+async def start_archiver():
+    global _task
+    from sharding import CURRENT_SHARD
+
+    # БД общая для всех шардов — архивирует только первый
+    if ARCHIVE_INTERVAL and CURRENT_SHARD[0] == 0:
+        _task = asyncio.create_task(_archive_loop())
+
+
+async def stop_archiver():
+    global _task
+    if _task:
+        _task.cancel()
+        _task = None
+
+
+async def table_stats() -> list[tuple[str, str, int]]:
+    """(база, таблица, строк) для основной БД и архива."""
+    stats = []
+    async with aiosqlite.connect(DB_PATH) as db:
+        schemas = ["main"]
+        if ARCHIVE_DB_PATH.exists():
+            await db.execute("ATTACH DATABASE ? AS archive", (str(ARCHIVE_DB_PATH),))
+            schemas.append("archive")
+        for schema in schemas:
+            cursor = await db.execute(
+                f"SELECT name FROM {schema}.sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+            for (table,) in await cursor.fetchall():
+                cursor = await db.execute(f"SELECT COUNT(*) FROM {schema}.{table}")
+                stats.append((schema, table, (await cursor.fetchone())[0]))
+    return stats
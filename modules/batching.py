@@ -0,0 +1,107 @@
+# modules/batching.py
+#
+# Общий каркас для отложенной записи приращений (рейтинг, сложность Solo,
+# частота ответов Club Connect). Сервис копит изменения в памяти в словарях
+# «ключ -> приращение» (число или список чисел) и раз в flush_interval секунд
+# отдаёт их в _write одной транзакцией. Если запись не удалась, приращения
+# возвращаются в словари и уйдут со следующей пачкой.
+#
+# В БД пишутся приращения, а не значения, поэтому шарды, обновляющие одни и те
+# же строки, друг друга не затирают. Чтобы видеть чужие изменения, при
+# нескольких шардах раз в reload_interval секунд вызывается _load — он читает
+# таблицы заново и накладывает сверху ещё не записанное (with_pending).
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Optional, Sequence
+
+import aiosqlite
+
+from config import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+Delta = Any  # число или список чисел
+
+
+def add_delta(deltas: dict, key: Any, value: Delta):
+    """Прибавляет приращение value к deltas[key] (поэлементно для списков)."""
+    if isinstance(value, list):
+        current = deltas.get(key)
+        if current is None:
+            deltas[key] = list(value)
+        else:
+            for i, item in enumerate(value):
+                current[i] += item
+    else:
+        deltas[key] = deltas.get(key, 0) + value
+
+
+def with_pending(values: Sequence, pending: Optional[Sequence]) -> list:
+    """Значения из БД плюс ещё не записанные приращения."""
+    if not pending:
+        return list(values)
+    return [value + extra for value, extra in zip(values, pending)]
+
+
+class DeltaBatcher(ABC):
+    label = ""  # для логов
+    delta_attrs: tuple[str, ...] = ()  # атрибуты со словарями приращений
+    flush_interval = 2.0  # сек
+    reload_interval = 60.0  # сек; при одном шарде _load в цикле не вызывается
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def _write(self, db: aiosqlite.Connection, *batches: dict):
+        """Пишет пачки приращений (в порядке delta_attrs); commit делает flush."""
+
+    @abstractmethod
+    async def _load(self):
+        """Перечитывает значения из БД (с учётом with_pending)."""
+
+    async def flush(self):
+        batches = [getattr(self, attr) for attr in self.delta_attrs]
+        if not any(batches):
+            return
+        for attr in self.delta_attrs:
+            setattr(self, attr, {})
+        try:
+            async with aiosqlite.connect(DB_PATH) as db:
+                await self._write(db, *batches)
+                await db.commit()
+        except Exception as e:
+            logger.error(f"{self.label}: не удалось сохранить изменения "
+                         f"({', '.join(str(len(batch)) for batch in batches)} записей): {e}")
+            for attr, batch in zip(self.delta_attrs, batches):
+                pending = getattr(self, attr)
+                for key, value in batch.items():
+                    add_delta(pending, key, value)
+
+    async def _flush_loop(self):
+        from sharding import CURRENT_SHARD
+
+        last_reload = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if CURRENT_SHARD[1] > 1 and time.monotonic() - last_reload >= self.reload_interval:
+                last_reload = time.monotonic()
+                try:
+                    await self._load()
+                except Exception as e:
+                    logger.warning(f"{self.label}: не удалось подтянуть изменения других шардов: {e}")
+
+    async def start(self):
+        """Загружает значения из БД и запускает фоновую запись."""
+        await self._load()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
@@ -10,14 +10,27 @@ from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any, Tuple, Set
 from aiogram import Router, F, types
-from aiogram.filters import Command, StateFilter
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.exceptions import TelegramBadRequest
 from fuzzywuzzy import fuzz
 from bot import bot
-from config import DB_PATH, CLUB_PLAYERS_JSON
+from config import DB_PATH, CLUB_PLAYERS_JSON, TTT_AI_KNOWLEDGE, TTT_AI_HUMAN_KNOWLEDGE, TTT_AI_MOVE_DELAY
+from modules.data_registry import data_registry
+from modules.dispatch_index import dispatch_index
+from modules import game_log as game_log_db
+from modules.game_log import game_log
+from modules.logs import log_event
+from modules import name_index
+from modules.name_keys import name_key
+from modules.rating import rating
+from modules import ttt_board
+from modules.answer_stats import answer_stats
+from modules.club_grid import ClubIndex
+from modules.ttt_ai import ai as ttt_ai, success_probabilities
+from sharding import owns_chat
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -37,9 +50,6 @@ class ClubConnectStates(StatesGroup):
 active_turn_timers: Dict[int, asyncio.Task] = {}
 active_ttt_games: Dict[int, Dict[str, Any]] = {}
 
-CLUB_PLAYERS: Dict[str, Set[str]] = {}
-ALL_CLUBS: list[str] = []
-
 
 def _normalize_club_name(raw_name: str) -> str:
     name = raw_name.strip().lower()
@@ -68,18 +78,10 @@ def _normalize_club_name(raw_name: str) -> str:
 def load_and_process_club_players_data_from_pairs(file_path: Path) -> Tuple[Dict[str, Set[str]], list[str]]:
     processed_players_by_club: Dict[str, Set[str]] = {}
     all_found_club_names: Set[str] = set()
-    if not file_path.exists():
-        logger.error(f"Файл данных игроков {file_path} не найден!")
-        return {}, []
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data_pairs_format = json.load(f)
-    except Exception as e:
-        logger.error(f"Ошибка загрузки или парсинга JSON из {file_path}: {e}", exc_info=True)
-        return {}, []
+    with open(file_path, "r", encoding="utf-8") as f:
+        data_pairs_format = json.load(f)
     if not isinstance(data_pairs_format, dict):
-        logger.error(f"Содержимое {file_path} не является словарем. Ожидался формат пар клубов.")
-        return {}, []
+        raise ValueError(f"содержимое {file_path} не является словарем, ожидался формат пар клубов")
     for club_pair_key, players_list_in_pair in data_pairs_format.items():
         try:
             club1_raw, club2_raw = club_pair_key.split("↔")
@@ -117,11 +119,36 @@ def load_and_process_club_players_data_from_pairs(file_path: Path) -> Tuple[Dict
     final_processed_players = {club: players for club, players in processed_players_by_club.items() if
                                club in final_club_list and players}
     final_club_list_with_players = sorted(list(final_processed_players.keys()))
+    if not final_processed_players:
+        raise ValueError(f"в {file_path} не нашлось ни одного клуба с игроками")
 
     return final_processed_players, final_club_list_with_players
 
 
-CLUB_PLAYERS, ALL_CLUBS = load_and_process_club_players_data_from_pairs(Path(CLUB_PLAYERS_JSON))
+ClubData = Tuple[Dict[str, Set[str]], list[str], ClubIndex]
+
+
+def build_club_data() -> ClubData:
+    """
+    Снимок данных Club Connect вместе с индексом для подбора полей. Индекс —
+    часть снимка: его строит поток пересборки, а партии читают индекс своего
+    снимка, общего изменяемого кэша между потоком и циклом событий нет.
+    """
+    club_players, all_clubs = load_and_process_club_players_data_from_pairs(Path(CLUB_PLAYERS_JSON))
+    index = ClubIndex(club_players)
+    logger.info(f"ClubConnect: индекс клубов построен, клубов: {len(index.clubs)}")
+    return club_players, all_clubs, index
+
+
+data_registry.register("club_players", [CLUB_PLAYERS_JSON], build_club_data,
+                       fallback=lambda: ({}, [], ClubIndex({})))
+
+
+def get_club_data(game: Optional[Dict[str, Any]] = None) -> ClubData:
+    """(игроки по клубам, список клубов, индекс) — из снимка игры, если он есть, иначе текущие."""
+    if game and game.get("club_data"):
+        return game["club_data"]
+    return data_registry.get("club_players")
 
 async def init_ttt_db() -> None:
     """Инициализирует или обновляет таблицы для Club Connect."""
@@ -160,9 +187,61 @@ async def init_ttt_db() -> None:
             await db.execute("ALTER TABLE ttt_games ADD COLUMN current_turn_symbol TEXT;")
         except aiosqlite.OperationalError:
             pass # Колонки уже существуют
+        try:
+            await db.execute("ALTER TABLE ttt_games ADD COLUMN board_size INTEGER DEFAULT 3;")
+        except aiosqlite.OperationalError:
+            pass  # Колонка уже есть
+        # Частичный индекс: поиск активной игры чата не зависит от размера истории
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_ttt_games_active ON ttt_games(chat_id) WHERE status = 'active';")
+        await db.commit()
+
+    # Однократный перенос уже завершённых партий в архив истории
+    await game_log_db.init_db()
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("""
+            INSERT OR IGNORE INTO game_history
+                (game_id, game_type, chat_id, player1, player2, status, winner, created_at, ended_at)
+            SELECT game_id, 'ttt', chat_id, player_x_id, player_o_id, status, winner_id, created_at, ended_at
+            FROM ttt_games
+            WHERE status IN ('finished', 'canceled')
+              AND NOT EXISTS (SELECT 1 FROM game_history WHERE game_type = 'ttt')
+        """)
         await db.commit()
 
 
+def _ttt_state(game: Dict[str, Any]) -> Dict[str, Any]:
+    """Та часть партии, которая меняется по ходу игры (для снимков журнала)."""
+    state = {
+        "x_mask": game["x_mask"],
+        "o_mask": game["o_mask"],
+        "current_turn_symbol": game["current_turn_symbol"],
+        "round_start_time": game["round_start_time"],
+        "answers": game["answers"],
+    }
+    if "ai_knowledge" in game:
+        state["ai_knowledge"] = game["ai_knowledge"]
+    return state
+
+
+def _log_ttt_event(game: Dict[str, Any], kind: str, user_id: Optional[int] = None, **payload: Any):
+    """Дописывает событие партии в журнал; строку ttt_games по ходу игры не трогаем."""
+    game_log.append("ttt", game["game_id"], kind, user_id, state=_ttt_state(game),
+                    turn=game["current_turn_symbol"], **payload)
+
+
+def _apply_ttt_event(game: Dict[str, Any], kind: str, payload: Dict[str, Any], created_at: int):
+    """Применяет событие из журнала к восстанавливаемой партии."""
+    if kind == "move":
+        game["x_mask"], game["o_mask"] = ttt_board.place(game["x_mask"], game["o_mask"], payload["cell"],
+                                                         payload["symbol"])
+        if payload.get("name"):
+            game["answers"].append([payload["cell"], payload["symbol"], payload["name"]])
+    if kind in ("move", "pass", "timeout"):
+        game["round_start_time"] = created_at
+    if "turn" in payload:
+        game["current_turn_symbol"] = payload["turn"]
+
+
 async def load_active_games_from_db():
     """Загружает активные игры из БД в память при старте бота."""
     global active_ttt_games
@@ -175,9 +254,12 @@ async def load_active_games_from_db():
 
     loaded_count = 0
     for game_row in active_games_rows:
+        if not owns_chat(game_row['chat_id']):
+            continue  # в многопроцессном режиме игру поднимает воркер, которому принадлежит чат
         try:
             player_x = await bot.get_chat(game_row['player_x_id'])
-            player_o = await bot.get_chat(game_row['player_o_id'])
+            # В игре против бота ноликами играет сам бот
+            player_o = await bot.me() if game_row['player_o_id'] == bot.id else await bot.get_chat(game_row['player_o_id'])
 
             game_data = {
                 "game_id": game_row['game_id'],
@@ -186,21 +268,33 @@ async def load_active_games_from_db():
                 "player_o_id": player_o.id,
                 "player_x_user": player_x,
                 "player_o_user": player_o,
-                "board_state": game_row['board_state'],
                 "current_turn_symbol": game_row['current_turn_symbol'],
                 "clubs_rows": game_row['clubs_rows'].split(','),
                 "clubs_cols": game_row['clubs_cols'].split(','),
+                "board_size": game_row['board_size'] or ttt_board.SIZE,
                 "round_start_time": game_row['round_start_time'],
                 "status": "active",
                 "winner_id": None,
-                "created_at": game_row['created_at']
+                "created_at": game_row['created_at'],
+                "answers": [],
             }
+            # В строке — состояние на старт партии, ходы берём из журнала: снимок + события после него
+            game_data["x_mask"], game_data["o_mask"] = ttt_board.from_string(game_row['board_state'])
+            snapshot, events = await game_log.load(game_row['game_id'])
+            if snapshot:
+                if "board_state" in snapshot:  # снимки до перехода на маски
+                    snapshot["x_mask"], snapshot["o_mask"] = ttt_board.from_string(snapshot.pop("board_state"))
+                game_data.update(snapshot)
+            for kind, _, payload, created_at in events:
+                _apply_ttt_event(game_data, kind, payload, created_at)
+            # Маску названных игроков строим заново по именам: номера зависят от загруженных данных
+            game_data["used_players"] = 0
+            for _, _, name in game_data["answers"]:
+                _mark_used(game_data, name)
             active_ttt_games[game_row['chat_id']] = game_data
 
-            # Перезапускаем таймер для текущего хода
-            current_player_id = player_x.id if game_data['current_turn_symbol'] == 'X' else player_o.id
-            asyncio.create_task(
-                start_turn_timer(game_row['chat_id'], game_data['current_turn_symbol'], current_player_id))
+            # Перезапускаем таймер для текущего хода (или ход бота)
+            _start_next_turn(game_row['chat_id'], game_data)
 
             loaded_count += 1
         except Exception as e:
@@ -217,12 +311,20 @@ async def load_active_games_from_db():
 async def on_startup_club_connect():
     await init_ttt_db()
     await load_active_games_from_db()  # <--- ДОБАВИТЬ ЭТУ СТРОКУ
-    if not CLUB_PLAYERS:
+    await answer_stats.start()
+    club_players, all_clubs, _ = get_club_data()
+    if not club_players:
         logger.warning("ClubConnect: CLUB_PLAYERS пуст.")
-    elif not ALL_CLUBS:
+    elif not all_clubs:
         logger.warning("ClubConnect: ALL_CLUBS пуст.")
     logger.info(
-        f"ClubConnect запущен. Тест.режим: {FIXED_CLUBS_FOR_TESTING}. Клубов в ALL_CLUBS: {len(ALL_CLUBS)}. Таймер: {MOVE_TIMEOUT_SECONDS}с.")
+        f"ClubConnect запущен. Тест.режим: {FIXED_CLUBS_FOR_TESTING}. Клубов в ALL_CLUBS: {len(all_clubs)}. Таймер: {MOVE_TIMEOUT_SECONDS}с.")
+
+
+@router.shutdown()
+async def on_shutdown_club_connect():
+    await ttt_ai.stop()
+    await answer_stats.stop()
 
 
 def mention_user(u: types.User) -> str:
@@ -230,9 +332,9 @@ def mention_user(u: types.User) -> str:
         u.username.replace("<", "<").replace(">", ">") if u.username else str(u.id))
     return f'<a href="tg://user?id={u.id}">{name}</a>'
 
-def get_ttt_invite_keyboard(player1_id: int, player2_id: int) -> types.InlineKeyboardMarkup:
+def get_ttt_invite_keyboard(player1_id: int, player2_id: int, size: int = ttt_board.SIZE) -> types.InlineKeyboardMarkup:
     """Создает инлайн-клавиатуру для приглашения в игру Club Connect."""
-    accept_callback = f"ttt_accept:{player1_id}:{player2_id}"
+    accept_callback = f"ttt_accept:{player1_id}:{player2_id}:{size}"
     decline_callback = f"ttt_decline:{player1_id}:{player2_id}"
     buttons = [
         [
@@ -241,47 +343,32 @@ def get_ttt_invite_keyboard(player1_id: int, player2_id: int) -> types.InlineKey
         ]
     ]
     return types.InlineKeyboardMarkup(inline_keyboard=buttons)
-def _pick_three_clubs_for_both_random_fallback() -> Tuple[list[str], list[str]]:
-    global ALL_CLUBS
-    if not ALL_CLUBS or len(ALL_CLUBS) < 6: logger.warning(f"Fallback: Мало клубов ({len(ALL_CLUBS)})."); return [], []
-    shuffled = random.sample(ALL_CLUBS, k=len(ALL_CLUBS));
-    r, c = shuffled[:3], shuffled[3:6];
-    return r, c
-
-
-def pick_three_clubs_for_both() -> Tuple[list[str], list[str]]:
-    global ALL_CLUBS
-    if FIXED_CLUBS_FOR_TESTING:
+def pick_clubs_for_both(size: int = ttt_board.SIZE) -> Tuple[list[str], list[str]]:
+    """Клубы строк и столбцов поля size x size, у каждой клетки которого есть хотя бы один ответ."""
+    club_players, all_clubs, index = get_club_data()
+    if FIXED_CLUBS_FOR_TESTING and size == ttt_board.SIZE:
         # Пример фиксированных клубов (должны быть нормализованы, если нужно)
         fixed_r_normalized = [_normalize_club_name(c) for c in ["реал мадрид", "челси", "псж"]]
         fixed_c_normalized = [_normalize_club_name(c) for c in ["барселона", "интер милан", "ювентус"]]
-        valid_r = [c for c in fixed_r_normalized if c in ALL_CLUBS]
-        valid_c = [c for c in fixed_c_normalized if c in ALL_CLUBS]
+        valid_r = [c for c in fixed_r_normalized if c in all_clubs]
+        valid_c = [c for c in fixed_c_normalized if c in all_clubs]
         if len(valid_r) == 3 and len(valid_c) == 3:
             logger.info(f"Фикс.клубы: R={valid_r},C={valid_c}");
             return valid_r, valid_c
-        else:
-            logger.warning(f"Не все фикс.клубы найдены. R:{valid_r},C:{valid_c}. ALL_CLUBS: {ALL_CLUBS}. Рандом.");
-            return _pick_three_clubs_for_both_random_fallback()
-    else:
-        if not ALL_CLUBS or len(ALL_CLUBS) < 6:
-            logger.warning(f"Мало клубов ({len(ALL_CLUBS)}) для 3+3. Игра может не начаться.");
-            return [], []
-        shuffled = random.sample(ALL_CLUBS, k=len(ALL_CLUBS));
-        clubs_rows = shuffled[:3]
-        clubs_cols = shuffled[3:6]
-        logger.info(f"Рандом.клубы: R={clubs_rows},C={clubs_cols}");
-        return clubs_rows, clubs_cols
-
-
-def check_winner(bs: str) -> Optional[str]:
-    lines = [(0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6)];
-    for i, j, k in lines:
-        if bs[i] != "_" and bs[i] == bs[j] == bs[k]: return bs[i]
-    return None
-
-
-def render_board_mono_and_markup(bs: str, cr: list[str], cc: list[str]) -> Tuple[str, InlineKeyboardMarkup]:
+        logger.warning(f"Не все фикс.клубы найдены. R:{valid_r},C:{valid_c}. ALL_CLUBS: {all_clubs}. Рандом.");
+    picked = index.pick(size)
+    if picked is None:
+        logger.warning(f"Не удалось подобрать поле {size}x{size}: клубов {len(all_clubs)}, "
+                       f"подходящих {index.eligible(size).bit_count()}.")
+        return [], []
+    clubs_rows, clubs_cols = picked
+    logger.info(f"Рандом.клубы {size}x{size}: R={clubs_rows},C={clubs_cols}");
+    return clubs_rows, clubs_cols
+
+
+def render_board_mono_and_markup(x_mask: int, o_mask: int, cr: list[str], cc: list[str],
+                                 counts: Optional[list[int]] = None) -> Tuple[str, InlineKeyboardMarkup]:
+    """Поле текстом и кнопками; counts — сколько ответов у каждой клетки (пишется на свободных кнопках)."""
     def sc(n: str) -> str:
         return _normalize_club_name(n)[:4].capitalize().ljust(5)
 
@@ -293,10 +380,11 @@ def render_board_mono_and_markup(bs: str, cr: list[str], cc: list[str]) -> Tuple
         br = []
         for ci in range(len(cc)):
             idx = ri * len(cc) + ci;
-            sym = bs[idx] if idx < len(bs) else " "
+            sym = ttt_board.cell_symbol(x_mask, o_mask, idx)
             cd, ie = ("⬜️", True) if sym == "_" else (("❌" if sym == "X" else "⭕️"), False)
             lt += cd + "  ";
-            br.append(InlineKeyboardButton(text=f"{ri + 1},{ci + 1}" if ie else cd,
+            bt = f"{ri + 1},{ci + 1}" + (f" · {counts[idx]}" if counts else "")
+            br.append(InlineKeyboardButton(text=bt if ie else cd,
                                            callback_data=f"ttt_cell_{ri}_{ci}" if ie else "ttt_ignore"))
         bl.append("<code>" + lt.rstrip() + "</code>");
         kbb.append(br)
@@ -315,7 +403,7 @@ async def безопасное_редактирование_разметки(m:
 
 async def _turn_timeout_fired(chat_id: int, expected_turn_symbol: str, timed_out_player_id: int):
     global active_ttt_games, active_turn_timers
-    logger.info(f"Таймер истек chat={chat_id},ход={expected_turn_symbol} от {timed_out_player_id}");
+    log_event(logger, "ttt.turn_timeout", chat=chat_id, turn=expected_turn_symbol, user=timed_out_player_id)
     game = active_ttt_games.get(chat_id)
     if game and game["status"] == "active" and game["current_turn_symbol"] == expected_turn_symbol and \
             ((expected_turn_symbol == "X" and game["player_x_id"] == timed_out_player_id) or \
@@ -327,13 +415,13 @@ async def _turn_timeout_fired(chat_id: int, expected_turn_symbol: str, timed_out
                                f"⏱ Время вышло для {mention_user(tpo)} ({expected_turn_symbol})!\nХод к {mention_user(npo)} ({ns}).")
         game["current_turn_symbol"] = ns;
         game["round_start_time"] = int(time.time());
-        await _update_ttt_game_in_db(game)
-        btxt, bmkp = render_board_mono_and_markup(game["board_state"], game["clubs_rows"], game["clubs_cols"]);
+        _log_ttt_event(game, "timeout", timed_out_player_id)
+        btxt, bmkp = _render_game(game);
         mp = [btxt, f"Ход: {mention_user(npo)} ({ns}). Выберите клетку."]
         await bot.send_message(chat_id, "\n".join(mp), reply_markup=bmkp, parse_mode="HTML");
-        asyncio.create_task(start_turn_timer(chat_id, game["current_turn_symbol"], npo.id))
+        _start_next_turn(chat_id, game)
     else:
-        logger.info(f"Таймер chat={chat_id}(ход {expected_turn_symbol}) истек,но игра/ход изменились.")
+        log_event(logger, "ttt.turn_timeout_stale", logging.DEBUG, chat=chat_id, turn=expected_turn_symbol)
 
     # Удаляем задачу из словаря только если она там есть и это та самая задача, которая сейчас выполняется
     # asyncio.current_task() здесь будет ссылаться на задачу _turn_timeout_fired, а не на исходный таймер _timer_logic
@@ -342,14 +430,14 @@ async def _turn_timeout_fired(chat_id: int, expected_turn_symbol: str, timed_out
     if task_in_dict and task_in_dict.done():  # Если задача завершилась (не важно, отменена или выполнена)
         if chat_id in active_turn_timers:  # Доп. проверка перед удалением
             del active_turn_timers[chat_id]
-        logger.debug(f"Завершившаяся/отмененная задача таймера удалена из active_turn_timers для chat_id={chat_id}")
+        logger.debug("Завершившаяся/отмененная задача таймера удалена из active_turn_timers для chat_id=%s", chat_id)
 
 
 async def start_turn_timer(chat_id: int, turn_symbol: str, player_id: int):
     global active_turn_timers
     cancel_turn_timer(chat_id)  # Отменяем любой предыдущий таймер для этого чата
-    logger.info(
-        f"Запуск таймера на {MOVE_TIMEOUT_SECONDS}с для chat_id={chat_id}, ход: {turn_symbol} (игрок {player_id})")
+    log_event(logger, "ttt.turn_timer", logging.DEBUG, chat=chat_id, turn=turn_symbol, user=player_id,
+              seconds=MOVE_TIMEOUT_SECONDS)
 
     async def _timer_logic_internal():  # Переименовал, чтобы не конфликтовать с локальной переменной task
         global active_turn_timers
@@ -357,20 +445,20 @@ async def start_turn_timer(chat_id: int, turn_symbol: str, player_id: int):
         this_task_obj = asyncio.current_task()
         try:
             await asyncio.sleep(MOVE_TIMEOUT_SECONDS)
-            logger.debug(f"Asyncio.sleep завершен для таймера chat_id={chat_id} (ожидался ход {turn_symbol})")
+            logger.debug("Asyncio.sleep завершен для таймера chat_id=%s (ожидался ход %s)", chat_id, turn_symbol)
             # Проверяем, что этот таймер все еще актуален (т.е. не был заменен новым вызовом start_turn_timer, который уже отменил бы этот)
             # и что это именно та задача, которая сейчас должна сработать
             if chat_id in active_turn_timers and active_turn_timers[chat_id] is this_task_obj:
                 await _turn_timeout_fired(chat_id, turn_symbol, player_id)
         except asyncio.CancelledError:
-            logger.info(f"Таймер для chat_id={chat_id} (ход {turn_symbol}, игрок {player_id}) был корректно отменен.")
+            logger.debug("Таймер для chat_id=%s (ход %s, игрок %s) был корректно отменен.", chat_id, turn_symbol, player_id)
             # Ничего не делаем, если отменен
         finally:
             # Убеждаемся, что задача удалена из словаря, если она там еще есть и это она
             if chat_id in active_turn_timers and active_turn_timers[chat_id] is this_task_obj:
                 del active_turn_timers[chat_id]
                 logger.debug(
-                    f"Задача таймера (после _timer_logic_internal) удалена из active_turn_timers для chat_id={chat_id}")
+                    "Задача таймера (после _timer_logic_internal) удалена из active_turn_timers для chat_id=%s", chat_id)
 
     task_obj = asyncio.create_task(_timer_logic_internal())  # Переименовал task -> task_obj
     active_turn_timers[chat_id] = task_obj
@@ -381,21 +469,233 @@ def cancel_turn_timer(chat_id: int):
     task_to_cancel = active_turn_timers.pop(chat_id, None)  # Удаляем и получаем задачу
     if task_to_cancel and not task_to_cancel.done():
         task_to_cancel.cancel()
-        logger.info(f"Таймер для chat_id={chat_id} отменен.")
+        logger.debug("Таймер для chat_id=%s отменен.", chat_id)
     elif task_to_cancel:  # Задача была, но уже выполнена (done)
-        logger.debug(f"Попытка отменить уже выполненный/отмененный таймер для chat_id={chat_id}.")
+        logger.debug("Попытка отменить уже выполненный/отмененный таймер для chat_id=%s.", chat_id)
     else:  # Задачи не было
-        logger.debug(f"Попытка отменить несуществующий таймер для chat_id={chat_id}.")
+        logger.debug("Попытка отменить несуществующий таймер для chat_id=%s.", chat_id)
+
+
+def _is_ai_game(game: Dict[str, Any]) -> bool:
+    return "ai_knowledge" in game  # задаётся в /ttt_ai и восстанавливается из снимка журнала
+
+
+def _start_next_turn(chat_id: int, game: Dict[str, Any]):
+    """Передаёт ход: человеку — с таймером, боту — его ход."""
+    if _is_ai_game(game) and game["current_turn_symbol"] == "O":
+        asyncio.create_task(_ai_move(chat_id, game["game_id"]))
+    else:
+        player_id = game["player_x_id"] if game["current_turn_symbol"] == "X" else game["player_o_id"]
+        asyncio.create_task(start_turn_timer(chat_id, game["current_turn_symbol"], player_id))
+
+
+def _cell_answers(game: Dict[str, Any], cell: int) -> frozenset[str]:
+    _, _, index = get_club_data(game)
+    row, col = divmod(cell, game["board_size"])
+    return index.common(game["clubs_rows"][row], game["clubs_cols"][col])
+
+
+def _player_id(game: Dict[str, Any], name: str) -> Optional[int]:
+    """Короткий номер игрока в индексе данных партии (бит в маске used_players)."""
+    _, _, index = get_club_data(game)
+    return index.player_ids.get(name)
+
+
+def _is_used(game: Dict[str, Any], name: str) -> bool:
+    """Называли ли уже этого игрока в партии — одна проверка бита."""
+    pid = _player_id(game, name)
+    return pid is not None and bool(game["used_players"] >> pid & 1)
+
+
+def _mark_used(game: Dict[str, Any], name: str):
+    pid = _player_id(game, name)
+    if pid is not None:
+        game["used_players"] |= 1 << pid
+
+
+def _unused_answers(game: Dict[str, Any], cell: int) -> list[str]:
+    """Подходящие для клетки игроки, которых ещё не называли в этой партии."""
+    return sorted(name for name in _cell_answers(game, cell) if not _is_used(game, name))
+
+
+def _key_matches(game: Dict[str, Any], guess: str) -> list[str]:
+    """Игроки, чей ключ имени совпадает с ключом ввода (латиница/кириллица, ё, удвоенные буквы)."""
+    _, _, index = get_club_data(game)
+    return index.by_key.get(name_key(guess), [])
+
+
+def _cell_counts(game: Dict[str, Any]) -> list[int]:
+    """Сколько подходящих игроков у каждой клетки; считается один раз на партию."""
+    counts = game.get("cell_counts")
+    if counts is None:
+        counts = game["cell_counts"] = [len(_cell_answers(game, cell)) for cell in range(game["board_size"] ** 2)]
+    return counts
+
+
+def _render_game(game: Dict[str, Any]) -> Tuple[str, InlineKeyboardMarkup]:
+    return render_board_mono_and_markup(game["x_mask"], game["o_mask"], game["clubs_rows"], game["clubs_cols"],
+                                        _cell_counts(game))
+
+
+def _rarity_summary(game: Dict[str, Any]) -> str:
+    """
+    Редкость принятых ответов партии: какой процент всех ответов клетки за всё время
+    пришёлся на того же игрока (меньше — оригинальнее). Ответы бота не оцениваются.
+    """
+    lines = []
+    scores: Dict[str, list[float]] = {}
+    for cell, symbol, name in game["answers"]:
+        if symbol == "O" and _is_ai_game(game):
+            continue
+        row, col = divmod(cell, game["board_size"])
+        club_r, club_c = game["clubs_rows"][row], game["clubs_cols"][col]
+        rarity = answer_stats.rarity(club_r, club_c, name)
+        scores.setdefault(symbol, []).append(rarity)
+        lines.append(f"{'❌' if symbol == 'X' else '⭕️'} {name.capitalize()} "
+                     f"({club_r.capitalize()} × {club_c.capitalize()}): {rarity:.0f}%")
+    if not lines:
+        return ""
+    totals = ", ".join(f"{'❌' if symbol == 'X' else '⭕️'} {sum(values) / len(values):.0f}%"
+                       for symbol, values in sorted(scores.items()))
+    return "\n\n📊 <b>Редкость ответов</b> (доля всех ответов клетки):\n" + "\n".join(lines) + \
+        f"\nВ среднем: {totals}"
+
+
+def _ai_grid(game: Dict[str, Any]) -> Tuple[Tuple[float, ...], Tuple[float, ...]]:
+    """Сетка для поиска: вероятности по клеткам считаются один раз на партию."""
+    probs = game.get("ai_probs")
+    if probs is None:
+        counts = _cell_counts(game)
+        probs = game["ai_probs"] = (success_probabilities(counts, game.get("ai_knowledge", TTT_AI_KNOWLEDGE)),
+                                    success_probabilities(counts, TTT_AI_HUMAN_KNOWLEDGE))
+    return probs
+
+
+async def _warm_ai(game: Dict[str, Any]):
+    # Сетку решаем в пуле процессов сразу, пока думает человек; к ходу бота она уже в памяти
+    try:
+        await ttt_ai.prepare(_ai_grid(game))
+    except Exception as e:
+        logger.warning(f"ClubConnect AI: не удалось решить сетку: {e}")
+
+
+async def _ai_move(chat_id: int, game_id: str):
+    await asyncio.sleep(TTT_AI_MOVE_DELAY)
+    game = active_ttt_games.get(chat_id)
+    if not game or game["game_id"] != game_id or game["status"] != "active" or game["current_turn_symbol"] != "O":
+        return
+
+    try:
+        await ttt_ai.prepare(_ai_grid(game))  # обычно уже решена в _warm_ai; если вытеснили — решим заново
+    except Exception as e:
+        logger.error(f"ClubConnect AI: не удалось решить сетку, бот пропускает ход: {e}")
+        game["current_turn_symbol"] = "X"
+        _log_ttt_event(game, "pass", bot.id, cell=None, guess=None)
+        _start_next_turn(chat_id, game)
+        return
+    if game["status"] != "active":
+        return
+    cell = ttt_ai.best_cell(_ai_grid(game), game["x_mask"], game["o_mask"])
+    answers = _unused_answers(game, cell)
+    row, col = divmod(cell, ttt_board.SIZE)
+    human = game["player_x_user"]
+    game["round_start_time"] = int(time.time())
+    log_event(logger, "ttt.ai_move", chat=chat_id, cell=cell, p=round(game["ai_probs"][0][cell], 3))
+
+    if not answers or random.random() >= game["ai_probs"][0][cell]:
+        game["current_turn_symbol"] = "X"
+        _log_ttt_event(game, "pass", bot.id, cell=cell, guess=None)
+        text = f"🤖 Клетка ({row + 1},{col + 1}): не вспомнил подходящего игрока. Ход к {mention_user(human)} (X)."
+    else:
+        name = random.choice(answers)
+        game["x_mask"], game["o_mask"] = ttt_board.place(game["x_mask"], game["o_mask"], cell, "O")
+        game["answers"].append([cell, "O", name])
+        _mark_used(game, name)
+        outcome = ttt_board.outcome(game["x_mask"], game["o_mask"])
+        if outcome & ttt_board.RESULT_MASK == ttt_board.ONGOING:
+            game["current_turn_symbol"] = "X"
+        _log_ttt_event(game, "move", bot.id, cell=cell, symbol="O", name=name)
+        text = f"🤖 Клетка ({row + 1},{col + 1}): <b>{name.capitalize()}</b>."
+
+        if outcome & ttt_board.RESULT_MASK in (ttt_board.O_WINS, ttt_board.DRAW):
+            bot_won = outcome & ttt_board.RESULT_MASK == ttt_board.O_WINS
+            log_event(logger, "ttt.finished", chat=chat_id, winner="O" if bot_won else None)
+            game.update({"status": "finished", "winner_id": bot.id if bot_won else None, "ended_at": int(time.time())})
+            await _update_ttt_game_in_db(game)
+            active_ttt_games.pop(chat_id, None)
+            f_b_txt, _ = _render_game(game)
+            result = "🤖 <b>Победа бота!</b>" if bot_won else "🤝 <b>Ничья! Все клетки заполнены.</b>"
+            await bot.send_message(chat_id, f"{text}\n{f_b_txt}\n{result}{_rarity_summary(game)}", parse_mode="HTML")
+            return
+
+    board_txt, board_mkp = _render_game(game)
+    parts = [text, board_txt, f"Ход: {mention_user(human)} (X). Выберите клетку."]
+    if ttt_board.is_dead(game["x_mask"], game["o_mask"]):
+        parts.append("🤝 Собрать линию уже не сможет никто — закончить партию ничьей: <code>/draw</code>")
+    await bot.send_message(chat_id, "\n".join(parts), reply_markup=board_mkp, parse_mode="HTML")
+    _start_next_turn(chat_id, game)
+
+
+@router.message(Command("ttt_ai"))
+async def cmd_ttt_ai(message: types.Message, command: CommandObject, state: FSMContext):
+    """Игра против бота: /ttt_ai или /ttt_ai 80 (насколько хорошо бот знает игроков, %)."""
+    chat_id = message.chat.id
+    if chat_id in active_ttt_games and active_ttt_games[chat_id]["status"] == "active":
+        await message.answer("В этом чате уже идёт игра. Дождитесь её окончания.")
+        return
+
+    knowledge = TTT_AI_KNOWLEDGE
+    if command.args:
+        try:
+            knowledge = int(command.args.strip().rstrip("%")) / 100
+        except ValueError:
+            knowledge = -1
+        if not 0 < knowledge <= 1:
+            await message.answer("Сложность — число от 1 до 100, например: <code>/ttt_ai 80</code>", parse_mode="HTML")
+            return
+
+    club_data = get_club_data()
+    clubs_r, clubs_c = pick_clubs_for_both(ttt_board.SIZE)  # бот играет только на поле 3x3
+    if not club_data[1] or len(clubs_r) != ttt_board.SIZE:
+        await message.answer("⚠️ Ошибка: не удалось подобрать клубы для поля. Не могу начать игру.")
+        return
+
+    human = message.from_user
+    now_ts = int(time.time())
+    game = await _create_ttt_game(f"ttt_{chat_id}_{now_ts}", chat_id, human, await bot.me(), clubs_r, clubs_c,
+                                  club_data, now_ts, ai_knowledge=knowledge)
+    asyncio.create_task(_warm_ai(game))
+
+    board_text_str, board_markup_obj = _render_game(game)
+    await message.answer("\n".join([
+        "⚽️ <b>«Крестики-Нолики»</b> против бота 🤖",
+        board_text_str,
+        f"Игроки: {mention_user(human)} (❌) vs бот (⭕️, знает {round(knowledge * 100)}% игроков)",
+        f"Ход: {mention_user(human)} (❌). Выберите клетку."
+    ]), reply_markup=board_markup_obj, parse_mode="HTML")
+
+    await state.set_state(ClubConnectStates.waiting_for_cell_choice)
+    await state.update_data(game_chat_id=chat_id)
+    asyncio.create_task(start_turn_timer(chat_id, "X", human.id))
 
 
 @router.message(Command("ttt"))
-async def cmd_ttt_start(message: types.Message):
-    """Отправляет приглашение на игру Club Connect по реплаю на сообщение."""
+async def cmd_ttt_start(message: types.Message, command: CommandObject):
+    """Отправляет приглашение на игру Club Connect по реплаю на сообщение: /ttt, /ttt 4 или /ttt 5 — размер поля."""
     chat_id = message.chat.id
     initiator = message.from_user
 
     if not initiator: return
 
+    size = ttt_board.SIZE
+    if command.args:
+        size = int(command.args.strip()) if command.args.strip().isdigit() else 0
+        if size not in ttt_board.BOARD_SIZES:
+            sizes = ", ".join(str(n) for n in ttt_board.BOARD_SIZES)
+            await message.answer(f"❌ Размер поля — одно из чисел {sizes}, например: <code>/ttt 4</code>",
+                                 parse_mode="HTML")
+            return
+
     # Проверка, что команда отправлена в группе
     if message.chat.type not in ("group", "supergroup"):
         await message.answer("❌ Эта игра доступна только в группах.")
@@ -420,10 +720,12 @@ async def cmd_ttt_start(message: types.Message):
         return
 
     # Создаем и отправляем приглашение
-    keyboard = get_ttt_invite_keyboard(initiator.id, opponent.id)
+    keyboard = get_ttt_invite_keyboard(initiator.id, opponent.id, size)
+    board_note = "" if size == ttt_board.SIZE else \
+        f" на поле {size}x{size} (нужно {ttt_board.WIN_LENGTH[size]} в ряд)"
     invite_text = (
         f"⚽️ {mention_user(opponent)}, игрок {mention_user(initiator)} "
-        f"вызывает тебя на игру «Крестики-Нолики»!\n\n"  # <-- ИЗМЕНЕНО
+        f"вызывает тебя на игру «Крестики-Нолики»{board_note}!\n\n"  # <-- ИЗМЕНЕНО
         f"Принимаешь вызов?"
     )
 
@@ -448,12 +750,56 @@ async def cmd_ttt_start(message: types.Message):
     asyncio.create_task(auto_decline_task())
 
 
+async def _create_ttt_game(game_id: str, chat_id: int, player_x: Any, player_o: Any, clubs_r: list[str],
+                           clubs_c: list[str], club_data: ClubData, now_ts: int,
+                           **extra: Any) -> Dict[str, Any]:
+    """Создаёт партию: в памяти, строкой в ttt_games и событием start в журнале."""
+    game_data_dict = {
+        "game_id": game_id,
+        "chat_id": chat_id,
+        "player_x_id": player_x.id,
+        "player_o_id": player_o.id,
+        "player_x_user": player_x,
+        "player_o_user": player_o,
+        "x_mask": 0,
+        "o_mask": 0,
+        "current_turn_symbol": "X",
+        "clubs_rows": clubs_r,
+        "clubs_cols": clubs_c,
+        "board_size": len(clubs_r),
+        "round_start_time": now_ts,
+        "status": "active",
+        "winner_id": None,
+        "created_at": now_ts,
+        "club_data": club_data,  # снимок данных, на котором идёт эта партия
+        "answers": [],  # принятые ответы [клетка, символ, игрок] — для редкости в конце партии
+        "used_players": 0,  # битовая маска уже названных игроков (номера — ClubIndex.player_ids)
+        **extra
+    }
+    active_ttt_games[chat_id] = game_data_dict
+
+    # Сохранение в БД
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute(
+            """INSERT INTO ttt_games (game_id, chat_id, player_x_id, player_o_id, board_state, current_turn_symbol, clubs_rows, clubs_cols, board_size, round_start_time, status, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                game_id, chat_id, player_x.id, player_o.id, ttt_board.to_string(0, 0, len(clubs_r)), "X",
+                ",".join(clubs_r), ",".join(clubs_c), len(clubs_r), now_ts, "active", now_ts
+            )
+        )
+        await db.commit()
+    _log_ttt_event(game_data_dict, "start", player_x.id)
+    return game_data_dict
+
+
 @router.callback_query(F.data.startswith("ttt_accept:"))
 async def cq_ttt_accept(callback: types.CallbackQuery, state: FSMContext):
     """Обрабатывает принятие приглашения на игру."""
     global active_ttt_games
-    _, p1_id, p2_id = callback.data.split(":")
+    _, p1_id, p2_id, *size_part = callback.data.split(":")  # в старых приглашениях размера нет — 3x3
     player_x_id, player_o_id = int(p1_id), int(p2_id)
+    size = int(size_part[0]) if size_part else ttt_board.SIZE
 
     # Проверка, что кнопку нажал именно тот, кого вызывали
     if callback.from_user.id != player_o_id:
@@ -477,50 +823,22 @@ async def cq_ttt_accept(callback: types.CallbackQuery, state: FSMContext):
     now_ts = int(time.time())
     game_id = f"ttt_{chat_id}_{now_ts}"  # Создаем уникальный ID
 
-    if not ALL_CLUBS:
+    club_data = get_club_data()
+    if not club_data[1]:
         await callback.message.answer("⚠️ Ошибка: Список клубов пуст. Не могу начать игру.")
         return
 
-    clubs_r, clubs_c = pick_three_clubs_for_both()
-    if not clubs_r or not clubs_c or len(clubs_r) != 3 or len(clubs_c) != 3:
+    clubs_r, clubs_c = pick_clubs_for_both(size)
+    if len(clubs_r) != size or len(clubs_c) != size:
         await callback.message.answer(
-            f"⚠️ Ошибка: Для игры нужно 3x3 клуба. Выбрано {len(clubs_r)}x{len(clubs_c)}. Не могу начать игру.")
+            f"⚠️ Ошибка: не нашлось {size}+{size} клубов, у которых есть общие игроки для всех клеток. "
+            f"Не могу начать игру.")
         return
 
-    initial_state_str = "_" * 9
-
-    game_data_dict = {
-        "game_id": game_id,
-        "chat_id": chat_id,
-        "player_x_id": initiator.id,
-        "player_o_id": opponent.id,
-        "player_x_user": initiator,
-        "player_o_user": opponent,
-        "board_state": initial_state_str,
-        "current_turn_symbol": "X",
-        "clubs_rows": clubs_r,
-        "clubs_cols": clubs_c,
-        "round_start_time": now_ts,
-        "status": "active",
-        "winner_id": None,
-        "created_at": now_ts
-    }
-    active_ttt_games[chat_id] = game_data_dict
-
-    # Сохранение в БД
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            """INSERT INTO ttt_games (game_id, chat_id, player_x_id, player_o_id, board_state, current_turn_symbol, clubs_rows, clubs_cols, round_start_time, status, created_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                game_id, chat_id, initiator.id, opponent.id, initial_state_str, "X",
-                ",".join(clubs_r), ",".join(clubs_c), now_ts, "active", now_ts
-            )
-        )
-        await db.commit()
+    game = await _create_ttt_game(game_id, chat_id, initiator, opponent, clubs_r, clubs_c, club_data, now_ts)
 
     # Отправка игрового поля
-    board_text_str, board_markup_obj = render_board_mono_and_markup(initial_state_str, clubs_r, clubs_c)
+    board_text_str, board_markup_obj = _render_game(game)
     message_parts_list = [
         "⚽️ <b>«Крестики-Нолики»</b> ⚽️",  # <-- ИЗМЕНЕНО
         board_text_str,
@@ -563,38 +881,31 @@ async def cq_ttt_cell_choice(cb: types.CallbackQuery, state: FSMContext):
     msg_obj_cb = cb.message
     chat_id_cb = msg_obj_cb.chat.id if msg_obj_cb else 0
 
-    logger.info(f"--- cq_ttt_cell_choice (user={user_id}, chat_cb={chat_id_cb}) ---")
     current_fsm_state_for_user = await state.get_state()
     current_fsm_data_for_user = await state.get_data()
-    logger.info(
-        f"Data: {cb.data}, FSM state for user: {current_fsm_state_for_user}, FSM data for user: {current_fsm_data_for_user}")
+    log_event(logger, "ttt.cell_click", logging.DEBUG, chat=chat_id_cb, user=user_id, data=cb.data,
+              state=current_fsm_state_for_user, games=len(active_ttt_games))
 
     if not msg_obj_cb:
         logger.error("cq_ttt_cell_choice: cb.message is None. Невозможно продолжить.")
         return
 
-    # --- НОВЫЙ ЛОГ ---
-    logger.info(f"Содержимое active_ttt_games перед get: {active_ttt_games}")
-    # ------------------
     game = active_ttt_games.get(chat_id_cb)
 
     if not game or game["status"] != "active":
-        logger.warning(
-            f"Нет активной игры в active_ttt_games для chat_id={chat_id_cb} или статус не active. Game object: {game}")
+        log_event(logger, "ttt.game_missing", logging.WARNING, chat=chat_id_cb, user=user_id,
+                  status=game["status"] if game else None)
         await безопасное_редактирование_разметки(msg_obj_cb, None)
         await msg_obj_cb.answer("Игра не найдена или завершена (возможно, из-за ошибки).")
         # Очищаем состояние FSM для ТЕКУЩЕГО пользователя, если оно было связано с ЭТИМ чатом
         if current_fsm_data_for_user.get("game_chat_id") == chat_id_cb:
             await state.clear()
-            logger.info(
-                f"FSM состояние для user={user_id} в chat_id={chat_id_cb} очищено (игра не найдена/не активна).")
         return
 
     current_player_id_ingame = game["player_x_id"] if game["current_turn_symbol"] == "X" else game["player_o_id"]
-    logger.info(f"Проверка хода: callback_user_id={user_id}, current_player_id_ingame={current_player_id_ingame}")
 
     if user_id != current_player_id_ingame:
-        logger.info("Попытка хода не от текущего игрока.")
+        log_event(logger, "ttt.not_your_turn", logging.DEBUG, chat=chat_id_cb, user=user_id, expected=current_player_id_ingame)
         await msg_obj_cb.answer("Сейчас не ваш ход!")
         return
 
@@ -603,35 +914,31 @@ async def cq_ttt_cell_choice(cb: types.CallbackQuery, state: FSMContext):
     current_state_val = await state.get_state()
     if current_state_val is None:  # Если игрок был не в состоянии, вводим его
         await state.set_state(ClubConnectStates.waiting_for_cell_choice)
-        logger.info(f"User {user_id} был в None state, установлен в waiting_for_cell_choice")
 
     await state.update_data(game_chat_id=chat_id_cb)
-    logger.info(
-        f"FSM data для user={user_id} в chat={chat_id_cb} обновлено/установлено: game_chat_id={chat_id_cb}. Состояние: {await state.get_state()}")
 
     parts = cb.data.split("_")
     if len(parts) != 4 or parts[0] != "ttt" or parts[1] != "cell":
-        logger.warning(f"Неверный формат callback_data: {cb.data}")
+        logger.warning("Неверный формат callback_data: %s", cb.data)
         await msg_obj_cb.answer("Ошибка кнопки (формат).")
         return
 
     try:
         r_idx, c_idx = int(parts[2]), int(parts[3])
     except ValueError:
-        logger.warning(
-            f"Ошибка преобразования координат из callback_data: '{parts[2]}', '{parts[3]}' (оригинал: {cb.data})")
+        logger.warning("Ошибка преобразования координат из callback_data: %s", cb.data)
         await msg_obj_cb.answer("Ошибка кнопки (неверные данные координат).")
         return
 
-    if not (0 <= r_idx < 3 and 0 <= c_idx < 3):
-        logger.warning(f"Неверные координаты из callback_data: r={r_idx}, c={c_idx}")
+    size = game["board_size"]
+    if not (0 <= r_idx < size and 0 <= c_idx < size):
+        logger.warning("Неверные координаты из callback_data: r=%s, c=%s", r_idx, c_idx)
         await msg_obj_cb.answer("Неверные координаты клетки.")
         return
 
-    board_idx = r_idx * 3 + c_idx
-    if board_idx >= len(game["board_state"]) or game["board_state"][board_idx] != "_":
-        logger.info(
-            f"Клетка ({r_idx + 1},{c_idx + 1}) занята или ошибка индекса (idx={board_idx}, len={len(game['board_state'])}, val='{game['board_state'][board_idx] if board_idx < len(game['board_state']) else 'OOB'}').")
+    board_idx = r_idx * size + c_idx
+    if not ttt_board.is_free(game["x_mask"], game["o_mask"], board_idx):
+        log_event(logger, "ttt.cell_taken", logging.DEBUG, chat=chat_id_cb, user=user_id, cell=board_idx)
         await msg_obj_cb.answer("Эта клетка уже занята!")
         return
 
@@ -641,12 +948,11 @@ async def cq_ttt_cell_choice(cb: types.CallbackQuery, state: FSMContext):
 
     await state.update_data(chosen_r_idx=r_idx, chosen_c_idx=c_idx)
     await state.set_state(ClubConnectStates.waiting_for_player_name)
-    logger.info(f"FSM для user={user_id} переведен в waiting_for_player_name. Data: {await state.get_data()}")
-    logger.info(f"--- cq_ttt_cell_choice КОНЕЦ ---")
+    log_event(logger, "ttt.cell_chosen", chat=chat_id_cb, user=user_id, cell=board_idx)
 
 @router.callback_query(F.data == "ttt_ignore", StateFilter(None, ClubConnectStates.waiting_for_cell_choice))
 async def cq_ttt_ignore(cb: types.CallbackQuery): await cb.answer("Эта клетка занята.");logger.debug(
-    f"Нажата ttt_ignore user_id={cb.from_user.id}")
+    "Нажата ttt_ignore user_id=%s", cb.from_user.id)
 
 
 @router.message(ClubConnectStates.waiting_for_player_name)
@@ -656,29 +962,26 @@ async def msg_ttt_player_name_input(message: types.Message, state: FSMContext):
     fsm_data = await state.get_data()
     game_id = fsm_data.get("game_chat_id")
 
-    logger.info(f"--- msg_ttt_player_name_input (user={message.from_user.id}, game_id={game_id}) ---")
-    logger.info(f"Текст:'{message.text}', FSM data:{fsm_data}")
-
     r_idx, c_idx = fsm_data.get("chosen_r_idx"), fsm_data.get("chosen_c_idx")
 
     if game_id is None or r_idx is None or c_idx is None or game_id not in active_ttt_games:
-        logger.error(f"Критическая ошибка FSM данных или игра не найдена: game_id={game_id}, r={r_idx}, c={c_idx}")
+        logger.error("Критическая ошибка FSM данных или игра не найдена: game_id=%s, r=%s, c=%s", game_id, r_idx, c_idx)
         await message.answer("Ошибка состояния игры. Пожалуйста, начните новую игру командой /ttt.")
         await state.clear()
         return
 
     game = active_ttt_games.get(game_id)  # Получаем актуальные данные игры
     if not game or game["status"] != "active":  # Дополнительная проверка
-        logger.warning(
-            f"Игра {game_id} не найдена в active_ttt_games или уже не активна (статус: {game.get('status') if game else 'N/A'})")
+        log_event(logger, "ttt.game_missing", logging.WARNING, chat=game_id, user=message.from_user.id,
+                  status=game.get("status") if game else None)
         await message.answer("Игра не активна или завершена.")
         await state.clear()
         return
 
     current_pid_ingame = game["player_x_id"] if game["current_turn_symbol"] == "X" else game["player_o_id"]
     if message.from_user.id != current_pid_ingame:
-        logger.info(
-            f"Ввод имени не от текущего игрока (ожидался {current_pid_ingame}, получен от {message.from_user.id})")
+        log_event(logger, "ttt.not_your_turn", logging.DEBUG, chat=game_id, user=message.from_user.id,
+                  expected=current_pid_ingame)
         return
 
     cancel_turn_timer(game_id)  # Игрок сделал ход (прислал сообщение), отменяем его текущий таймер
@@ -691,37 +994,49 @@ async def msg_ttt_player_name_input(message: types.Message, state: FSMContext):
         return
 
     player_name_guess_lower = player_name_guess_raw.lower()
-    board_idx = r_idx * 3 + c_idx
+    size = game["board_size"]
+    board_idx = r_idx * size + c_idx
 
     # --- ИСПРАВЛЕНИЕ ЗДЕСЬ ---
     club_r, club_c = game["clubs_rows"][r_idx], game["clubs_cols"][c_idx]
     # --------------------------
 
-    players_r_set = CLUB_PLAYERS.get(club_r, set())
-    players_c_set = CLUB_PLAYERS.get(club_c, set())
-    valid_names_for_cell = players_r_set.intersection(players_c_set)
+    valid_names_for_cell = _cell_answers(game, board_idx)  # пересечение клубов берётся из кэша индекса
 
-    logger.debug(
-        f"Проверка: '{player_name_guess_lower}' для клубов ({club_r},{club_c}). Найденные валидные имена (пересечение): {valid_names_for_cell}")
+    log_event(logger, "ttt.check", logging.DEBUG, chat=game_id, guess=player_name_guess_lower,
+              row=club_r, col=club_c, candidates=len(valid_names_for_cell))
 
     next_turn_sym = "O" if game["current_turn_symbol"] == "X" else "X"
     next_player_obj = game["player_o_user"] if game["current_turn_symbol"] == "X" else game["player_x_user"]
 
     pass_turn = True
     found_match_name_in_db = None
+    best_s = 0
+    used_match_name = None  # лучшее совпадение среди уже названных игроков — чтобы объяснить отказ
 
     if not valid_names_for_cell:
-        logger.warning(f"Для клубов ({club_r},{club_c}) не найдено пересечений игроков в базе!")
+        logger.warning("Для клубов (%s,%s) не найдено пересечений игроков в базе!", club_r, club_c)
         await message.answer(
             f"🤔 Для клубов ({club_r.capitalize()} и {club_c.capitalize()}) в базе нет общих игроков. Ход переходит к {mention_user(next_player_obj)} ({next_turn_sym}).")
     else:
-        best_s = 0
         threshold = 80
 
-        for name_db_loop_var in valid_names_for_cell:
+        used_best_s = 0
+        # Сначала точное совпадение по ключу имени — один поиск в индексе; нечёткий перебор — если его нет
+        for name_db_loop_var in _key_matches(game, player_name_guess_lower):
+            if name_db_loop_var not in valid_names_for_cell:
+                continue
+            if not _is_used(game, name_db_loop_var):
+                best_s, found_match_name_in_db = 100, name_db_loop_var
+                break
+            used_best_s, used_match_name = 100, name_db_loop_var
+        for name_db_loop_var in (valid_names_for_cell if found_match_name_in_db is None else ()):
             score = fuzz.token_set_ratio(player_name_guess_lower, name_db_loop_var)
-            logger.debug(
-                f"Сравнение (token_set_ratio): '{player_name_guess_lower}' vs '{name_db_loop_var}', схожесть: {score}%")
+            if _is_used(game, name_db_loop_var):
+                # Каждого игрока можно назвать один раз за партию: ищем лучшего среди ещё не названных
+                if score >= threshold and score > used_best_s:
+                    used_best_s, used_match_name = score, name_db_loop_var
+                continue
             if score > best_s:
                 best_s = score
                 # Если нашли совпадение выше порога, запоминаем его как кандидата
@@ -732,29 +1047,49 @@ async def msg_ttt_player_name_input(message: types.Message, state: FSMContext):
 
         # После цикла проверяем, было ли найдено достаточно хорошее совпадение
         if found_match_name_in_db and best_s >= threshold:
-            logger.info(
-                f"Игрок '{player_name_guess_raw}' принят как '{found_match_name_in_db.capitalize()}' (лучшая схожесть: {best_s}%)")
             pass_turn = False
+        elif used_match_name:
+            await message.answer(
+                f"🔁 {used_match_name.capitalize()} уже был назван в этой партии — каждого игрока можно назвать "
+                f"только один раз. Ход к {mention_user(next_player_obj)} ({next_turn_sym}).")
         else:
-            logger.info(
-                f"Игрок '{player_name_guess_raw}' не найден с достаточной похожестью (лучшая: {best_s}% из порога {threshold}%). Ход передается.")
+            hint_text = ""
+            if not name_index.is_known(player_name_guess_lower):
+                # Только про опечатку: какие известные фамилии похожи на введённую (ответ клетки не подсказываем)
+                hints = name_index.suggest(player_name_guess_lower)
+                if hints:
+                    hint_text = f"\nВозможно, вы имели в виду: {', '.join(h.capitalize() for h in hints)}."
             await message.answer(
-                f"❌ «{player_name_guess_raw.capitalize()}» не очень похож на подходящих игроков. Ход к {mention_user(next_player_obj)} ({next_turn_sym}).")
+                f"❌ «{player_name_guess_raw.capitalize()}» не очень похож на подходящих игроков. Ход к {mention_user(next_player_obj)} ({next_turn_sym})."
+                f"{hint_text}")
+
+    log_event(logger, "ttt.move", chat=game_id, user=message.from_user.id, cell=board_idx,
+              accepted=not pass_turn, score=best_s, reused=used_match_name is not None)
 
     game_ended_this_turn = False  # Флаг, что игра завершилась на этом ходу
+    game["round_start_time"] = int(time.time())
     if pass_turn:
         game["current_turn_symbol"] = next_turn_sym
+        _log_ttt_event(game, "pass", message.from_user.id, cell=board_idx, guess=player_name_guess_raw)
     else:  # Успешный ход (pass_turn is False)
-        logger.info(
-            f"Имя '{found_match_name_in_db.capitalize() if found_match_name_in_db else player_name_guess_raw}' принято для клетки ({r_idx + 1},{c_idx + 1}).")
-        new_b_list = list(game["board_state"])
-        new_b_list[board_idx] = game["current_turn_symbol"]
-        game["board_state"] = "".join(new_b_list)
+        mover_symbol = game["current_turn_symbol"]
+        game["x_mask"], game["o_mask"] = ttt_board.place(game["x_mask"], game["o_mask"], board_idx, mover_symbol)
+        game["answers"].append([board_idx, mover_symbol, found_match_name_in_db])
+        _mark_used(game, found_match_name_in_db)
+        answer_stats.record(club_r, club_c, found_match_name_in_db)
+
+        # Исход позиции — один поиск в заранее посчитанной таблице
+        outcome = ttt_board.outcome(game["x_mask"], game["o_mask"], size)
+        winner = {ttt_board.X_WINS: "X", ttt_board.O_WINS: "O"}.get(outcome & ttt_board.RESULT_MASK)
+        if outcome & ttt_board.RESULT_MASK == ttt_board.ONGOING:
+            # Игра продолжается, передаем ход
+            game["current_turn_symbol"] = next_turn_sym
+        _log_ttt_event(game, "move", message.from_user.id, cell=board_idx, symbol=mover_symbol,
+                       name=found_match_name_in_db)
 
-        winner = check_winner(game["board_state"])
         if winner:
             game_ended_this_turn = True
-            logger.info(f"Игра {game_id} завершена. Победитель: {winner}")
+            log_event(logger, "ttt.finished", chat=game_id, winner=winner)
             game.update(
                 {"status": "finished", "winner_id": game["player_x_id"] if winner == "X" else game["player_o_id"],
                  "ended_at": int(time.time())})
@@ -762,21 +1097,19 @@ async def msg_ttt_player_name_input(message: types.Message, state: FSMContext):
             w_user_obj = game["player_x_user"] if winner == "X" else game["player_o_user"]
             l_id = game["player_o_id"] if winner == "X" else game["player_x_id"]
             await _save_ttt_result_db(game["winner_id"], l_id)
-            f_b_txt, _ = render_board_mono_and_markup(game["board_state"], game["clubs_rows"], game["clubs_cols"])
-            await message.answer(f"{f_b_txt}\n🏆 <b>Победа {mention_user(w_user_obj)} ({winner})!</b>",
+            f_b_txt, _ = _render_game(game)
+            await message.answer(f"{f_b_txt}\n🏆 <b>Победа {mention_user(w_user_obj)} ({winner})!</b>"
+                                 f"{_rarity_summary(game)}",
                                  parse_mode="HTML")
-        elif "_" not in game["board_state"]:  # Ничья
+        elif outcome == ttt_board.DRAW:  # Ничья
             game_ended_this_turn = True
-            logger.info(f"Игра {game_id} завершена. Ничья.")
+            log_event(logger, "ttt.finished", chat=game_id, winner=None)
             game.update({"status": "finished", "ended_at": int(time.time())})  # winner_id остается None
             await _update_ttt_game_in_db(game)
             await _save_ttt_draw_db(game["player_x_id"], game["player_o_id"])
-            f_b_txt, _ = render_board_mono_and_markup(game["board_state"], game["clubs_rows"], game["clubs_cols"])
-            await message.answer(f"{f_b_txt}\n🤝 <b>Ничья! Все клетки заполнены.</b>", parse_mode="HTML")
-        else:
-            # Игра продолжается, передаем ход
-            game["current_turn_symbol"] = next_turn_sym
-            logger.info(f"Ход передан игроку с символом {next_turn_sym}")
+            f_b_txt, _ = _render_game(game)
+            await message.answer(f"{f_b_txt}\n🤝 <b>Ничья! Все клетки заполнены.</b>{_rarity_summary(game)}",
+                                 parse_mode="HTML")
 
     if game_ended_this_turn:
         if game_id in active_ttt_games:
@@ -785,35 +1118,44 @@ async def msg_ttt_player_name_input(message: types.Message, state: FSMContext):
         return  # Выходим, новый таймер и поле не нужны
 
     # Если игра продолжается (ход передан или успешно сделан, но не конец игры)
-    await _update_ttt_game_in_db(game)  # Сохраняем актуальное состояние игры в БД
-
-    board_txt, board_mkp = render_board_mono_and_markup(game["board_state"], game["clubs_rows"], game["clubs_cols"])
+    board_txt, board_mkp = _render_game(game)
     active_player_now_obj = game["player_x_user"] if game["current_turn_symbol"] == "X" else game["player_o_user"]
     msg_parts_upd = [board_txt,
                      f"Ход: {mention_user(active_player_now_obj)} ({game['current_turn_symbol']}). Выберите клетку."]
+    if not pass_turn and ttt_board.is_dead(game["x_mask"], game["o_mask"], size):
+        # Линию не соберёт никто: предлагаем закончить сразу (одной команды /draw достаточно)
+        msg_parts_upd.append("🤝 Собрать линию уже не сможет никто — партия идёт к ничьей. "
+                             "Любой из игроков может закончить её сразу: <code>/draw</code>")
     await message.answer("\n".join(msg_parts_upd), reply_markup=board_mkp, parse_mode="HTML")
 
     # Устанавливаем состояние для ТЕКУЩЕГО пользователя (который только что сделал ход или ошибся)
     # чтобы он мог реагировать на кнопки в следующем сообщении, если ход вернется к нему
     await state.set_state(ClubConnectStates.waiting_for_cell_choice)
     await state.update_data(game_chat_id=game_id, chosen_r_idx=None, chosen_c_idx=None)  # Очищаем выбранные клетки
-    logger.info(
-        f"FSM для user={message.from_user.id} (после его хода/ошибки) -> waiting_for_cell_choice. Data: {await state.get_data()}")
 
-    # Запускаем таймер для СЛЕДУЮЩЕГО игрока (кому перешел ход)
-    next_player_for_timer_id = active_player_now_obj.id  # Это ID того, чей ход сейчас
-    asyncio.create_task(start_turn_timer(game_id, game["current_turn_symbol"], next_player_for_timer_id))
+    # Запускаем таймер для СЛЕДУЮЩЕГО игрока (кому перешел ход) или ход бота
+    _start_next_turn(game_id, game)
+
+dispatch_index.state(ClubConnectStates.waiting_for_player_name, msg_ttt_player_name_input)
+
 
-    logger.info(f"--- msg_ttt_player_name_input КОНЕЦ ---")
 async def _update_ttt_game_in_db(game_data: Dict[str, Any]): # Было g_data
+    """
+    Фиксирует конец партии: событие result, запись в архиве истории и итоговая строка ttt_games.
+    Ходы по ходу игры пишутся в журнал событий (_log_ttt_event).
+    """
+    _log_ttt_event(game_data, "result", game_data.get("winner_id"), status=game_data["status"])
+    game_log.finish("ttt", game_data["game_id"], game_data["chat_id"], game_data["player_x_id"],
+                    game_data["player_o_id"], game_data["status"], game_data.get("winner_id"),
+                    game_data.get("created_at"), game_data.get("ended_at"))
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
             """UPDATE ttt_games 
-               SET state=?, turn=?, round_start_time=?, status=?, 
-                   winner=?, ended_at=?, clubs_rows=?, clubs_cols=? 
-               WHERE chat_id=?""",
+               SET board_state=?, current_turn_symbol=?, round_start_time=?, status=?, 
+                   winner_id=?, ended_at=?, clubs_rows=?, clubs_cols=? 
+               WHERE game_id=?""",
             (
-                game_data["board_state"],
+                ttt_board.to_string(game_data["x_mask"], game_data["o_mask"], game_data["board_size"]),
                 game_data["current_turn_symbol"],
                 game_data["round_start_time"],
                 game_data["status"],
@@ -821,12 +1163,15 @@ async def _update_ttt_game_in_db(game_data: Dict[str, Any]): # Было g_data
                 game_data.get("ended_at"),
                 ",".join(game_data["clubs_rows"]),
                 ",".join(game_data["clubs_cols"]),
-                game_data["chat_id"]
+                game_data["game_id"]
             )
         )
         await db.commit()
 
 async def _save_ttt_result_db(winner_id: int, loser_id: int):
+    if bot.id in (winner_id, loser_id):
+        return  # игры против бота — тренировка, в таблицы и рейтинг не идут
+    rating.record_match(winner_id, loser_id, 1.0, "ttt")
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
             """INSERT INTO ttt_leaderboard(user_id, wins)
@@ -843,6 +1188,9 @@ async def _save_ttt_result_db(winner_id: int, loser_id: int):
         await db.commit()
 
 async def _save_ttt_draw_db(player_x_id: int, player_o_id: int):
+    if bot.id in (player_x_id, player_o_id):
+        return  # игры против бота — тренировка, в таблицы и рейтинг не идут
+    rating.record_match(player_x_id, player_o_id, 0.5, "ttt")
     async with aiosqlite.connect(DB_PATH) as db:
         for player_id_loop_var in [player_x_id, player_o_id]: # Было p_id_loop_var
             await db.execute(
@@ -876,8 +1224,8 @@ async def cmd_ttt_cancel(message: types.Message, state: FSMContext):
     opponent_user = game["player_o_user"] if is_player_x else game["player_x_user"]
     cancel_requester_id = game.get("cancel_requester_id")
 
-    if cancel_requester_id:
-        if cancel_requester_id == opponent_user.id:
+    if cancel_requester_id or _is_ai_game(game):
+        if cancel_requester_id == opponent_user.id or _is_ai_game(game):  # бот соглашается на отмену сразу
             logger.info(f"Отмена игры в чате {chat_id} подтверждена пользователем {user.id}.")
 
             # 1. Останавливаем таймер
@@ -962,7 +1310,7 @@ async def cmd_ttt_surrender(message: types.Message, state: FSMContext):
 
     # 6. Отправляем сообщение
     await message.answer(
-        f"🏳️ {mention_user(user)} сдаётся! Победа присуждается {mention_user(winner_user)}!",
+        f"🏳️ {mention_user(user)} сдаётся! Победа присуждается {mention_user(winner_user)}!{_rarity_summary(game)}",
         parse_mode="HTML"
     )
 
@@ -989,8 +1337,18 @@ async def cmd_ttt_draw(message: types.Message, state: FSMContext):
     opponent_user = game["player_o_user"] if is_player_x else game["player_x_user"]
     draw_requester_id = game.get("draw_requester_id")
 
-    if draw_requester_id:
-        if draw_requester_id == opponent_user.id:
+    dead_board = ttt_board.is_dead(game["x_mask"], game["o_mask"], game["board_size"])
+    draw_text = "🤝 Ничья: собрать линию уже никто не может." if dead_board else "🤝 Ничья по взаимному согласию!"
+    if _is_ai_game(game) and not dead_board:
+        # Бот соглашается на ничью, только если сам выигрывает не чаще, чем в половине случаев
+        await ttt_ai.prepare(_ai_grid(game))
+        if ttt_ai.win_chance(_ai_grid(game), game["x_mask"], game["o_mask"],
+                             bot_to_move=game["current_turn_symbol"] == "O") > 0.5:
+            await message.answer("🤖 Бот отказывается от ничьей — у него хорошие шансы.")
+            return
+        dead_board = True
+    if draw_requester_id or dead_board:
+        if draw_requester_id == opponent_user.id or dead_board:
             logger.info(f"Ничья в чате {chat_id} подтверждена {user.id}.")
 
             # 1. Останавливаем таймер
@@ -1012,108 +1370,7 @@ async def cmd_ttt_draw(message: types.Message, state: FSMContext):
             await state.clear()
 
             # 6. Отправляем сообщение
-            await message.answer("🤝 Ничья по взаимному согласию!", parse_mode="HTML")
-        elif draw_requester_id == user.id:
-            await message.answer("Вы уже предложили ничью. Ожидаем ответа от оппонента.")
-    else:
-        logger.info(f"{user.id} предлагает ничью в чате {chat_id}.")
-        game["draw_requester_id"] = user.id
-        await message.answer(
-            f"🤝 {mention_user(user)} предлагает ничью.\n"
-            f"{mention_user(opponent_user)}, отправьте <code>/draw</code> для согласия.",
-            parse_mode="HTML"
-        )
-
-
-@router.message(Command("surrender", "giveup"))
-async def cmd_ttt_surrender(message: types.Message, state: FSMContext):
-    """Позволяет игроку немедленно сдаться."""
-    global active_ttt_games
-    chat_id = message.chat.id
-    user = message.from_user
-    if not user: return
-
-    game = active_ttt_games.get(chat_id)
-
-    if not game or game.get("status") != "active":
-        await message.answer("Нет активной игры, чтобы сдаваться.")
-        return
-
-    is_player_x = user.id == game["player_x_id"]
-    is_player_o = user.id == game["player_o_id"]
-
-    if not (is_player_x or is_player_o):
-        await message.answer("Вы не являетесь участником этой игры.")
-        return
-
-    # Определяем победителя и проигравшего
-    winner_id = game["player_o_id"] if is_player_x else game["player_x_id"]
-    loser_id = user.id
-    winner_user = game["player_o_user"] if is_player_x else game["player_x_user"]
-
-    logger.info(f"Игрок {loser_id} сдался в чате {chat_id}. Победитель: {winner_id}")
-
-    # Завершаем игру
-    cancel_turn_timer(chat_id)
-    game.update({
-        "status": "finished",
-        "winner_id": winner_id,
-        "ended_at": int(time.time())
-    })
-
-    # Сохраняем результаты
-    await _update_ttt_game_in_db(game)
-    await _save_ttt_result_db(winner_id, loser_id)
-
-    # Чистим кэш и состояние
-    if chat_id in active_ttt_games:
-        del active_ttt_games[chat_id]
-    await state.clear()
-
-    await message.answer(
-        f"🏳️ {mention_user(user)} сдаётся! Победа присуждается {mention_user(winner_user)}!",
-        parse_mode="HTML"
-    )
-
-
-@router.message(Command("draw", "peace"))
-async def cmd_ttt_draw(message: types.Message, state: FSMContext):
-    """Предложить или принять ничью."""
-    global active_ttt_games
-    chat_id = message.chat.id
-    user = message.from_user
-    if not user: return
-
-    game = active_ttt_games.get(chat_id)
-
-    if not game or game.get("status") != "active":
-        await message.answer("Нет активной игры.")
-        return
-
-    is_player_x = user.id == game["player_x_id"]
-    is_player_o = user.id == game["player_o_id"]
-
-    if not (is_player_x or is_player_o):
-        await message.answer("Вы не участник этой игры.")
-        return
-
-    opponent_user = game["player_o_user"] if is_player_x else game["player_x_user"]
-    draw_requester_id = game.get("draw_requester_id")
-
-    if draw_requester_id:
-        if draw_requester_id == opponent_user.id:
-            logger.info(f"Ничья в чате {chat_id} подтверждена {user.id}.")
-            cancel_turn_timer(chat_id)
-            game.update({"status": "finished", "ended_at": int(time.time())})  # winner_id остается None
-
-            await _update_ttt_game_in_db(game)
-            await _save_ttt_draw_db(game["player_x_id"], game["player_o_id"])
-
-            if chat_id in active_ttt_games:
-                del active_ttt_games[chat_id]
-            await state.clear()
-
-            await message.answer("🤝 Ничья по взаимному согласию!", parse_mode="HTML")
+            await message.answer(f"{draw_text}{_rarity_summary(game)}", parse_mode="HTML")
         elif draw_requester_id == user.id:
             await message.answer("Вы уже предложили ничью. Ожидаем ответа от оппонента.")
     else:
@@ -1176,11 +1433,12 @@ async def cmd_ttt_history(message: types.Message):
     """Показывает историю последних 5 игр в чате."""
     chat_id = message.chat.id
 
+    await game_log.flush()  # только что закончившаяся партия могла ещё не дойти до архива
     async with aiosqlite.connect(DB_PATH) as db:
         cursor = await db.execute(
-            """SELECT player_x, player_o, status, winner, ended_at 
-               FROM ttt_games 
-               WHERE chat_id = ? AND status IN ('finished', 'canceled') 
+            """SELECT player1, player2, status, winner, ended_at 
+               FROM game_history 
+               WHERE game_type = 'ttt' AND chat_id = ? 
                ORDER BY ended_at DESC LIMIT 5""",
             (chat_id,)
         )
@@ -1261,6 +1519,8 @@ async def cmd_ttt_help(message: types.Message):
         "<b>📜 Справка по игре Club Connect 📜</b>\n",
         "<b>Основные команды:</b>",
         "<code>/ttt</code> (в ответ на сообщение) - Начать новую игру с пользователем.",
+        "<code>/ttt 4</code>, <code>/ttt 5</code> - То же на поле 4x4 (4 в ряд) или 5x5 (4 в ряд).",
+        "<code>/ttt_ai</code> - Сыграть против бота; <code>/ttt_ai 80</code> — бот знает 80% игроков.",
         "<code>/cancel</code> - Предложить отмену текущей игры. Требует подтверждения от оппонента.",
         "<code>/surrender</code> - Немедленно сдаться, засчитав себе поражение.\n",
         "<b>Статистика и информация:</b>",
@@ -1270,6 +1530,10 @@ async def cmd_ttt_help(message: types.Message):
         "<code>/clubs</code> - Напомнить, какие клубы участвуют в текущей игре.\n",
         "<b>Прочее:</b>",
         "<code>/draw</code> - Предложить ничью. Требует подтверждения.",
-        "<code>/ttt_help</code> - Показать это сообщение."
+        "<code>/ttt_help</code> - Показать это сообщение.\n",
+        "Каждого футболиста можно назвать только один раз за партию.\n",
+        "На кнопке свободной клетки — сколько подходящих игроков есть в базе. "
+        "В конце партии для каждого ответа показывается его редкость: какой процент игроков "
+        "называл в этой клетке того же футболиста (меньше — оригинальнее)."
     ]
     await message.answer("\n".join(help_text), parse_mode="HTML")
\ No newline at end of file
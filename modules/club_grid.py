@@ -0,0 +1,124 @@
+# modules/club_grid.py
+#
+# Подбор клубов для поля Club Connect NxN. Поле годится, только если у каждой
+# пары «клуб строки — клуб столбца» есть хотя бы один общий игрок; для 5x5 это
+# 25 пар, и перебирать случайные наборы с пересечением множеств вслепую долго.
+#
+# Поэтому по данным один раз строится индекс:
+#   - у каждого игрока — битовая маска его клубов,
+#   - у каждого клуба — маска смежности (клубы, с которыми есть общий игрок):
+#     ИЛИ масок всех его игроков,
+#   - для каждого N — маска клубов, которые вообще могут стоять в поле NxN
+#     (у клуба должно быть не меньше N соседей среди таких же клубов; считается
+#     отсечением, как k-ядро графа, один раз на размер).
+# Поиск — перебор с возвратом по маскам, строки и столбцы добираются по очереди:
+# кандидаты стороны — И масок смежности клубов другой стороны; ветка отсекается,
+# как только кандидатов меньше, чем осталось выбрать.
+# Пересечения пар клубов (ответы для клетки) кэшируются в индексе.
+# Игрокам выдаются короткие номера (player_ids) — по ним партия ведёт битовую
+# маску уже названных игроков. by_key — игроки по ключу имени (modules/name_keys.py),
+# чтобы ответ латиницей или с «ё» находился одним поиском.
+
+import logging
+import random
+from typing import Optional
+
+from modules.name_keys import name_key
+
+logger = logging.getLogger(__name__)
+
+SEARCH_BUDGET = 20_000  # шагов перебора на один подбор поля
+
+
+class ClubIndex:
+    def __init__(self, club_players: dict[str, set[str]]):
+        self.source = club_players
+        self.clubs: list[str] = sorted(club for club, players in club_players.items() if players)
+        bits = {club: i for i, club in enumerate(self.clubs)}
+        player_clubs: dict[str, int] = {}
+        for club in self.clubs:
+            bit = 1 << bits[club]
+            for player in club_players[club]:
+                player_clubs[player] = player_clubs.get(player, 0) | bit
+
+        # Номер игрока — позиция в отсортированном списке: для одних и тех же данных всегда один и тот же
+        self.player_ids: dict[str, int] = {player: i for i, player in enumerate(sorted(player_clubs))}
+        self.by_key: dict[str, list[str]] = {}
+        for player in self.player_ids:
+            self.by_key.setdefault(name_key(player), []).append(player)
+
+        adjacency = [0] * len(self.clubs)
+        for mask in set(player_clubs.values()):
+            rest = mask
+            while rest:
+                low = rest & -rest
+                adjacency[low.bit_length() - 1] |= mask
+                rest ^= low
+        self.adjacency: list[int] = [mask & ~(1 << i) for i, mask in enumerate(adjacency)]
+        self._eligible: dict[int, int] = {}
+        self._common: dict[tuple[str, str], frozenset[str]] = {}
+
+    def eligible(self, size: int) -> int:
+        """Маска клубов, у которых не меньше size соседей среди таких же клубов (считается один раз на размер)."""
+        mask = self._eligible.get(size)
+        if mask is None:
+            mask = (1 << len(self.clubs)) - 1
+            changed = True
+            while changed:
+                changed = False
+                for i in range(len(self.clubs)):
+                    if mask >> i & 1 and (self.adjacency[i] & mask).bit_count() < size:
+                        mask &= ~(1 << i)
+                        changed = True
+            self._eligible[size] = mask
+        return mask
+
+    def common(self, club_a: str, club_b: str) -> frozenset[str]:
+        """Игроки, которые есть у обоих клубов (ответы для клетки)."""
+        key = (club_a, club_b) if club_a <= club_b else (club_b, club_a)
+        players = self._common.get(key)
+        if players is None:
+            players = self._common[key] = frozenset(self.source.get(club_a, set()) & self.source.get(club_b, set()))
+        return players
+
+    def pick(self, size: int, rng: random.Random = random) -> Optional[tuple[list[str], list[str]]]:
+        """Случайное поле size x size, в котором у каждой клетки есть ответ; None — такого не нашлось."""
+        eligible = self.eligible(size)
+        if eligible.bit_count() < 2 * size:
+            return None
+        budget = [SEARCH_BUDGET]
+        noise = {i: rng.random() for i in range(len(self.clubs)) if eligible >> i & 1}
+
+        def extend(sides: tuple[list[int], list[int]], candidates: list[int], used: int) -> bool:
+            # Достраиваем по очереди строки и столбцы: кандидаты стороны — клубы, смежные со всеми клубами другой
+            if len(sides[0]) == len(sides[1]) == size:
+                return True
+            side = 0 if len(sides[0]) <= len(sides[1]) else 1
+            other = 1 - side
+            options = [i for i in noise if (candidates[side] & ~used) >> i & 1]
+            # Сначала клубы, которые оставляют другой стороне больше кандидатов (с разбросом, чтобы поля не повторялись)
+            options.sort(key=lambda i: (self.adjacency[i] & candidates[other] & ~used).bit_count() * (1 + noise[i]),
+                         reverse=True)
+            for club in options:
+                budget[0] -= 1
+                if budget[0] < 0:
+                    return False
+                mask = used | 1 << club
+                narrowed = candidates[other] & self.adjacency[club]
+                if (narrowed & ~mask).bit_count() < size - len(sides[other]):
+                    continue
+                if (candidates[side] & ~mask).bit_count() < size - len(sides[side]) - 1:
+                    continue
+                sides[side].append(club)
+                next_candidates = list(candidates)
+                next_candidates[other] = narrowed
+                if extend(sides, next_candidates, mask):
+                    return True
+                sides[side].pop()
+            return False
+
+        rows: list[int] = []
+        columns: list[int] = []
+        if not extend((rows, columns), [eligible, eligible], 0):
+            return None
+        return [self.clubs[i] for i in rows], [self.clubs[i] for i in columns]
@@ -0,0 +1,183 @@
+# modules/data_registry.py
+
+import asyncio
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from config import DATA_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class DataSnapshot:
+    """
+    Неизменяемый набор индексов, построенных из файлов data/.
+    Игры, начатые на старом снимке, держат ссылку на него и доигрывают
+    на тех же данных, даже если registry уже переключился на новый.
+    """
+
+    def __init__(self, version: int, indexes: Dict[str, Any]):
+        self.version = version
+        self._indexes = indexes
+
+    def __getitem__(self, name: str) -> Any:
+        return self._indexes[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._indexes
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self._indexes.get(name, default)
+
+
+class DataRegistry:
+    """
+    Реестр игровых данных с горячей перезагрузкой.
+
+    Модули регистрируют источник: имя индекса, список файлов и функцию сборки.
+    Фоновая задача опрашивает файлы (mtime, затем хэш содержимого), пересобирает
+    только затронутые индексы в отдельном потоке и атомарно подменяет текущий снимок.
+
+    Функция сборки бросает исключение, если файл не читается или данных нет, — тогда
+    в снимке остаётся старый индекс, а отпечатки файлов не обновляются, так что
+    сборка повторится при следующей проверке.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Tuple[Tuple[Path, ...], Callable[[], Any]]] = {}
+        # (источник, путь) -> (mtime, size, sha1) файла, из которого индекс собран успешно
+        self._file_state: Dict[Tuple[str, Path], Tuple[float, int, str]] = {}
+        self._failed: Dict[str, str] = {}  # источник -> последняя ошибка сборки
+        self._current = DataSnapshot(0, {})
+        self._build_lock = threading.Lock()  # не даём двум сборкам идти одновременно
+        self._watch_task: Optional[asyncio.Task] = None
+
+    # --- Регистрация и чтение ---
+
+    def register(self, name: str, paths: Iterable[Path], builder: Callable[[], Any],
+                 fallback: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Регистрирует источник данных и сразу строит его индекс (синхронно, как
+        раньше при импорте модуля). Возвращает построенный индекс.
+
+        Если сборка не удалась, а fallback задан, в снимок кладётся fallback()
+        (пустые данные), и сборка повторяется при каждой проверке файлов, пока не
+        пройдёт. Без fallback ошибка пробрасывается.
+        """
+        paths = tuple(Path(p) for p in paths)
+        with self._build_lock:
+            self._sources[name] = (paths, builder)
+            states = {path: self._fingerprint(path) for path in paths}
+            try:
+                index = builder()
+            except Exception as e:
+                if fallback is None:
+                    raise
+                logger.error(f"Не удалось собрать индекс '{name}', пока он пуст: {e}")
+                self._failed[name] = str(e)
+                index = fallback()
+                states = {path: (0.0, -2, "") for path in paths}  # заведомо «изменились»
+            for path, state in states.items():
+                self._file_state[(name, path)] = state
+            indexes = dict(self._current._indexes)
+            indexes[name] = index
+            self._current = DataSnapshot(self._current.version + 1, indexes)
+        return index
+
+    def current(self) -> DataSnapshot:
+        """Текущий снимок. В рамках одного хэндлера лучше взять его один раз."""
+        return self._current
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self._current.get(name, default)
+
+    # --- Отслеживание изменений ---
+
+    @staticmethod
+    def _fingerprint(path: Path) -> Tuple[float, int, str]:
+        try:
+            st = path.stat()
+            digest = hashlib.sha1(path.read_bytes()).hexdigest()
+            return st.st_mtime, st.st_size, digest
+        except OSError:
+            return 0.0, -1, ""
+
+    def _changed_files(self, name: str, paths: Tuple[Path, ...]) -> Dict[Path, Tuple[float, int, str]]:
+        """
+        Новые отпечатки файлов источника, содержимое которых изменилось с последней
+        удачной сборки. Сохраняет их reload_changed — только после успешной сборки.
+        """
+        changed = {}
+        for path in paths:
+            mtime, size, digest = self._file_state[(name, path)]
+            try:
+                st = path.stat()
+                new_mtime, new_size = st.st_mtime, st.st_size
+            except OSError:
+                new_mtime, new_size = 0.0, -1
+            if (new_mtime, new_size) == (mtime, size):
+                continue
+            # mtime сменился — сверяем хэш, чтобы не пересобирать индекс после простого touch
+            new_state = self._fingerprint(path)
+            if new_state[2] == digest:
+                self._file_state[(name, path)] = new_state
+            else:
+                changed[path] = new_state
+        return changed
+
+    def reload_changed(self) -> Optional[DataSnapshot]:
+        """
+        Пересобирает индексы, чьи файлы изменились, и подменяет снимок.
+        Блокирующая функция: вызывать из потока (см. watch).
+        """
+        with self._build_lock:
+            indexes = dict(self._current._indexes)
+            rebuilt = []
+            for name, (paths, builder) in self._sources.items():
+                changed = self._changed_files(name, paths)
+                if not changed:
+                    continue
+                try:
+                    indexes[name] = builder()
+                except Exception as e:
+                    # Пока файл битый, сборка повторяется на каждой проверке; в лог — только новые ошибки
+                    if self._failed.get(name) != str(e):
+                        logger.error(f"Не удалось пересобрать индекс '{name}', оставляем старый: {e}", exc_info=True)
+                    self._failed[name] = str(e)
+                    continue
+                for path, state in changed.items():
+                    self._file_state[(name, path)] = state
+                if self._failed.pop(name, None) is not None:
+                    logger.info(f"Индекс '{name}' снова собирается без ошибок.")
+                rebuilt.append(name)
+            if not rebuilt:
+                return None
+            # Присваивание ссылки атомарно: хэндлеры видят либо старый, либо новый снимок целиком
+            self._current = DataSnapshot(self._current.version + 1, indexes)
+        logger.info(f"Данные перезагружены (версия {self._current.version}): {', '.join(rebuilt)}")
+        return self._current
+
+    async def watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload_changed)
+            except Exception as e:
+                logger.error(f"Ошибка при проверке файлов данных: {e}", exc_info=True)
+
+    async def start_watching(self):
+        if DATA_RELOAD_INTERVAL <= 0 or self._watch_task:
+            return
+        self._watch_task = asyncio.create_task(self.watch(DATA_RELOAD_INTERVAL))
+        logger.info(f"Отслеживание data/ запущено (каждые {DATA_RELOAD_INTERVAL}с).")
+
+    async def stop_watching(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+
+data_registry = DataRegistry()
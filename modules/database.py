@@ -6,9 +6,10 @@ import logging
 from pathlib import Path
 from typing import Optional
 
+from config import DB_PATH
+
 # --- Константы ---
 BASE_DIR = Path(__file__).parent.parent
-DB_PATH = BASE_DIR / "bot.db"
 logger = logging.getLogger(__name__)
 
 # --- Утилиты для работы с БД ---
@@ -25,6 +26,10 @@ async def init_db():
     - footle_state    — текущее состояние Footle
     - user_rating     — очки пользователей
     - solo_progress   — сохранённый уровень Solo Guess
+    - player_ids      — короткие числовые id игроков (для битовых масок)
+    - solo_seen       — какие игроки уже попадались пользователю в Solo Guess
+    - solo_player_stats — статистика ответов и сложность (Elo) игроков Solo Guess
+    - solo_user_skill   — навык (Elo) пользователей в Solo Guess
     """
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
@@ -54,6 +59,42 @@ async def init_db():
             );
             """
         )
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS player_ids (
+                pid        INTEGER PRIMARY KEY AUTOINCREMENT,
+                player_key TEXT NOT NULL UNIQUE
+            );
+            """
+        )
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS solo_seen (
+                user_id INTEGER PRIMARY KEY,
+                seen    BLOB NOT NULL
+            );
+            """
+        )
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS solo_player_stats (
+                player_key TEXT PRIMARY KEY,
+                attempts   INTEGER NOT NULL DEFAULT 0,
+                solved     INTEGER NOT NULL DEFAULT 0,
+                time_total REAL NOT NULL DEFAULT 0,
+                rating     REAL NOT NULL
+            );
+            """
+        )
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS solo_user_skill (
+                user_id INTEGER PRIMARY KEY,
+                rating  REAL NOT NULL,
+                answers INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
         await db.commit()
 
     logger.info("База данных инициализирована.")
@@ -0,0 +1,173 @@
+# modules/dispatch_index.py
+#
+# Индекс для быстрой маршрутизации текстовых сообщений. Обычно aiogram
+# проверяет хэндлеры по очереди: лямбды start/footle/solo_guess, StateFilter'ы
+# и в конце catch-all дуэли. Индекс вместо этого за несколько поисков в словарях
+# находит единственный подходящий хэндлер:
+#   * таблица кнопок — точный текст reply-кнопки -> хэндлер;
+#   * режим пользователя — состояние FSM (raw_state для этого чата и пользователя)
+#     или словарь активных сессий по user_id (Footle) -> хэндлер;
+#   * активная игра чата — множество чатов с идущей дуэлью -> хэндлер.
+# Если подошло несколько, побеждает тот, что раньше по порядку роутеров, так что
+# поведение совпадает с обычной цепочкой. Команды и нетекстовые сообщения идут
+# обычным путём.
+
+import logging
+import time
+from typing import Any, Callable, Collection, Optional
+
+from aiogram import Dispatcher, Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.filters import Command
+from aiogram.fsm.state import State
+from aiogram.types import Message
+
+from modules import perf
+
+logger = logging.getLogger(__name__)
+
+TextPredicate = Callable[[str], bool]
+
+
+class DispatchIndex:
+    def __init__(self):
+        self._buttons: dict[str, Callable] = {}
+        self._states: dict[str, list[tuple[Callable, Optional[TextPredicate]]]] = {}
+        self._user_modes: list[tuple[Collection[int], Callable]] = []
+        self._chat_games: list[tuple[Collection[int], Callable]] = []
+        # Хэндлеры сообщений без Command-фильтра в порядке проверки aiogram
+        self._chain: list[tuple[Router, TelegramEventObserver, HandlerObject]] = []
+        self._position: dict[Callable, int] = {}
+        self.enabled = False
+
+    # --- Регистрация (вызывается модулями рядом с хэндлерами) ---
+
+    def button(self, text: str, callback: Callable):
+        """Хэндлер с фильтром msg.text == text."""
+        self._buttons[text] = callback
+
+    def state(self, state: State, callback: Callable, text: Optional[TextPredicate] = None):
+        """Хэндлер с StateFilter(state) и, возможно, условием на текст."""
+        self._states.setdefault(state.state, []).append((callback, text))
+
+    def user_mode(self, active_users: Collection[int], callback: Callable):
+        """Хэндлер с фильтром msg.from_user.id in active_users."""
+        self._user_modes.append((active_users, callback))
+
+    def chat_game(self, active_chats: Collection[int], callback: Callable):
+        """
+        Хэндлер, который что-то делает только в чатах из active_chats
+        (в остальных он сам сразу выходит, поэтому его можно не вызывать).
+        """
+        self._chat_games.append((active_chats, callback))
+
+    def _known(self) -> set[Callable]:
+        known = set(self._buttons.values())
+        known.update(cb for entries in self._states.values() for cb, _ in entries)
+        known.update(cb for _, cb in self._user_modes)
+        known.update(cb for _, cb in self._chat_games)
+        return known
+
+    # --- Подключение ---
+
+    def setup(self, dispatcher: Dispatcher):
+        """
+        Строит порядок хэндлеров по уже подключённым роутерам и вешает outer-мидлварь
+        на сообщения. Если найден хэндлер, о котором индекс не знает, индекс
+        выключается: без этого нельзя гарантировать тот же результат, что у aiogram.
+        """
+        self._chain.clear()
+        self._position.clear()
+        known = self._known()
+        unknown = []
+        for router in dispatcher.chain_tail:
+            observer = router.message
+            if router is not dispatcher and observer.outer_middleware:
+                unknown.append(f"outer-мидлварь в роутере {router.name}")
+            for handler in observer.handlers:
+                if self._is_command(handler):
+                    continue
+                if observer._handler.filters:
+                    unknown.append(f"фильтр роутера {router.name} у {perf.handler_name(handler.callback)}")
+                elif handler.callback not in known:
+                    unknown.append(perf.handler_name(handler.callback))
+                self._position[handler.callback] = len(self._chain)
+                self._chain.append((router, observer, handler))
+
+        if unknown:
+            logger.warning(f"Индекс маршрутизации выключен, не поддерживается: {', '.join(unknown)}")
+            return
+        dispatcher.message.outer_middleware(self._middleware)
+        self.enabled = True
+        logger.info(f"Индекс маршрутизации: {len(self._chain)} хэндлеров, {len(self._buttons)} кнопок.")
+
+    @staticmethod
+    def _is_command(handler: HandlerObject) -> bool:
+        # Command с префиксом "/" не совпадает с текстом, который не начинается с "/"
+        return any(isinstance(f.callback, Command) and f.callback.prefix == "/" for f in handler.filters or ())
+
+    # --- Маршрутизация ---
+
+    def resolve(self, message: Message, raw_state: Optional[str]) -> Optional[int]:
+        """Позиция хэндлера в цепочке или None, если ни один не подходит."""
+        text = message.text
+        best = None
+
+        def offer(callback: Callable):
+            nonlocal best
+            pos = self._position.get(callback)
+            if pos is not None and (best is None or pos < best):
+                best = pos
+
+        callback = self._buttons.get(text)
+        if callback:
+            offer(callback)
+        if raw_state:
+            for callback, predicate in self._states.get(raw_state, ()):
+                if predicate is None or predicate(text):
+                    offer(callback)
+        user_id = message.from_user.id
+        for active_users, callback in self._user_modes:
+            if user_id in active_users:
+                offer(callback)
+        for active_chats, callback in self._chat_games:
+            if message.chat.id in active_chats:
+                offer(callback)
+        return best
+
+    async def _middleware(self, handler: Callable, event: Message, data: dict[str, Any]) -> Any:
+        if not event.text or event.text.startswith("/") or event.from_user is None:
+            perf.counters[("retro_dispatch_total", 'path="chain"')] += 1
+            return await handler(event, data)
+
+        started = time.perf_counter()
+        pos = self.resolve(event, data.get("raw_state"))
+        perf.histograms["retro_dispatch_resolve_seconds"].record(int((time.perf_counter() - started) * 1_000_000))
+        if pos is None:
+            perf.counters[("retro_dispatch_total", 'path="skipped"')] += 1
+            return UNHANDLED
+        perf.counters[("retro_dispatch_total", 'path="index"')] += 1
+        return await self._run_from(pos, event, data)
+
+    async def _run_from(self, pos: int, event: Message, data: dict[str, Any]) -> Any:
+        """
+        То же, что TelegramEventObserver.trigger, но начиная с найденной позиции:
+        фильтры выбранного хэндлера всё равно проверяются, а при SkipHandler или
+        непрошедшем фильтре идём к следующим хэндлерам, как это сделал бы aiogram.
+        """
+        for router, observer, handler in self._chain[pos:]:
+            kwargs = {**data, "event_router": router, "handler": handler}
+            result, kwargs = await handler.check(event, **kwargs)
+            if not result:
+                continue
+            wrapped = observer.outer_middleware.wrap_middlewares(observer._resolve_middlewares(), handler.call)
+            try:
+                return await wrapped(event, kwargs)
+            except SkipHandler:
+                continue
+        return UNHANDLED
+
+
+dispatch_index = DispatchIndex()
@@ -12,10 +12,17 @@ import aiosqlite
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.enums import ParseMode
-from aiogram.types import FSInputFile
 from aiogram.exceptions import TelegramBadRequest
 from bot import bot
 from config import DB_PATH, DUEL_WORDS_JSON, BASE_DIR
+from modules.data_registry import data_registry
+from modules.dispatch_index import dispatch_index
+from modules.name_keys import name_key, player_keys
+from modules.rating import rating
+from modules import game_log as game_log_db
+from modules.game_log import game_log
+from modules.photos import photo_pipeline
+from sharding import owns_chat
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -25,9 +32,14 @@ DUEL_TOTAL_ROUNDS = 5
 DUEL_TIMEOUT = 15
 POINTS_BASE = 10
 
-duel_timers: Dict[int, asyncio.Task] = {}
+duel_timers: Dict[str, asyncio.Task] = {}  # duel_id -> таймер текущего раунда
 duel_sequences: Dict[str, list[dict]] = {}
-DUEL_WORDS: list[dict] = []
+duel_titles: Dict[str, str] = {}  # duel_id -> «Имя vs Имя» для подписей
+# Зеркало дуэлей в статусе 'active' из duel_games. В чате может идти несколько
+# дуэлей сразу, поэтому сообщение относится к дуэли по паре (чат, автор) —
+# один поиск в словаре, сколько бы дуэлей ни шло.
+active_duel_chats: Dict[int, set[str]] = {}  # chat_id -> id активных дуэлей
+duel_by_player: Dict[tuple[int, int], str] = {}  # (chat_id, user_id) -> duel_id
 
 
 # --- Инициализация ---
@@ -58,24 +70,83 @@ async def init_duel_db() -> None:
         try:
             await db.execute("ALTER TABLE duel_leaderboard ADD COLUMN win_streak INTEGER DEFAULT 0;")
         except aiosqlite.OperationalError: pass
+        # Частичный индекс по активным дуэлям: по нему при старте собирается индекс (чат, игрок) -> дуэль
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_duel_games_active ON duel_games(chat_id) WHERE status='active';")
         await db.commit()
+        db.row_factory = aiosqlite.Row
+        cursor = await db.execute("SELECT * FROM duel_games WHERE status='active'")
+        # В многопроцессном режиме дуэль поднимает воркер, которому принадлежит чат
+        interrupted = [row for row in await cursor.fetchall() if owns_chat(row["chat_id"])]
+    for duel in interrupted:
+        register_duel(duel["id"], duel["chat_id"], duel["player1"], duel["player2"])
+
+    # Однократный перенос уже завершённых дуэлей в архив истории
+    await game_log_db.init_db()
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("""
+            INSERT OR IGNORE INTO game_history
+                (game_id, game_type, chat_id, player1, player2, status, winner, created_at, ended_at)
+            SELECT id, 'duel', chat_id, player1, player2, status, winner, created_at, ended_at
+            FROM duel_games
+            WHERE status IN ('finished', 'canceled')
+              AND NOT EXISTS (SELECT 1 FROM game_history WHERE game_type = 'duel')
+        """)
+        await db.commit()
+
+    for duel in interrupted:
+        asyncio.create_task(resume_duel(duel))
+
+
+async def resume_duel(duel: aiosqlite.Row):
+    """
+    Продолжает дуэль, прерванную перезапуском: последовательность игроков берётся
+    из события start в журнале, текущий раунд начинается заново с новым таймером.
+    Если последовательность не восстановить (нет журнала, игрока убрали из данных),
+    дуэль отменяется, чтобы не держать игроков и чат.
+    """
+    duel_id, chat_id = duel["id"], duel["chat_id"]
+    try:
+        _, events = await game_log.load(duel_id)
+        start = next((payload for kind, _, payload, _ in events if kind == "start"), None)
+        by_name = {p["canonical_name"]: p for p in data_registry.get("duel_words") or []}
+        sequence = [by_name.get(name) for name in (start or {}).get("words", [])]
+        if len(sequence) < duel["total_rounds"] or None in sequence:
+            logger.warning(f"Дуэль {duel_id}: не удалось восстановить игроков раундов, отменяем.")
+            tag = await cancel_duel(duel)
+            await bot.send_message(chat_id, f"{tag}❌ Дуэль прервана перезапуском бота.", parse_mode=ParseMode.HTML)
+            return
+        duel_sequences[duel_id] = sequence
+        player1, player2 = await bot.get_chat(duel["player1"]), await bot.get_chat(duel["player2"])
+        duel_titles[duel_id] = f"{player1.full_name} vs {player2.full_name}"
+        current_round = max(duel["round"] or 1, 1)
+        logger.info(f"Дуэль {duel_id} восстановлена после перезапуска, раунд {current_round}.")
+        await bot.send_message(chat_id, f"{duel_tag(duel_id)}🔄 Бот перезапустился — раунд {current_round} начинается заново.",
+                               parse_mode=ParseMode.HTML)
+        await start_duel_round(duel_id, chat_id, current_round)
+    except Exception as e:
+        logger.error(f"Не удалось восстановить дуэль {duel_id}: {e}", exc_info=True)
+        if duel_by_player.get((chat_id, duel["player1"])) == duel_id:
+            await cancel_duel(duel)
+
+
+def build_duel_words() -> list[dict]:
+    with open(DUEL_WORDS_JSON, encoding="utf-8") as f:
+        levels_data = json.load(f)
+    flat_list = [player for level_players in levels_data.values() for player in level_players]
+    if not flat_list:
+        raise ValueError(f"данные из {DUEL_WORDS_JSON} загружены, но список игроков пуст")
+    for player in flat_list:
+        player["keys"] = player_keys(player)  # ключи имён считаем один раз при загрузке
+    logger.info(f"Дуэли: Успешно загружено {len(flat_list)} игроков.")
+    return flat_list
+
+
+data_registry.register("duel_words", [DUEL_WORDS_JSON], build_duel_words, fallback=list)
 
 
 @router.startup()
 async def on_startup_duel():
-    global DUEL_WORDS
     await init_duel_db()
-    try:
-        with open(DUEL_WORDS_JSON, encoding="utf-8") as f:
-            levels_data = json.load(f)
-        flat_list = [player for level_players in levels_data.values() for player in level_players]
-        DUEL_WORDS = flat_list
-        if DUEL_WORDS:
-            logger.info(f"Дуэли: Успешно загружено {len(DUEL_WORDS)} игроков.")
-        else:
-            logger.error(f"Дуэли: Данные из {DUEL_WORDS_JSON} загружены, но список игроков пуст.")
-    except Exception as e:
-        logger.error(f"Дуэли: КРИТИЧЕСКАЯ ОШИБКА загрузки данных из {DUEL_WORDS_JSON}: {e}")
 
 
 # --- Утилиты ---
@@ -84,6 +155,30 @@ def mention(user_id: int, name: str) -> str:
     return f'<a href="tg://user?id={user_id}">{name}</a>'
 
 
+def register_duel(duel_id: str, chat_id: int, player1: int, player2: int):
+    active_duel_chats.setdefault(chat_id, set()).add(duel_id)
+    duel_by_player[(chat_id, player1)] = duel_id
+    duel_by_player[(chat_id, player2)] = duel_id
+
+
+def unregister_duel(duel_id: str, chat_id: int, player1: int, player2: int):
+    duel_ids = active_duel_chats.get(chat_id)
+    if duel_ids is not None:
+        duel_ids.discard(duel_id)
+        if not duel_ids:
+            del active_duel_chats[chat_id]
+    for player_id in (player1, player2):
+        if duel_by_player.get((chat_id, player_id)) == duel_id:
+            del duel_by_player[(chat_id, player_id)]
+    duel_titles.pop(duel_id, None)
+
+
+def duel_tag(duel_id: str) -> str:
+    """Метка дуэли для сообщений: в чате их может идти несколько одновременно."""
+    title = duel_titles.get(duel_id)
+    return f"⚔️ {title}\n" if title else ""
+
+
 def get_duel_invite_keyboard(player1_id: int, player2_id: int) -> types.InlineKeyboardMarkup:
     accept_callback = f"duel_accept:{player1_id}:{player2_id}"
     decline_callback = f"duel_decline:{player1_id}:{player2_id}"
@@ -99,25 +194,47 @@ def get_duel_invite_keyboard(player1_id: int, player2_id: int) -> types.InlineKe
 async def schedule_round_timeout(chat_id: int, duel_id: str, current_round: int):
     async def _timeout_task():
         await asyncio.sleep(DUEL_TIMEOUT)
-        if duel_timers.get(chat_id) is task:
+        if duel_timers.get(duel_id) is task:
             await on_round_timeout(chat_id, duel_id, current_round)
 
     task = asyncio.create_task(_timeout_task())
-    duel_timers[chat_id] = task
+    duel_timers[duel_id] = task
 
 
-async def cancel_round_timeout(chat_id: int):
-    task = duel_timers.pop(chat_id, None)
+async def cancel_round_timeout(duel_id: str):
+    task = duel_timers.pop(duel_id, None)
     if task: task.cancel()
 
 
+async def cancel_duel(duel: aiosqlite.Row, user_id: Optional[int] = None) -> str:
+    """Отменяет активную дуэль (БД, индексы, журнал) и возвращает её метку для сообщения."""
+    await cancel_round_timeout(duel["id"])
+    duel_sequences.pop(duel["id"], None)
+    ended_at = int(time.time())
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("UPDATE duel_games SET status='canceled', ended_at=? WHERE id=?", (ended_at, duel["id"]))
+        await db.commit()
+    tag = duel_tag(duel["id"])
+    unregister_duel(duel["id"], duel["chat_id"], duel["player1"], duel["player2"])
+    game_log.append("duel", duel["id"], "result", user_id, status="canceled",
+                    score1=duel["score1"], score2=duel["score2"])
+    game_log.finish("duel", duel["id"], duel["chat_id"], duel["player1"], duel["player2"], "canceled", None,
+                    duel["created_at"], ended_at)
+    return tag
+
+
 # --- Основная логика дуэли ---
 
 async def start_duel_round(duel_id: str, chat_id: int, current_round: int):
     player_sequence = duel_sequences.get(duel_id, [])
     if not player_sequence or len(player_sequence) < current_round:
         logger.error(f"Ошибка в дуэли {duel_id}: нет игрока для раунда {current_round}")
-        await bot.send_message(chat_id, "Произошла внутренняя ошибка. Дуэль прервана.")
+        async with aiosqlite.connect(DB_PATH) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute("SELECT * FROM duel_games WHERE id=? AND status='active'", (duel_id,))
+            duel = await cursor.fetchone()
+        tag = await cancel_duel(duel) if duel else duel_tag(duel_id)
+        await bot.send_message(chat_id, f"{tag}Произошла внутренняя ошибка. Дуэль прервана.", parse_mode=ParseMode.HTML)
         return
 
     player_data = player_sequence[current_round - 1]
@@ -129,17 +246,18 @@ async def start_duel_round(duel_id: str, chat_id: int, current_round: int):
             "UPDATE duel_games SET round=?, current_word=?, current_photo=?, round_start_time=? WHERE id=?",
             (current_round, word, photo_file, now_ts, duel_id))
         await db.commit()
+    game_log.append("duel", duel_id, "round", round=current_round, word=word)
 
-    caption = f"🏁 <b>Раунд {current_round}/{DUEL_TOTAL_ROUNDS}</b> — угадайте футболиста!"
+    caption = f"{duel_tag(duel_id)}🏁 <b>Раунд {current_round}/{DUEL_TOTAL_ROUNDS}</b> — угадайте футболиста!"
     photo_path = BASE_DIR / "footphoto" / photo_file
 
     if photo_path.exists():
-        await bot.send_photo(chat_id, FSInputFile(photo_path), caption=caption, parse_mode=ParseMode.HTML)
+        await photo_pipeline.send_photo(chat_id, photo_file, caption=caption, parse_mode=ParseMode.HTML)
     else:
         logger.warning(f"Фото не найдено для дуэли: {photo_path}")
         await bot.send_message(chat_id, f"{caption}\n(Ошибка: не удалось загрузить фото)", parse_mode=ParseMode.HTML)
 
-    await cancel_round_timeout(chat_id)
+    await cancel_round_timeout(duel_id)
     await schedule_round_timeout(chat_id, duel_id, current_round)
 
 
@@ -149,9 +267,10 @@ async def on_round_timeout(chat_id: int, duel_id: str, timed_out_round: int):
         cursor = await db.execute("SELECT * FROM duel_games WHERE id=? AND status='active'", (duel_id,))
         duel = await cursor.fetchone()
     if not duel or duel["round"] != timed_out_round: return
-    duel_timers.pop(chat_id, None)
+    duel_timers.pop(duel_id, None)
+    game_log.append("duel", duel_id, "timeout", round=timed_out_round)
     await bot.send_message(chat_id,
-                           f"⏱ <b>Раунд {timed_out_round}:</b> никто не успел за {DUEL_TIMEOUT} сек.\nФамилия: <b>{duel['current_word'].upper()}</b>",
+                           f"{duel_tag(duel_id)}⏱ <b>Раунд {timed_out_round}:</b> никто не успел за {DUEL_TIMEOUT} сек.\nФамилия: <b>{duel['current_word'].upper()}</b>",
                            parse_mode=ParseMode.HTML)
     await advance_round_or_finish(duel)
 
@@ -162,7 +281,7 @@ async def advance_round_or_finish(duel: aiosqlite.Row):
     if next_round > duel['total_rounds']:
         await finalize_duel(duel)
     else:
-        await bot.send_message(duel['chat_id'], f"🔜 Подготовка к раунду {next_round}/{duel['total_rounds']}…")
+        await bot.send_message(duel['chat_id'], f"{duel_tag(duel['id'])}🔜 Подготовка к раунду {next_round}/{duel['total_rounds']}…")
         await asyncio.sleep(2)
         await start_duel_round(duel['id'], duel['chat_id'], next_round)
 
@@ -212,12 +331,18 @@ async def finalize_duel(duel: aiosqlite.Row):
             streak_row = await cursor.fetchone()
             if streak_row: win_streak = streak_row[0]
 
+        ended_at = int(time.time())
         await db.execute("UPDATE duel_games SET status='finished', winner=?, ended_at=? WHERE id=?",
-                         (winner, int(time.time()), duel['id']))
+                         (winner, ended_at, duel['id']))
         await db.commit()
+    tag = duel_tag(duel['id'])
+    unregister_duel(duel['id'], duel['chat_id'], p1, p2)
+    rating.record_match(p1, p2, 1.0 if winner == p1 else 0.0 if winner == p2 else 0.5, "duel")
+    game_log.append("duel", duel['id'], "result", winner, status="finished", score1=s1, score2=s2)
+    game_log.finish("duel", duel['id'], duel['chat_id'], p1, p2, "finished", winner, duel['created_at'], ended_at)
 
     p1_user, p2_user = await bot.get_chat(p1), await bot.get_chat(p2)
-    text = (f"🎉 <b>Дуэль завершена!</b>\n\n"
+    text = (f"{tag}🎉 <b>Дуэль завершена!</b>\n\n"
             f"{mention(p1, p1_user.full_name)} (выиграл {r_won1} раундов) — <b>{s1}</b> очков\n"
             f"{mention(p2, p2_user.full_name)} (выиграл {r_won2} раундов) — <b>{s2}</b> очков\n\n")
 
@@ -237,7 +362,7 @@ async def finalize_duel(duel: aiosqlite.Row):
         ])
 
     await bot.send_message(duel['chat_id'], text, parse_mode=ParseMode.HTML, reply_markup=rematch_keyboard)
-    await cancel_round_timeout(duel['chat_id'])
+    await cancel_round_timeout(duel['id'])
     duel_sequences.pop(duel['id'], None)
 
 
@@ -268,14 +393,14 @@ async def cmd_duel_start(message: types.Message):
     if opponent.is_bot:
         return await message.answer("❌ Нельзя дуэлиться с ботом.")
 
-    if not DUEL_WORDS:
+    if not data_registry.get("duel_words"):
         return await message.answer("❌ Ошибка сервера: не загружены игроки для дуэли. Сообщите администратору.")
 
-    # Проверка на активную дуэль в чате
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute("SELECT 1 FROM duel_games WHERE chat_id=? AND status='active'", (message.chat.id,))
-        if await cursor.fetchone():
-            return await message.answer("❌ В этом чате уже идёт дуэль. Отмените её через /cancel_duel.")
+    # В чате может идти несколько дуэлей, но каждый игрок — только в одной
+    if (message.chat.id, initiator.id) in duel_by_player:
+        return await message.answer("❌ Вы уже участвуете в дуэли в этом чате. Отменить её: /cancel_duel.")
+    if (message.chat.id, opponent.id) in duel_by_player:
+        return await message.answer("❌ Этот игрок уже участвует в другой дуэли в этом чате.")
 
     # --- Весь остальной код для отправки приглашения остается без изменений ---
     keyboard = get_duel_invite_keyboard(initiator.id, opponent.id)
@@ -305,18 +430,18 @@ async def cmd_duel_start(message: types.Message):
 
 @router.message(Command("cancel_duel"))
 async def cmd_cancel_duel(message: types.Message):
+    duel_id = duel_by_player.get((message.chat.id, message.from_user.id))
+    if duel_id is None:
+        if message.chat.id in active_duel_chats:
+            return await message.answer("Отменить дуэль может только один из участников.")
+        return await message.answer("В этом чате нет активных дуэлей для отмены.")
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM duel_games WHERE chat_id=? AND status='active'", (message.chat.id,))
+        cursor = await db.execute("SELECT * FROM duel_games WHERE id=? AND status='active'", (duel_id,))
         duel = await cursor.fetchone()
     if not duel: return await message.answer("В этом чате нет активных дуэлей для отмены.")
-    if message.from_user.id not in (duel["player1"], duel["player2"]): return await message.answer("Отменить дуэль может только один из участников.")
-    await cancel_round_timeout(message.chat.id)
-    duel_sequences.pop(duel["id"], None)
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("UPDATE duel_games SET status='canceled', ended_at=? WHERE id=?", (int(time.time()), duel["id"]))
-        await db.commit()
-    await message.answer(f"❌ {mention(message.from_user.id, message.from_user.full_name)} отменил(а) дуэль.", parse_mode=ParseMode.HTML)
+    tag = await cancel_duel(duel, message.from_user.id)
+    await message.answer(f"{tag}❌ {mention(message.from_user.id, message.from_user.full_name)} отменил(а) дуэль.", parse_mode=ParseMode.HTML)
 
 
 @router.message(Command("duel_leaderboard"))
@@ -374,24 +499,33 @@ async def handle_duel_accept(callback: types.CallbackQuery):
     await callback.message.edit_reply_markup(reply_markup=None)
     await callback.answer("Вызов принят!")
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute("SELECT 1 FROM duel_games WHERE chat_id=? AND status='active'", (callback.message.chat.id,))
-        if await cursor.fetchone():
-            return await callback.message.answer("Пока вы думали, в чате уже началась другая дуэль.")
-    initiator, opponent = await bot.get_chat(player1_id), await bot.get_chat(player2_id)
+    chat_id = callback.message.chat.id
+    if (chat_id, player1_id) in duel_by_player or (chat_id, player2_id) in duel_by_player:
+        return await callback.message.answer("Пока вы думали, один из вас уже начал другую дуэль в этом чате.")
     ts = int(time.time())
-    duel_id = f"{callback.message.chat.id}_{player1_id}_{player2_id}_{ts}"
-    duel_sequences[duel_id] = random.sample(DUEL_WORDS, k=DUEL_TOTAL_ROUNDS)
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("INSERT INTO duel_games (id, chat_id, player1, player2, round, total_rounds, status, created_at) VALUES (?, ?, ?, ?, 1, ?, 'active', ?)",
-                         (duel_id, callback.message.chat.id, player1_id, player2_id, DUEL_TOTAL_ROUNDS, ts))
-        await db.commit()
+    duel_id = f"{chat_id}_{player1_id}_{player2_id}_{ts}"
+    # Занимаем игроков до первого await, чтобы двойное нажатие не создало вторую дуэль
+    register_duel(duel_id, chat_id, player1_id, player2_id)
+    try:
+        initiator, opponent = await bot.get_chat(player1_id), await bot.get_chat(player2_id)
+        duel_titles[duel_id] = f"{initiator.full_name} vs {opponent.full_name}"
+        duel_sequences[duel_id] = random.sample(data_registry.get("duel_words"), k=DUEL_TOTAL_ROUNDS)
+        async with aiosqlite.connect(DB_PATH) as db:
+            await db.execute("INSERT INTO duel_games (id, chat_id, player1, player2, round, total_rounds, status, created_at) VALUES (?, ?, ?, ?, 1, ?, 'active', ?)",
+                             (duel_id, chat_id, player1_id, player2_id, DUEL_TOTAL_ROUNDS, ts))
+            await db.commit()
+    except Exception:
+        unregister_duel(duel_id, chat_id, player1_id, player2_id)
+        duel_sequences.pop(duel_id, None)
+        raise
+    game_log.append("duel", duel_id, "start", player1_id, player2=player2_id,
+                    words=[p["canonical_name"] for p in duel_sequences[duel_id]])
     await callback.message.answer(
         f"🆚 <b>Дуэль принята!</b>\n{mention(initiator.id, initiator.full_name)} vs {mention(opponent.id, opponent.full_name)}\n"
         f"Раунд 1/{DUEL_TOTAL_ROUNDS} начнётся через 3 секунды…",
         parse_mode=ParseMode.HTML)
     await asyncio.sleep(3)
-    await start_duel_round(duel_id, callback.message.chat.id, 1)
+    await start_duel_round(duel_id, chat_id, 1)
 
 
 @router.callback_query(F.data.startswith("duel_decline:"))
@@ -417,21 +551,26 @@ async def on_duel_guess(message: types.Message):
     - Использует гибкое сравнение с порогом 75%.
     """
     if message.chat.type not in ("group", "supergroup"): return
+    # Обычная переписка и зрители дуэлей не должны ходить в БД: дуэль — по (чат, автор)
+    duel_id = duel_by_player.get((message.chat.id, message.from_user.id))
+    if duel_id is None: return
 
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM duel_games WHERE chat_id=? AND status='active'", (message.chat.id,))
+        cursor = await db.execute("SELECT * FROM duel_games WHERE id=? AND status='active'", (duel_id,))
         duel = await cursor.fetchone()
 
     if not duel: return
 
     user_id = message.from_user.id
-    if user_id not in (duel["player1"], duel["player2"]): return
     if not duel["current_word"]: return
 
-    target_player_data = next((p for p in DUEL_WORDS if p['canonical_name'].lower() == duel['current_word']), None)
+    # Сначала ищем в последовательности самой дуэли — она зафиксирована на старте
+    # и не меняется при перезагрузке data/.
+    candidates = duel_sequences.get(duel["id"]) or data_registry.get("duel_words")
+    target_player_data = next((p for p in candidates if p['canonical_name'].lower() == duel['current_word']), None)
     if not target_player_data:
-        logger.error(f"Не удалось найти данные для слова {duel['current_word']} в DUEL_WORDS.")
+        logger.error(f"Не удалось найти данные для слова {duel['current_word']} в данных дуэли.")
         return
 
     # 1. Приводим ввод пользователя к нижнему регистру. КАПС УБИРАЕТСЯ ЗДЕСЬ.
@@ -446,9 +585,11 @@ async def on_duel_guess(message: types.Message):
         logger.warning(f"У игрока {duel['current_word']} нет ни canonical_name, ни aliases. Его невозможно угадать.")
         return
 
-    # 3. Ищем совпадение, приводя КАЖДЫЙ правильный ответ тоже к нижнему регистру
-    is_correct = False
-    for answer in all_possible_answers:
+    # 3. Совпадение по ключу имени (латиница/кириллица, ё, удвоенные буквы) — один поиск
+    is_correct = name_key(user_guess) in target_player_data.get("keys", ())
+
+    # 4. Иначе ищем нечёткое совпадение, приводя КАЖДЫЙ правильный ответ тоже к нижнему регистру
+    for answer in (all_possible_answers if not is_correct else ()):
         # Приводим правильный ответ к нижнему регистру для корректного сравнения
         answer_lower = answer.lower()
         ratio = fuzz.ratio(user_guess, answer_lower)
@@ -461,7 +602,7 @@ async def on_duel_guess(message: types.Message):
             break  # Нашли совпадение, выходим из цикла
 
     if is_correct:
-        await cancel_round_timeout(message.chat.id)
+        await cancel_round_timeout(duel["id"])
 
         elapsed = int(time.time()) - duel["round_start_time"]
         pts = max(1, POINTS_BASE - elapsed)
@@ -476,24 +617,26 @@ async def on_duel_guess(message: types.Message):
             s2 += pts
             r_won2 += 1
 
+        # Обновляем очки и сразу перечитываем строку для следующей функции — одним подключением
         async with aiosqlite.connect(DB_PATH) as db:
+            db.row_factory = aiosqlite.Row
             await db.execute("UPDATE duel_games SET score1=?, score2=?, rounds_won1=?, rounds_won2=? WHERE id=?",
                              (s1, s2, r_won1, r_won2, duel["id"]))
             await db.commit()
+            cursor = await db.execute("SELECT * FROM duel_games WHERE id=?", (duel['id'],))
+            updated_duel = await cursor.fetchone()
+        game_log.append("duel", duel["id"], "guess", user_id, round=duel["round"], guess=user_guess,
+                        elapsed=elapsed, points=pts)
 
         await message.answer(
-            f"✅ <b>Раунд {duel['round']}:</b> {mention(user_id, message.from_user.full_name)} угадал(а) за {elapsed} сек — +{pts} очков!",
+            f"{duel_tag(duel['id'])}✅ <b>Раунд {duel['round']}:</b> {mention(user_id, message.from_user.full_name)} угадал(а) за {elapsed} сек — +{pts} очков!",
             parse_mode=ParseMode.HTML)
 
-        # Перезапрашиваем дуэль из БД, чтобы получить обновленные очки для следующей функции
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("SELECT * FROM duel_games WHERE id=?", (duel['id'],))
-            updated_duel = await cursor.fetchone()
-
         if updated_duel:
             await advance_round_or_finish(updated_duel)
 
+dispatch_index.chat_game(active_duel_chats, on_duel_guess)
+
 
 @router.callback_query(F.data.startswith("duel_rematch:"))
 async def handle_duel_rematch(callback: types.CallbackQuery):
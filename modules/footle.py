@@ -1,10 +1,8 @@
 # modules/footle.py
 
-import datetime
 import random
 import csv
 import logging
-from pathlib import Path
 
 from aiogram import Router, types, F
 from aiogram.filters import Command
@@ -14,30 +12,54 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 
 from bot import bot
+from config import FOOTLE_LIST_CSV
+from modules.data_registry import data_registry
+from modules.dispatch_index import dispatch_index
 from modules.database import add_rating, get_rating, init_db
+from modules import name_index
+from modules.name_keys import name_key
+from modules.rating import rating, FOOTLE_WIN_POINTS
 from modules.solo_guess import start_solo_game
 
 logger = logging.getLogger(__name__)
 router = Router()
 
 # --- Константы и загрузка данных ---
-CSV_PATH = Path(__file__).parent.parent / "data" / "footle_list.csv"
+CSV_PATH = FOOTLE_LIST_CSV
 MAX_ATTEMPTS = 6
 GREEN, YELLOW, GRAY, BLACK = "🟩", "🟨", "⬜", "⬛"
 
 sessions: dict[int, dict] = {}
-RUSSIAN_WORDS: list[str] = []
-VALID_WORDS: set[str] = set()
-
-with open(CSV_PATH, encoding="utf-8") as f:
-    for row in csv.DictReader(f):
-        en, ru = row["en"].strip().lower(), row["ru"].strip().lower()
-        if en:
-            VALID_WORDS.add(en)
-        if ru:
-            VALID_WORDS.add(ru)
-            if ' ' not in ru:
-                RUSSIAN_WORDS.append(ru)
+
+
+def build_footle_words() -> dict:
+    """
+    Читает footle_list.csv: загадываемые русские слова, все допустимые попытки и
+    индекс «ключ имени -> русское слово», по которому попытка латиницей (или с «ё»,
+    диакритикой, лишней удвоенной буквой) приводится к русскому слову.
+    """
+    russian_words: list[str] = []
+    valid_words: set[str] = set()
+    by_key: dict[str, str] = {}
+    with open(CSV_PATH, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            en, ru = row["en"].strip().lower(), row["ru"].strip().lower()
+            if en:
+                valid_words.add(en)
+            if ru:
+                valid_words.add(ru)
+                if ' ' not in ru:
+                    russian_words.append(ru)
+                    by_key.setdefault(name_key(ru), ru)
+                    if en:
+                        by_key.setdefault(name_key(en), ru)
+    if not russian_words:
+        raise ValueError(f"в {CSV_PATH} нет ни одного загадываемого слова")
+    return {"russian_words": russian_words, "valid_words": valid_words, "by_key": by_key,
+            "russian_set": frozenset(russian_words)}
+
+
+data_registry.register("footle_words", [CSV_PATH], build_footle_words)
 
 # --- Инициализация БД на старте ---
 @router.startup()
@@ -110,8 +132,9 @@ async def cmd_footle(message: types.Message):
         )
         return
 
-    random.seed(datetime.datetime.now())
-    word = random.choice(RUSSIAN_WORDS)
+    # Партия доигрывается на словаре, с которым началась, даже если data/ перезагрузили
+    words = data_registry.get("footle_words")
+    word = random.choice(words["russian_words"])
     board = render_board([], word)
 
     sent = await message.answer(
@@ -120,7 +143,7 @@ async def cmd_footle(message: types.Message):
         parse_mode="HTML",
         reply_markup=get_giveup_keyboard()
     )
-    sessions[uid] = {"word": word, "guesses": [], "message_id": sent.message_id}
+    sessions[uid] = {"word": word, "guesses": [], "message_id": sent.message_id, "words": words}
 
 @router.callback_query(F.data == "giveup_footle")
 async def handle_giveup_callback(callback: types.CallbackQuery):
@@ -155,7 +178,17 @@ async def handle_guess(message: types.Message):
     guess = message.text.strip().lower()
     word = session["word"]
 
-    if len(guess) != len(word) or not guess.isalpha() or guess not in VALID_WORDS:
+    words = session["words"]
+    valid_words = words["valid_words"]
+    if guess not in words["russian_set"]:
+        guess = words["by_key"].get(name_key(guess), guess)
+    if len(guess) != len(word) or not guess.isalpha() or guess not in valid_words:
+        if guess.isalpha() and guess not in valid_words:
+            # Похоже на опечатку — подсказываем допустимые слова нужной длины
+            hints = name_index.suggest(guess, accept=lambda name: len(name) == len(word) and name in valid_words)
+            if hints:
+                await message.answer(f"🤔 Такого слова нет в словаре. Возможно: "
+                                     f"{', '.join(h.upper() for h in hints)}?")
         return
 
     try:
@@ -188,6 +221,7 @@ async def handle_guess(message: types.Message):
         # 2. Формируем текст и отправляем НОВОЕ сообщение с Reply-клавиатурой
         if is_win:
             await add_rating(uid, 10000)
+            rating.add_points(uid, FOOTLE_WIN_POINTS, "footle")
             pts = await get_rating(uid)
             final_text = (
                 f"🎉 <b>ПОБЕДА!</b> Угадали «{word.upper()}» за "
@@ -226,6 +260,7 @@ async def handle_guess(message: types.Message):
         except TelegramBadRequest:
             await message.answer(text, parse_mode="HTML", reply_markup=reply)
 
+dispatch_index.user_mode(sessions, handle_guess)
 
 
 # --- Ловим нажатия Reply-кнопок после игры ---
@@ -237,6 +272,8 @@ async def cmd_restart_footle(message: types.Message):
     )
     await cmd_footle(message)
 
+dispatch_index.button("🔄 Новая игра (Footle)", cmd_restart_footle)
+
 @router.message(lambda msg: msg.text == "🎯 Угадай игрока (Solo)")
 async def cmd_start_solo_from_footle(message: types.Message, state: FSMContext):
     await message.answer(
@@ -244,3 +281,5 @@ async def cmd_start_solo_from_footle(message: types.Message, state: FSMContext):
         reply_markup=ReplyKeyboardRemove()
     )
     await start_solo_game(message, state)
+
+dispatch_index.button("🎯 Угадай игрока (Solo)", cmd_start_solo_from_footle)
@@ -0,0 +1,233 @@
+# modules/game_log.py
+#
+# Журнал событий партий (event sourcing). Вместо перезаписи строки игры на
+# каждом ходу модули дописывают события (start, move, pass, guess, timeout,
+# result...) в game_events. Запись идёт пачками: события копятся в памяти и
+# раз в GAME_LOG_FLUSH_INTERVAL секунд (или по заполнении пачки) уходят в БД
+# одной транзакцией. Раз в GAME_SNAPSHOT_EVERY событий сохраняется снимок
+# состояния (в game_snapshots хранится только последний снимок партии), так
+# что восстановление — это снимок плюс хвост событий после него.
+# Завершённые партии попадают в game_history — компактный индексированный
+# архив для запросов вроде /ttt_history.
+#
+# Номера событий (seq) считаются в памяти. Если партия пишет в журнал, а её
+# счётчика в памяти нет (она началась до перезапуска бота и не поднималась
+# через load), номера у её событий временные: перед записью пачки счётчик
+# продолжается от MAX(seq) в БД, и события сдвигаются на него.
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Optional
+
+import aiosqlite
+
+from config import DB_PATH, GAME_LOG_FLUSH_INTERVAL, GAME_LOG_BATCH_SIZE, GAME_SNAPSHOT_EVERY
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_EVENTS = ("result",)
+
+
+async def init_db() -> None:
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS game_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                game_type TEXT NOT NULL,
+                game_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                user_id INTEGER,
+                payload TEXT,
+                created_at INTEGER NOT NULL
+            );
+        """)
+        await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_game_events_game ON game_events(game_id, seq);")
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS game_snapshots (
+                game_id TEXT PRIMARY KEY,
+                game_type TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                created_at INTEGER NOT NULL
+            );
+        """)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS game_history (
+                game_id TEXT PRIMARY KEY,
+                game_type TEXT NOT NULL,
+                chat_id INTEGER NOT NULL,
+                player1 INTEGER,
+                player2 INTEGER,
+                status TEXT,
+                winner INTEGER,
+                created_at INTEGER,
+                ended_at INTEGER
+            );
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_game_history_chat ON game_history(game_type, chat_id, ended_at DESC);")
+        await db.commit()
+
+
+class GameEventLog:
+    def __init__(self):
+        self._events: list[tuple] = []
+        self._snapshots: dict[str, tuple] = {}  # game_id -> строка снимка (в пачке нужен только последний)
+        self._history: list[tuple] = []
+        self._seq: dict[str, int] = {}  # game_id -> номер последнего события
+        self._unseeded: set[str] = set()  # партии с временными номерами (не сверены с БД)
+        self._closing: set[str] = set()  # завершённые партии: счётчик убираем после записи
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_scheduled = False
+
+    # --- Запись ---
+
+    def append(self, game_type: str, game_id: str, kind: str, user_id: Optional[int] = None,
+               state: Optional[dict[str, Any]] = None, **payload: Any) -> int:
+        """
+        Ставит событие в очередь на запись и возвращает его номер в партии.
+        state — текущее состояние партии; его сохраняем снимком на старте,
+        в конце и каждые GAME_SNAPSHOT_EVERY событий.
+        """
+        if game_id not in self._seq:
+            self._unseeded.add(game_id)
+        seq = self._seq.get(game_id, 0) + 1
+        now = int(time.time())
+        self._seq[game_id] = seq
+        self._events.append((game_type, game_id, seq, kind, user_id,
+                             json.dumps(payload, ensure_ascii=False) if payload else None, now))
+        if state is not None and (seq == 1 or seq % GAME_SNAPSHOT_EVERY == 0 or kind in TERMINAL_EVENTS):
+            self._snapshots[game_id] = (game_id, game_type, seq, json.dumps(state, ensure_ascii=False), now)
+        if kind in TERMINAL_EVENTS:
+            self._closing.add(game_id)
+        if len(self._events) >= GAME_LOG_BATCH_SIZE and not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().create_task(self.flush())
+        return seq
+
+    def finish(self, game_type: str, game_id: str, chat_id: int, player1: int, player2: int,
+               status: str, winner: Optional[int], created_at: Optional[int], ended_at: Optional[int]):
+        """Кладёт завершённую партию в архив game_history (той же пачкой, что и события)."""
+        self._history.append((game_id, game_type, chat_id, player1, player2, status, winner, created_at, ended_at))
+
+    async def _seed(self, game_ids: list[str]) -> None:
+        """Продолжает нумерацию партий с временными номерами от MAX(seq) в БД."""
+        offsets: dict[str, int] = {}
+        async with aiosqlite.connect(DB_PATH) as db:
+            for i in range(0, len(game_ids), 500):
+                chunk = game_ids[i:i + 500]
+                cursor = await db.execute(
+                    f"SELECT game_id, MAX(seq) FROM game_events WHERE game_id IN ({','.join('?' * len(chunk))}) "
+                    "GROUP BY game_id", chunk)
+                offsets.update((game_id, top) for game_id, top in await cursor.fetchall() if top)
+        # Дальше без await: события, дописанные во время запроса, сдвигаются вместе с остальными
+        self._unseeded.difference_update(game_ids)
+        if not offsets:
+            return
+        self._events = [(e[0], e[1], e[2] + offsets[e[1]], *e[3:]) if e[1] in offsets else e
+                        for e in self._events]
+        for game_id, offset in offsets.items():
+            if game_id in self._seq:
+                self._seq[game_id] += offset
+            row = self._snapshots.get(game_id)
+            if row is not None:
+                self._snapshots[game_id] = (row[0], row[1], row[2] + offset, *row[3:])
+
+    async def flush(self) -> None:
+        async with self._lock:
+            self._flush_scheduled = False
+            if self._unseeded:
+                try:
+                    await self._seed(list(self._unseeded))
+                except Exception as e:
+                    logger.error(f"Журнал игр: не удалось сверить номера событий с БД, запись отложена: {e}")
+                    return
+            events, self._events = self._events, []
+            snapshots, self._snapshots = list(self._snapshots.values()), {}
+            history, self._history = self._history, []
+            if not (events or snapshots or history):
+                return
+            try:
+                async with aiosqlite.connect(DB_PATH) as db:
+                    cursor = await db.executemany(
+                        "INSERT OR IGNORE INTO game_events (game_type, game_id, seq, kind, user_id, payload, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)", events)
+                    if cursor.rowcount != -1 and cursor.rowcount < len(events):
+                        # Номер уже занят — так быть не должно, событие не пропадает молча
+                        logger.error(f"Журнал игр: {len(events) - cursor.rowcount} событий не записаны: "
+                                     f"номера уже заняты")
+                    await db.executemany(
+                        "INSERT OR REPLACE INTO game_snapshots (game_id, game_type, seq, state, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)", snapshots)
+                    await db.executemany(
+                        "INSERT OR REPLACE INTO game_history "
+                        "(game_id, game_type, chat_id, player1, player2, status, winner, created_at, ended_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", history)
+                    await db.commit()
+            except Exception as e:
+                # Возвращаем пачку в очередь, попробуем в следующий раз
+                logger.error(f"Журнал игр: не удалось записать {len(events)} событий: {e}")
+                self._events[:0] = events
+                for row in snapshots:
+                    self._snapshots.setdefault(row[0], row)
+                self._history[:0] = history
+                return
+            # Счётчик завершённой партии больше не нужен, когда все её события в БД
+            queued = {event[1] for event in self._events}
+            for game_id in [g for g in self._closing if g not in queued]:
+                self._seq.pop(game_id, None)
+                self._closing.discard(game_id)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(GAME_LOG_FLUSH_INTERVAL)
+            await self.flush()
+
+    async def start(self):
+        await init_db()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    # --- Чтение ---
+
+    async def load(self, game_id: str) -> tuple[Optional[dict[str, Any]], list[tuple[str, Optional[int], dict, int]]]:
+        """
+        Последний снимок партии и события после него: (state, [(kind, user_id, payload, created_at), ...]).
+        Заодно продолжает нумерацию событий этой партии.
+        """
+        async with aiosqlite.connect(DB_PATH) as db:
+            cursor = await db.execute("SELECT seq, state FROM game_snapshots WHERE game_id=?", (game_id,))
+            snapshot = await cursor.fetchone()
+            since = snapshot[0] if snapshot else 0
+            cursor = await db.execute(
+                "SELECT seq, kind, user_id, payload, created_at FROM game_events WHERE game_id=? AND seq>? ORDER BY seq",
+                (game_id, since))
+            rows = await cursor.fetchall()
+        self._seq[game_id] = rows[-1][0] if rows else since
+        self._unseeded.discard(game_id)
+        state = json.loads(snapshot[1]) if snapshot else None
+        return state, [(kind, user_id, json.loads(payload) if payload else {}, created_at)
+                       for _, kind, user_id, payload, created_at in rows]
+
+    async def replay(self, game_id: str) -> list[dict[str, Any]]:
+        """Все события партии по порядку (для разбора спорных партий и отладки)."""
+        await self.flush()
+        async with aiosqlite.connect(DB_PATH) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute(
+                "SELECT seq, kind, user_id, payload, created_at FROM game_events WHERE game_id=? ORDER BY seq",
+                (game_id,))
+            rows = await cursor.fetchall()
+        return [{**dict(r), "payload": json.loads(r["payload"]) if r["payload"] else {}} for r in rows]
+
+
+game_log = GameEventLog()
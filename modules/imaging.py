@@ -0,0 +1,109 @@
+# modules/imaging.py
+#
+# Обработка фотографий игроков: варианты сложности (размытие, пикселизация,
+# кадрирование) и приведение к размеру, который Telegram всё равно сделал бы
+# сам (длинная сторона до 1280, JPEG). Модуль не зависит от aiogram и
+# вызывается в отдельных процессах (см. modules/photos.py и scripts/build_photos.py).
+#
+# Кэш на диске адресуется содержимым: имя файла — хэш исходника, параметров
+# варианта и версии конвейера. Поменялось фото или параметры — получится новый
+# файл, старые можно просто удалить вместе с каталогом кэша.
+
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+except ImportError:  # Pillow не обязателен: без него отправляем исходные файлы
+    Image = None
+
+# Меняем при изменении алгоритмов — старый кэш перестанет совпадать
+PIPELINE_VERSION = "1"
+
+# Вариант -> шаги обработки. Размытие — доля длинной стороны, пикселизация —
+# число блоков по длинной стороне, кадрирование — доля кадра вокруг центра лица
+# (лицо на наших фото обычно в верхней трети).
+VARIANTS: dict[str, tuple[tuple[str, float], ...]] = {
+    "full": (),
+    "blur_1": (("blur", 0.012),),
+    "blur_2": (("blur", 0.025),),
+    "blur_3": (("blur", 0.05),),
+    "pixel": (("pixelate", 20),),
+    "crop": (("crop", 0.45),),
+}
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def cache_key(source_digest: str, variant: str, max_side: int, quality: int) -> str:
+    spec = repr((VARIANTS[variant], max_side, quality, PIPELINE_VERSION))
+    return hashlib.sha256(f"{source_digest}:{spec}".encode()).hexdigest()[:32]
+
+
+def _apply(image: "Image.Image", steps: tuple[tuple[str, float], ...]) -> "Image.Image":
+    for op, value in steps:
+        long_side = max(image.size)
+        if op == "blur":
+            image = image.filter(ImageFilter.GaussianBlur(radius=max(1.0, long_side * value)))
+        elif op == "pixelate":
+            scale = value / long_side
+            small = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                 Image.BILINEAR)
+            image = small.resize(image.size, Image.NEAREST)
+        elif op == "crop":
+            w, h = round(image.width * value), round(image.height * value)
+            cx, cy = image.width // 2, image.height // 3
+            left = min(max(0, cx - w // 2), image.width - w)
+            top = min(max(0, cy - h // 2), image.height - h)
+            image = image.crop((left, top, left + w, top + h))
+        else:
+            raise ValueError(f"Неизвестный шаг обработки: {op}")
+    return image
+
+
+def _write_atomic(path: Path, data: bytes):
+    # Несколько процессов могут собирать один и тот же файл — пишем во временный и переименовываем
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def build_variants(source: str, variants: tuple[str, ...], cache_dir: str,
+                   max_side: int, quality: int) -> dict[str, tuple[str, str]]:
+    """
+    Собирает варианты одного фото (если их ещё нет в кэше).
+    Возвращает {вариант: (ключ кэша, путь к файлу)}. Выполняется в процессе-воркере.
+    Без Pillow все варианты — это исходный файл.
+    """
+    data = Path(source).read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    if Image is None:
+        return {name: (digest[:32], source) for name in variants}
+
+    result: dict[str, tuple[str, str]] = {}
+    base: Any = None
+    for name in variants:
+        key = cache_key(digest, name, max_side, quality)
+        path = Path(cache_dir) / key[:2] / f"{key}.jpg"
+        if not path.exists():
+            if base is None:
+                base = ImageOps.exif_transpose(Image.open(BytesIO(data))).convert("RGB")
+            image = _apply(base, VARIANTS[name])
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            out = BytesIO()
+            image.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+            _write_atomic(path, out.getvalue())
+        result[name] = (key, str(path))
+    return result
@@ -0,0 +1,162 @@
+# modules/inline_search.py
+#
+# Инлайн-режим: «@bot мес» в любом чате — подсказки игроков из всех данных бота
+# карточками (фото, если у Telegram уже есть его file_id, и имя).
+#
+# Запросы приходят на каждое нажатие клавиши, поэтому всё в памяти, без БД:
+#   - игроки собираются из data/ (name_index.read_player_groups); написания одного
+#     игрока (кириллица, латиница, псевдонимы) склеиваются по ключу имени;
+#   - префиксный индекс — отсортированный массив (написание, игрок), диапазон
+#     префикса — два bisect. В массиве и сами написания, и их ключи (name_keys),
+#     так что «mes» тоже находит «Месси»;
+#   - для коротких префиксов (до SHORT_PREFIX букв) диапазоны самые длинные —
+#     лучшие игроки для них посчитаны заранее;
+#   - порядок — по известности (вес из данных), top-k через heapq.nlargest;
+#   - ответы на последние запросы — в LRU (QUERY_CACHE_SIZE запросов).
+# file_id фото берутся из photo_pipeline в момент ответа: они появляются, когда
+# фото впервые отправляется в игре. Индекс пересобирается через data_registry.
+
+import bisect
+import heapq
+import logging
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from aiogram import Router, types
+from aiogram.types import InlineQueryResultArticle, InlineQueryResultCachedPhoto, InputTextMessageContent
+
+from config import FOOTLE_LIST_CSV, CLUB_PLAYERS_JSON, SOLO_PLAYERS_JSON, DUEL_WORDS_JSON
+from modules.data_registry import data_registry
+from modules.logs import log_event
+from modules.name_index import read_player_groups
+from modules.name_keys import name_key
+from modules.photos import photo_pipeline
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+RESULTS_LIMIT = 10
+SHORT_PREFIX = 2  # префиксы до этой длины посчитаны заранее
+QUERY_CACHE_SIZE = 1024
+INLINE_CACHE_TIME = 300  # сек: столько Telegram сам помнит ответ на тот же запрос
+
+
+def _is_cyrillic(name: str) -> bool:
+    return any("а" <= ch <= "я" or ch == "ё" for ch in name)
+
+
+class PlayerCard:
+    __slots__ = ("spellings", "photo_file", "popularity")
+
+    def __init__(self):
+        self.spellings: list[str] = []
+        self.photo_file: Optional[str] = None
+        self.popularity = 0
+
+    @property
+    def name(self) -> str:
+        """Имя для карточки: первое русское написание, если оно есть."""
+        return next((s for s in self.spellings if _is_cyrillic(s)), self.spellings[0])
+
+    @property
+    def latin(self) -> str:
+        return next((s for s in self.spellings if not _is_cyrillic(s)), "")
+
+
+class PlayerSearchIndex:
+    def __init__(self, groups: Iterable[tuple[list[str], Optional[str], int]]):
+        self.players: list[PlayerCard] = []
+        by_key: dict[str, int] = {}
+        for names, photo_file, weight in groups:
+            names = [n.strip().lower() for n in names if n and n.strip()]
+            keys = {name_key(n) for n in names} - {""}
+            if not keys:
+                continue
+            pid = next((by_key[k] for k in keys if k in by_key), None)
+            if pid is None:
+                pid = len(self.players)
+                self.players.append(PlayerCard())
+            card = self.players[pid]
+            card.spellings.extend(n for n in names if n not in card.spellings)
+            card.photo_file = card.photo_file or photo_file
+            card.popularity += weight
+            for k in keys:
+                by_key.setdefault(k, pid)
+
+        entries = sorted({(prefix, pid) for pid, card in enumerate(self.players)
+                          for s in card.spellings for prefix in (s, name_key(s)) if prefix})
+        self._prefixes = [prefix for prefix, _ in entries]
+        self._ids = [pid for _, pid in entries]
+
+        short: dict[str, set[int]] = {}
+        for prefix, pid in entries:
+            for length in range(1, SHORT_PREFIX + 1):
+                if len(prefix) >= length:
+                    short.setdefault(prefix[:length], set()).add(pid)
+        self._short = {prefix: self._top(pids) for prefix, pids in short.items()}
+        self._popular = self._top(range(len(self.players)))
+        self._cache: OrderedDict[str, tuple[int, ...]] = OrderedDict()
+
+    def _top(self, pids: Iterable[int]) -> tuple[int, ...]:
+        return tuple(heapq.nlargest(RESULTS_LIMIT, pids, key=lambda pid: (self.players[pid].popularity, -pid)))
+
+    def _candidates(self, prefix: str) -> Iterable[int]:
+        if len(prefix) <= SHORT_PREFIX:
+            return self._short.get(prefix, ())
+        lo = bisect.bisect_left(self._prefixes, prefix)
+        hi = bisect.bisect_left(self._prefixes, prefix + "\U0010ffff")
+        return self._ids[lo:hi]
+
+    def search(self, query: str) -> tuple[int, ...]:
+        """Номера игроков (self.players), чьё имя начинается с query, — самые известные первыми."""
+        query = query.strip().lower()
+        found = self._cache.get(query)
+        if found is not None:
+            self._cache.move_to_end(query)
+            return found
+        if not query:
+            found = self._popular
+        else:
+            key = name_key(query)
+            candidates = set(self._candidates(query))
+            if len(key) >= SHORT_PREFIX and key != query:  # из одной буквы ключ слишком грубый («zz» -> «s»)
+                candidates.update(self._candidates(key))
+            found = self._top(candidates)
+        self._cache[query] = found
+        while len(self._cache) > QUERY_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return found
+
+
+def build_player_search() -> PlayerSearchIndex:
+    index = PlayerSearchIndex(read_player_groups())
+    logger.info(f"Инлайн-поиск: игроков {len(index.players)}, префиксов {len(index._prefixes)}")
+    return index
+
+
+data_registry.register("player_search", [FOOTLE_LIST_CSV, CLUB_PLAYERS_JSON, SOLO_PLAYERS_JSON, DUEL_WORDS_JSON],
+                       build_player_search)
+
+
+def _card_result(pid: int, card: PlayerCard) -> types.InlineQueryResult:
+    title = card.name.title()
+    latin = card.latin.title()
+    text = f"⚽️ <b>{title}</b>" + (f" ({latin})" if latin and latin != title else "")
+    file_id = photo_pipeline.cached_file_id(card.photo_file) if card.photo_file else None
+    if file_id:
+        return InlineQueryResultCachedPhoto(id=f"p{pid}", photo_file_id=file_id, title=title,
+                                            caption=text, parse_mode="HTML")
+    return InlineQueryResultArticle(id=f"p{pid}", title=title, description=latin or None,
+                                    input_message_content=InputTextMessageContent(message_text=text,
+                                                                                  parse_mode="HTML"))
+
+
+@router.inline_query()
+async def on_inline_query(inline_query: types.InlineQuery):
+    started = time.perf_counter()
+    index: PlayerSearchIndex = data_registry.get("player_search")
+    results = [_card_result(pid, index.players[pid]) for pid in index.search(inline_query.query)]
+    log_event(logger, "inline.query", logging.DEBUG, results=len(results),
+              ms=round((time.perf_counter() - started) * 1000, 3))
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME)
@@ -0,0 +1,176 @@
+# modules/logs.py
+#
+# Настройка логирования для горячих путей:
+#   * запись уходит в очередь, а форматирование и вывод делает отдельный поток
+#     (QueueHandler + QueueListener), цикл событий на I/O не блокируется;
+#   * вывод в JSON, по строке на запись — удобно грепать и грузить в ELK/Loki;
+#   * лимиты по логгерам (токен-бакет): лишние записи отбрасываются сразу,
+#     число отброшенных приписывается к следующей прошедшей записи;
+#   * log_event() — компактные события с полями вместо f-строк с целыми словарями.
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+from typing import Any, Optional
+
+from config import LOG_LEVEL, LOG_JSON, LOG_RATE_LIMITS
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_exc_formatter = logging.Formatter()
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, sample: float = 1.0, **fields: Any):
+    """
+    Пишет событие event с полями fields. Ничего не форматирует, если уровень
+    выключен; sample < 1 — пишется только эта доля событий (поле sample в записи).
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if sample < 1.0:
+        if random.random() >= sample:
+            return
+        fields["sample"] = sample
+    logger.log(level, event, extra={"fields": fields})
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, static_fields: Optional[dict[str, Any]] = None):
+        super().__init__()
+        self.static_fields = static_fields or {}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **self.static_fields,
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        dropped = getattr(record, "dropped", 0)
+        if dropped:
+            entry["dropped"] = dropped
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Прежний текстовый формат, поля событий дописываются как key=value."""
+
+    def __init__(self, prefix: str = ""):
+        super().__init__(f"%(asctime)s - %(levelname)s - {prefix}%(name)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        extra = dict(getattr(record, "fields", None) or {})
+        if getattr(record, "dropped", 0):
+            extra["dropped"] = record.dropped
+        if extra:
+            text += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        return text
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Токен-бакет на логгер: не больше rate записей в секунду (с запасом burst = rate).
+    Лимит ищется по имени логгера и его родителям: "modules.club_connect"
+    покрывает и "modules.club_connect.timers". WARNING и выше не ограничиваются.
+    """
+
+    def __init__(self, limits: dict[str, float]):
+        super().__init__()
+        self.limits = limits
+        self._buckets: dict[str, list[float]] = {}  # имя лимита -> [токены, время пополнения]
+        self._resolved: dict[str, Optional[str]] = {}
+        self._dropped: dict[str, int] = {}
+
+    def _limit_for(self, name: str) -> Optional[str]:
+        if name not in self._resolved:
+            key = name
+            while key and key not in self.limits:
+                key = key.rpartition(".")[0]
+            self._resolved[name] = key or None
+        return self._resolved[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = self._limit_for(record.name)
+        if key is None:
+            return True
+        rate = self.limits[key]
+        now = time.monotonic()
+        bucket = self._buckets.setdefault(key, [rate, now])
+        bucket[0] = min(rate, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] < 1.0:
+            self._dropped[key] = self._dropped.get(key, 0) + 1
+            return False
+        bucket[0] -= 1.0
+        dropped = self._dropped.pop(key, 0)
+        if dropped:
+            record.dropped = dropped
+        return True
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    На месте — только то, что зависит от состояния в момент вызова: склейка
+    msg % args и текст исключения (аргументы могут измениться, пока запись
+    лежит в очереди). Форматирование в JSON/текст делает поток слушателя.
+    (Стандартный QueueHandler.prepare форматирует на месте и всю строку.)
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)  # запись видят и другие обработчики — не меняем её у них
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None  # трейсбек держит кадры стека — в очередь не кладём
+        return record
+
+
+def setup_logging(shard: Optional[int] = None):
+    """Заменяет обработчики корневого логгера на очередь + поток вывода."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    stream = logging.StreamHandler()
+    if LOG_JSON:
+        stream.setFormatter(JsonFormatter({"shard": shard} if shard is not None else None))
+    else:
+        stream.setFormatter(TextFormatter(f"shard{shard} - " if shard is not None else ""))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _LazyQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(LOG_RATE_LIMITS))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Дописываем то, что ещё лежит в очереди
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,145 @@
+# modules/name_index.py
+#
+# «Возможно, вы имели в виду…»: известные фамилии на расстоянии правки не больше
+# MAX_DISTANCE от введённой строки — для опечаток в Footle и Club Connect.
+#
+# Индекс — словарь удалений (как в SymSpell): для каждой фамилии заранее записаны
+# все строки, которые из неё получаются удалением до MAX_DISTANCE букв, и по
+# каждой такой строке — список фамилий. У запроса строятся те же удаления (их
+# десятки), кандидаты берутся из словаря по ним и проверяются точным расстоянием
+# Дамерау–Левенштейна с отсечением. Весь словарь не перебирается — запрос
+# занимает доли миллисекунды.
+#
+# Фамилии собираются из всех файлов data/ (Footle, Club Connect, Соло, Дуэли),
+# индекс пересобирается через data_registry, когда меняется любой из них.
+
+import csv
+import json
+import logging
+from typing import Callable, Iterable, Optional
+
+from config import FOOTLE_LIST_CSV, CLUB_PLAYERS_JSON, SOLO_PLAYERS_JSON, DUEL_WORDS_JSON
+from modules.data_registry import data_registry
+
+logger = logging.getLogger(__name__)
+
+MAX_DISTANCE = 2  # опечаток в слове, которые ещё исправляем
+SUGGEST_LIMIT = 3  # сколько вариантов предлагать
+
+
+def _deletes(word: str, depth: int) -> set[str]:
+    """Само слово и все строки, получающиеся из него удалением до depth букв."""
+    result = frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        result = result | frontier
+    return result
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Расстояние Дамерау–Левенштейна (перестановка соседних букв — одна правка).
+    Если оно больше limit, возвращает limit + 1, не досчитывая.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            cur[j] = value
+        if min(cur) > limit:  # дальше строки только растут
+            return limit + 1
+        before, prev = prev, cur
+    return min(prev[-1], limit + 1)
+
+
+class NameIndex:
+    def __init__(self, names: Iterable[str], max_distance: int = MAX_DISTANCE):
+        self.names = frozenset(n.strip().lower() for n in names if n and n.strip())
+        self.max_distance = max_distance
+        self._deletes: dict[str, list[str]] = {}
+        for name in sorted(self.names):
+            for variant in _deletes(name, max_distance):
+                self._deletes.setdefault(variant, []).append(name)
+
+    def suggest(self, word: str, limit: int = SUGGEST_LIMIT,
+                accept: Optional[Callable[[str], bool]] = None) -> list[str]:
+        """Ближайшие известные фамилии (сначала самые близкие); accept — дополнительный фильтр."""
+        word = word.strip().lower()
+        seen: set[str] = set()
+        ranked = []
+        for variant in _deletes(word, self.max_distance):
+            for name in self._deletes.get(variant, ()):
+                if name in seen:
+                    continue
+                seen.add(name)
+                if accept is not None and not accept(name):
+                    continue
+                distance = edit_distance(word, name, self.max_distance)
+                if distance <= self.max_distance:
+                    ranked.append((distance, name))
+        ranked.sort()
+        return [name for _, name in ranked[:limit]]
+
+
+def read_player_groups() -> list[tuple[list[str], Optional[str], int]]:
+    """
+    Все упоминания игроков в data/: (написания одного игрока, фото или None, вес).
+    Вес — грубая известность: игроки ранних уровней Соло/Дуэлей весят больше,
+    у игроков Club Connect вес — число пар клубов (ключей «клуб ↔ клуб» в
+    club_players.json), в списках которых игрок назван.
+    """
+    groups: list[tuple[list[str], Optional[str], int]] = []
+    try:
+        with open(FOOTLE_LIST_CSV, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                groups.append(([row.get("ru") or "", row.get("en") or ""], None, 1))
+    except Exception as e:
+        logger.warning(f"Подсказки: не удалось прочитать {FOOTLE_LIST_CSV}: {e}")
+    try:
+        pair_counts: dict[str, int] = {}
+        with open(CLUB_PLAYERS_JSON, encoding="utf-8") as f:
+            for players in json.load(f).values():
+                # Файл — по парам клубов; в одной паре игрок считается один раз
+                names = {(p.get("Игрок") or "").strip() for p in players if isinstance(p, dict)} - {""}
+                for name in names:
+                    pair_counts[name] = pair_counts.get(name, 0) + 1
+        groups.extend(([name], None, count) for name, count in pair_counts.items())
+    except Exception as e:
+        logger.warning(f"Подсказки: не удалось прочитать {CLUB_PLAYERS_JSON}: {e}")
+    for path in (SOLO_PLAYERS_JSON, DUEL_WORDS_JSON):
+        try:
+            with open(path, encoding="utf-8") as f:
+                for level, level_players in json.load(f).items():
+                    weight = 10 // int(level) if str(level).isdigit() and int(level) > 0 else 1
+                    for player in level_players:
+                        # Русские псевдонимы первыми: по первому написанию игрок показывается в поиске
+                        names = list(player.get("aliases") or []) + [player.get("canonical_name") or ""]
+                        groups.append((names, player.get("photo_file"), weight))
+        except Exception as e:
+            logger.warning(f"Подсказки: не удалось прочитать {path}: {e}")
+    return groups
+
+
+def build_name_index() -> NameIndex:
+    index = NameIndex(name for names, _, _ in read_player_groups() for name in names)
+    logger.info(f"Подсказки: фамилий {len(index.names)}, вариантов удалений {len(index._deletes)}")
+    return index
+
+
+data_registry.register("name_index", [FOOTLE_LIST_CSV, CLUB_PLAYERS_JSON, SOLO_PLAYERS_JSON, DUEL_WORDS_JSON],
+                       build_name_index)
+
+
+def suggest(word: str, limit: int = SUGGEST_LIMIT, accept: Optional[Callable[[str], bool]] = None) -> list[str]:
+    """Подсказки по текущему индексу данных."""
+    return data_registry.get("name_index").suggest(word, limit, accept)
+
+
+def is_known(word: str) -> bool:
+    return word.strip().lower() in data_registry.get("name_index").names
@@ -0,0 +1,56 @@
+# modules/name_keys.py
+#
+# Ключ имени, общий для латиницы и кириллицы: «Месси», «messi» и «MESSI» дают
+# один и тот же ключ, как и «Мбаппе»/«Mbappé», «Левандовски»/«Lewandowski».
+#
+# Как строится ключ:
+#   - нижний регистр, диакритика снимается (NFKD): é -> e, ü -> u, ё -> е, й -> и;
+#   - кириллица переводится в латиницу по простой таблице (ж -> zh, ц -> ts, ...);
+#   - латинские варианты одного звука сводятся к одному (w -> v, ph -> f, kh -> h,
+#     ck -> k, c -> k/s, y -> i, ...);
+#   - удвоенные буквы схлопываются, всё кроме букв и цифр выбрасывается.
+# Правила переводят буквы, а не произношение: «haaland» и «холанд» дают разные
+# ключи. Такие пары берутся из данных — колонки en/ru в footle_list.csv и aliases
+# игроков. scripts/generate_footle_csv.py (офлайн, пакет transliterate) сюда не
+# подключён: он собирал старый список из 100 фамилий побуквенной транслитерацией,
+# а ru в нынешнем footle_list.csv записан по произношению (beckham -> бекхэм).
+# Ключ грубее написания — это нормально: он служит индексом «ключ -> игрок»,
+# сравнение по нему — один поиск в словаре. Ключи данных считаются один раз
+# при сборке индексов, ключи ввода игроков кэшируются (name_key под lru_cache).
+
+import re
+import unicodedata
+from functools import lru_cache
+
+NAME_KEY_CACHE_SIZE = 8192
+
+_CYRILLIC = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh", "з": "z", "и": "i",
+    "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "i",
+    "ь": "", "э": "e", "ю": "iu", "я": "ia",
+})
+
+# Порядок важен: сначала сочетания, потом одиночные буквы
+_LATIN_FOLDS = tuple((re.compile(pattern), repl) for pattern, repl in (
+    ("sch", "sh"), ("tch", "ch"), ("kh", "h"), ("ck", "k"), ("ph", "f"), ("th", "t"),
+    ("dzh", "dz"), ("w", "v"), ("q", "k"), ("x", "ks"), ("y", "i"), ("z", "s"),
+    ("c(?=[eiy])", "s"), ("c(?!h)", "k"),
+    (r"[^a-z0-9]", ""), (r"(.)\1+", r"\1"),
+))
+
+
+@lru_cache(maxsize=NAME_KEY_CACHE_SIZE)
+def name_key(text: str) -> str:
+    """Ключ имени, не зависящий от алфавита, регистра, диакритики и удвоенных букв."""
+    decomposed = unicodedata.normalize("NFKD", text.strip().lower())
+    key = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).translate(_CYRILLIC)
+    for pattern, repl in _LATIN_FOLDS:
+        key = pattern.sub(repl, key)
+    return key
+
+
+def player_keys(player: dict) -> list[str]:
+    """Ключи игрока из solo_players.json / duel_words.json: основное имя и все псевдонимы."""
+    names = [player.get("canonical_name") or ""] + list(player.get("aliases") or [])
+    return sorted({name_key(name) for name in names if name} - {""})
@@ -0,0 +1,357 @@
+# modules/perf.py
+#
+# Инструментирование хэндлеров: время выполнения, задержка цикла событий,
+# число и длительность обращений к SQLite и число запросов к Bot API.
+# Хэндлер называется по модулю и функции: footle.handle_guess, duel.on_duel_guess.
+# Данные копятся в памяти в гистограммах (в духе HDR) и отдаются в формате
+# Prometheus на PERF_METRICS_PORT (/metrics) и админ-командой /perf.
+
+import asyncio
+import contextvars
+import inspect
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from config import PERF_METRICS_HOST, PERF_METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL = 0.1  # как часто замеряем задержку цикла событий, сек
+SUB_BUCKET_BITS = 5  # 32 корзины на каждую степень двойки — погрешность не больше ~3%
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+class Histogram:
+    """
+    Гистограмма целых неотрицательных значений (микросекунды, штуки) с
+    логарифмически-линейными корзинами, как в HdrHistogram: значения до
+    2^(SUB_BUCKET_BITS+1) хранятся точно, дальше каждая степень двойки делится
+    на 2^SUB_BUCKET_BITS корзин. Запись — O(1), память не зависит от числа значений.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts: defaultdict[int, int] = defaultdict(int)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def _index(value: int) -> int:
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        if shift <= 0:
+            return value
+        return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+    @staticmethod
+    def _upper_bound(index: int) -> int:
+        shift = (index >> SUB_BUCKET_BITS) - 1
+        if shift <= 0:
+            return index
+        mantissa = index - (shift << SUB_BUCKET_BITS)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> int:
+        """Значение, не меньше которого q-я доля записей (q от 0 до 1)."""
+        if not self.count:
+            return 0
+        rank = max(1, int(self.count * q + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class HandlerStats:
+    __slots__ = ("wall_us", "loop_lag_us", "sqlite_calls", "sqlite_us", "api_calls", "errors")
+
+    def __init__(self):
+        self.wall_us = Histogram()
+        self.loop_lag_us = Histogram()
+        self.sqlite_calls = Histogram()
+        self.sqlite_us = Histogram()
+        self.api_calls = Histogram()
+        self.errors = 0
+
+
+class _Sample:
+    """Счётчики одного вызова хэндлера (живут в contextvar)."""
+
+    __slots__ = ("sqlite_calls", "sqlite_us", "api_calls")
+
+    def __init__(self):
+        self.sqlite_calls = 0
+        self.sqlite_us = 0
+        self.api_calls = 0
+
+
+handler_stats: defaultdict[str, HandlerStats] = defaultdict(HandlerStats)
+loop_lag = Histogram()
+api_requests: defaultdict[str, int] = defaultdict(int)  # метод Bot API -> число вызовов
+api_request_us: defaultdict[str, Histogram] = defaultdict(Histogram)
+# Метрики других модулей (например, modules/dispatch_index.py)
+counters: defaultdict[tuple[str, str], int] = defaultdict(int)  # (метрика, метки) -> значение
+histograms: defaultdict[str, Histogram] = defaultdict(Histogram)  # метрика -> значения в мкс
+
+_current: contextvars.ContextVar[Optional[_Sample]] = contextvars.ContextVar("perf_sample", default=None)
+_handler_names: dict[Callable, str] = {}
+_lag_ticks: deque[tuple[int, int]] = deque(maxlen=600)  # (номер замера, задержка в мкс)
+_tick = 0
+_lag_task: Optional[asyncio.Task] = None
+_metrics_runner: Optional[web.AppRunner] = None
+_sqlite_patched = False
+
+
+def reset():
+    handler_stats.clear()
+    api_requests.clear()
+    api_request_us.clear()
+    counters.clear()
+    histograms.clear()
+    global loop_lag
+    loop_lag = Histogram()
+
+
+def handler_name(callback: Callable) -> str:
+    name = _handler_names.get(callback)
+    if name is None:
+        module = getattr(callback, "__module__", "") or ""
+        name = f"{module.rsplit('.', 1)[-1]}.{getattr(callback, '__name__', repr(callback))}"
+        _handler_names[callback] = name
+    return name
+
+
+# --- Сбор ---
+
+async def handler_middleware(handler: Callable[[Any, dict], Awaitable[Any]], event: Any, data: dict) -> Any:
+    """Внутренняя мидлварь: срабатывает, когда фильтры уже выбрали конкретный хэндлер."""
+    sample = _Sample()
+    token = _current.set(sample)
+    start_tick = _tick
+    started = time.perf_counter()
+    failed = False
+    try:
+        return await handler(event, data)
+    except Exception:
+        failed = True
+        raise
+    finally:
+        wall_us = int((time.perf_counter() - started) * 1_000_000)
+        _current.reset(token)
+        stats = handler_stats[handler_name(data["handler"].callback)]
+        stats.wall_us.record(wall_us)
+        stats.loop_lag_us.record(_lag_since(start_tick))
+        stats.sqlite_calls.record(sample.sqlite_calls)
+        stats.sqlite_us.record(sample.sqlite_us)
+        stats.api_calls.record(sample.api_calls)
+        if failed:
+            stats.errors += 1
+
+
+def _lag_since(start_tick: int) -> int:
+    """Наибольшая задержка цикла событий среди замеров, сделанных после start_tick."""
+    worst = 0
+    for tick, lag_us in reversed(_lag_ticks):
+        if tick <= start_tick:
+            break
+        if lag_us > worst:
+            worst = lag_us
+    return worst
+
+
+class ApiCallMiddleware(BaseRequestMiddleware):
+    """Считает запросы к Bot API (всего по методам и внутри текущего хэндлера)."""
+
+    async def __call__(self, make_request, bot: Bot, method):
+        sample = _current.get()
+        if sample is not None:
+            sample.api_calls += 1
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            api_requests[name] += 1
+            api_request_us[name].record(int((time.perf_counter() - started) * 1_000_000))
+
+
+def patch_sqlite():
+    """
+    Оборачивает aiosqlite.Connection._execute: через него идут execute, commit
+    и fetch* курсоров, то есть каждый поход в поток SQLite. Это приватный метод
+    aiosqlite (проверено на 0.17–0.22): если в другой версии его нет, метрики
+    SQLite не собираются, о чём пишем в лог, а остальное работает как обычно.
+    """
+    global _sqlite_patched
+    if _sqlite_patched:
+        return
+    import aiosqlite
+
+    original = getattr(aiosqlite.Connection, "_execute", None)
+    if not inspect.iscoroutinefunction(original):
+        logger.warning(f"Perf: в aiosqlite {getattr(aiosqlite, '__version__', '?')} нет "
+                       f"Connection._execute, счётчики запросов SQLite отключены.")
+        _sqlite_patched = True
+        return
+
+    async def _execute(self, fn, *args, **kwargs):
+        sample = _current.get()
+        if sample is None:
+            return await original(self, fn, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await original(self, fn, *args, **kwargs)
+        finally:
+            sample.sqlite_calls += 1
+            sample.sqlite_us += int((time.perf_counter() - started) * 1_000_000)
+
+    aiosqlite.Connection._execute = _execute
+    _sqlite_patched = True
+
+
+async def _watch_loop_lag():
+    global _tick
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag_us = max(0, int((loop.time() - expected) * 1_000_000))
+        loop_lag.record(lag_us)
+        _tick += 1
+        _lag_ticks.append((_tick, lag_us))
+
+
+# --- Отдача ---
+
+def render_prometheus() -> str:
+    lines = []
+
+    def summary(metric: str, help_text: str, rows: list[tuple[str, Histogram]], scale: float):
+        if help_text:
+            lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} summary")
+        for labels, hist in rows:
+            sep = "," if labels else ""
+            for q in QUANTILES:
+                lines.append(f'{metric}{{{labels}{sep}quantile="{q}"}} {hist.percentile(q) * scale:g}')
+            lines.append(f"{metric}_sum{{{labels}}} {hist.total * scale:g}")
+            lines.append(f"{metric}_count{{{labels}}} {hist.count}")
+
+    names = sorted(handler_stats)
+    by_handler = lambda attr: [(f'handler="{n}"', getattr(handler_stats[n], attr)) for n in names]
+    summary("retro_handler_duration_seconds", "Время выполнения хэндлера.", by_handler("wall_us"), 1e-6)
+    summary("retro_handler_loop_lag_seconds", "Наибольшая задержка цикла событий во время хэндлера.",
+            by_handler("loop_lag_us"), 1e-6)
+    summary("retro_handler_sqlite_calls", "Обращений к SQLite за вызов хэндлера.", by_handler("sqlite_calls"), 1)
+    summary("retro_handler_sqlite_seconds", "Время в SQLite за вызов хэндлера.", by_handler("sqlite_us"), 1e-6)
+    summary("retro_handler_telegram_calls", "Запросов к Bot API за вызов хэндлера.", by_handler("api_calls"), 1)
+
+    lines.append("# HELP retro_handler_errors_total Исключения в хэндлерах.")
+    lines.append("# TYPE retro_handler_errors_total counter")
+    for n in names:
+        lines.append(f'retro_handler_errors_total{{handler="{n}"}} {handler_stats[n].errors}')
+
+    summary("retro_event_loop_lag_seconds", "Задержка цикла событий.", [("", loop_lag)], 1e-6)
+    summary("retro_telegram_request_seconds", "Длительность запросов к Bot API.",
+            [(f'method="{m}"', api_request_us[m]) for m in sorted(api_request_us)], 1e-6)
+
+    for metric in sorted({m for m, _ in counters}):
+        lines.append(f"# TYPE {metric} counter")
+        for (m, labels), value in sorted(counters.items()):
+            if m == metric:
+                lines.append(f"{metric}{{{labels}}} {value}")
+    for metric in sorted(histograms):
+        summary(metric, "", [("", histograms[metric])], 1e-6)
+    return "\n".join(lines) + "\n"
+
+
+def format_report(limit: int = 15) -> str:
+    """Текстовая сводка для /perf: самые «дорогие» по суммарному времени хэндлеры."""
+    if not handler_stats:
+        return "Пока нет данных."
+    rows = sorted(handler_stats.items(), key=lambda kv: kv[1].wall_us.total, reverse=True)[:limit]
+    ms = lambda us: f"{us / 1000:.1f}"
+    lines = [f"{'хэндлер':<40} {'n':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'sql':>4} {'api':>4} {'err':>4}"]
+    for name, s in rows:
+        lines.append(
+            f"{name[:40]:<40} {s.wall_us.count:>6} {ms(s.wall_us.percentile(0.5)):>7} "
+            f"{ms(s.wall_us.percentile(0.95)):>7} {ms(s.wall_us.percentile(0.99)):>7} "
+            f"{s.sqlite_calls.mean:>4.1f} {s.api_calls.mean:>4.1f} {s.errors:>4}"
+        )
+    lines.append("")
+    lines.append(f"Задержка цикла событий, мс: p50={ms(loop_lag.percentile(0.5))} "
+                 f"p99={ms(loop_lag.percentile(0.99))} max={ms(loop_lag.max)}")
+    for metric, hist in sorted(histograms.items()):
+        lines.append(f"{metric}, мкс: p50={hist.percentile(0.5)} p99={hist.percentile(0.99)} n={hist.count}")
+    for (metric, labels), value in sorted(counters.items()):
+        lines.append(f"{metric}{{{labels}}}: {value}")
+    return "\n".join(lines)
+
+
+async def _metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render_prometheus(), content_type="text/plain", charset="utf-8")
+
+
+# --- Подключение ---
+
+async def _on_startup(bot: Bot):
+    global _lag_task, _metrics_runner
+    if not any(isinstance(m, ApiCallMiddleware) for m in bot.session.middleware):
+        bot.session.middleware(ApiCallMiddleware())
+    _lag_task = asyncio.create_task(_watch_loop_lag())
+
+    if PERF_METRICS_PORT:
+        from sharding import CURRENT_SHARD
+
+        port = PERF_METRICS_PORT + CURRENT_SHARD[0]  # у каждого шарда свой порт
+        app = web.Application()
+        app.router.add_get("/metrics", _metrics)
+        _metrics_runner = web.AppRunner(app, access_log=None)
+        await _metrics_runner.setup()
+        try:
+            await web.TCPSite(_metrics_runner, PERF_METRICS_HOST, port).start()
+            logger.info(f"Метрики Prometheus: http://{PERF_METRICS_HOST}:{port}/metrics")
+        except OSError as e:
+            logger.error(f"Не удалось открыть порт метрик {port}: {e}")
+
+
+async def _on_shutdown():
+    global _lag_task, _metrics_runner
+    if _lag_task:
+        _lag_task.cancel()
+        _lag_task = None
+    if _metrics_runner:
+        await _metrics_runner.cleanup()
+        _metrics_runner = None
+
+
+def setup(dispatcher: Dispatcher):
+    """Вешает мидлварь на все типы событий диспетчера (вложенные роутеры её наследуют)."""
+    patch_sqlite()
+    for event_name, observer in dispatcher.observers.items():
+        if event_name not in ("update", "error"):
+            observer.middleware(handler_middleware)
+    dispatcher.startup.register(_on_startup)
+    dispatcher.shutdown.register(_on_shutdown)
@@ -0,0 +1,225 @@
+# modules/photos.py
+#
+# Отправка фотографий игроков. Варианты (см. modules/imaging.py) собираются
+# в пуле процессов: заранее при старте бота или при первом обращении — цикл
+# событий картинки не обрабатывает. После первой отправки Telegram отдаёт
+# file_id, и дальше фото отправляется по нему, без загрузки файла. file_id
+# хранятся в памяти и в таблице photo_file_ids (ключ — хэш содержимого варианта,
+# так что изменённое фото получит новый file_id).
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Union
+
+import aiosqlite
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, FSInputFile, InputMediaPhoto
+
+from bot import bot
+from config import (
+    BASE_DIR, DB_PATH, PHOTO_CACHE_DIR, PHOTO_WORKERS, PHOTO_MAX_SIDE, PHOTO_JPEG_QUALITY, PHOTO_PREBUILD,
+)
+from modules import imaging
+from modules.data_registry import data_registry
+
+logger = logging.getLogger(__name__)
+
+PHOTOS_DIR = BASE_DIR / "footphoto"
+PREFETCH_CACHE_SIZE = 64  # сколько заранее прочитанных файлов держим в памяти
+# Ответы Bot API, означающие, что сохранённый file_id больше не годится
+STALE_FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file", "file reference", "file_reference",
+                        "wrong padding")
+
+
+def _is_stale_file_id(error: TelegramBadRequest) -> bool:
+    text = str(error).lower()
+    return any(marker in text for marker in STALE_FILE_ID_ERRORS)
+
+
+class PhotoPipeline:
+    def __init__(self):
+        self._ready: dict[str, dict[str, tuple[str, str]]] = {}  # фото -> {вариант: (ключ, путь)}
+        self._pending: dict[str, asyncio.Future] = {}
+        self._file_ids: dict[str, str] = {}  # ключ кэша -> file_id
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._prebuild_task: Optional[asyncio.Task] = None
+        self._bytes: dict[str, bytes] = {}  # ключ кэша -> содержимое (для фото, у которых ещё нет file_id)
+        self._background: set[asyncio.Task] = set()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=PHOTO_WORKERS)
+        return self._executor
+
+    async def variants(self, photo_file: str) -> dict[str, tuple[str, str]]:
+        """Варианты фото; при первом обращении собираются в пуле процессов."""
+        ready = self._ready.get(photo_file)
+        if ready is not None:
+            return ready
+        future = self._pending.get(photo_file)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._pool(), imaging.build_variants, str(PHOTOS_DIR / photo_file), tuple(imaging.VARIANTS),
+                str(PHOTO_CACHE_DIR), PHOTO_MAX_SIDE, PHOTO_JPEG_QUALITY)
+            self._pending[photo_file] = future
+            future.add_done_callback(lambda f: self._on_built(photo_file, f))
+        # shield: отмена одного хэндлера не должна отменять сборку, которую ждут другие
+        return await asyncio.shield(future)
+
+    def _on_built(self, photo_file: str, future: asyncio.Future):
+        self._pending.pop(photo_file, None)
+        if not future.cancelled() and future.exception() is None:
+            self._ready[photo_file] = future.result()
+
+    async def input_file(self, photo_file: str, variant: str = "full") -> tuple[str, Union[str, FSInputFile]]:
+        """(ключ кэша, что передать в Telegram): file_id, если он уже есть, иначе файл из кэша."""
+        key, path = (await self.variants(photo_file))[variant]
+        file_id = self._file_ids.get(key)
+        if file_id:
+            return key, file_id
+        # Имя файла — исходное, как и раньше, а не хэш из кэша
+        data = self._bytes.get(key)
+        if data is not None:
+            return key, BufferedInputFile(data, filename=photo_file)
+        return key, FSInputFile(path, filename=photo_file)
+
+    def cached_file_id(self, photo_file: str, variant: str = "full") -> Optional[str]:
+        """file_id уже отправлявшегося варианта фото или None — только из памяти, без диска и БД."""
+        ready = self._ready.get(photo_file)
+        if ready is None or variant not in ready:
+            return None
+        return self._file_ids.get(ready[variant][0])
+
+    async def prepare(self, photo_files: list[str]) -> list[str]:
+        """Проверяет и собирает сразу несколько фото (например, весь уровень). Возвращает те, что не удалось."""
+        results = await asyncio.gather(*(self.variants(f) for f in photo_files), return_exceptions=True)
+        return [f for f, r in zip(photo_files, results) if isinstance(r, Exception)]
+
+    def prefetch(self, photo_file: str, variant: str = "full"):
+        """В фоне готовит фото к следующей отправке: варианты собраны, файл без file_id прочитан в память."""
+        task = asyncio.create_task(self._prefetch(photo_file, variant))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _prefetch(self, photo_file: str, variant: str):
+        try:
+            key, path = (await self.variants(photo_file))[variant]
+            if key in self._file_ids or key in self._bytes:
+                return
+            self._bytes[key] = await asyncio.to_thread(Path(path).read_bytes)
+            while len(self._bytes) > PREFETCH_CACHE_SIZE:
+                self._bytes.pop(next(iter(self._bytes)))
+        except Exception as e:
+            logger.warning(f"Не удалось заранее подготовить фото {photo_file}/{variant}: {e}")
+
+    async def remember(self, key: str, message: Optional[types.Message]):
+        """Запоминает file_id из отправленного сообщения с фото."""
+        if not message or not message.photo or key in self._file_ids:
+            return
+        file_id = message.photo[-1].file_id
+        self._file_ids[key] = file_id
+        self._bytes.pop(key, None)
+        async with aiosqlite.connect(DB_PATH) as db:
+            await db.execute("INSERT OR REPLACE INTO photo_file_ids (cache_key, file_id, created_at) VALUES (?, ?, ?)",
+                             (key, file_id, int(time.time())))
+            await db.commit()
+
+    def forget(self, key: str):
+        self._file_ids.pop(key, None)
+
+    async def send_photo(self, chat_id: int, photo_file: str, variant: str = "full", **kwargs) -> types.Message:
+        key, photo = await self.input_file(photo_file, variant)
+        if isinstance(photo, str):
+            try:
+                return await bot.send_photo(chat_id, photo, **kwargs)
+            except TelegramBadRequest as e:
+                # file_id мог стать недействительным (например, сменили токен) — загружаем файл заново.
+                # Прочие ошибки (чат не найден, подпись и т.п.) повторная загрузка не исправит.
+                if not _is_stale_file_id(e):
+                    raise
+                logger.warning(f"file_id для {photo_file}/{variant} не принят: {e}")
+                self.forget(key)
+                key, photo = await self.input_file(photo_file, variant)
+        sent = await bot.send_photo(chat_id, photo, **kwargs)
+        await self.remember(key, sent)
+        return sent
+
+    async def edit_photo(self, chat_id: int, message_id: int, photo_file: str, variant: str,
+                         caption: Optional[str] = None, parse_mode: Optional[str] = None,
+                         reply_markup: Optional[types.InlineKeyboardMarkup] = None):
+        """Заменяет фото в сообщении другим вариантом (editMessageMedia) — один вызов, без обработки."""
+        key, photo = await self.input_file(photo_file, variant)
+        if isinstance(photo, str):
+            try:
+                return await bot.edit_message_media(
+                    InputMediaPhoto(media=photo, caption=caption, parse_mode=parse_mode),
+                    chat_id=chat_id, message_id=message_id, reply_markup=reply_markup)
+            except TelegramBadRequest as e:
+                if not _is_stale_file_id(e):
+                    raise
+                logger.warning(f"file_id для {photo_file}/{variant} не принят: {e}")
+                self.forget(key)
+                key, photo = await self.input_file(photo_file, variant)
+        edited = await bot.edit_message_media(
+            InputMediaPhoto(media=photo, caption=caption, parse_mode=parse_mode),
+            chat_id=chat_id, message_id=message_id, reply_markup=reply_markup)
+        await self.remember(key, edited if isinstance(edited, types.Message) else None)
+        return edited
+
+    # --- Запуск ---
+
+    @staticmethod
+    def referenced_photos() -> set[str]:
+        """Все фото из solo_players.json и duel_words.json."""
+        files = set()
+        for name in ("solo_players", "duel_words"):
+            data = data_registry.get(name) or {}
+            players = data.values() if isinstance(data, dict) else [data]
+            for level_players in players:
+                files.update(p["photo_file"] for p in level_players if p.get("photo_file"))
+        return files
+
+    async def _prebuild(self):
+        started = time.perf_counter()
+        files = [f for f in self.referenced_photos() if (PHOTOS_DIR / f).exists()]
+        results = await asyncio.gather(*(self.variants(f) for f in files), return_exceptions=True)
+        failed = [f for f, r in zip(files, results) if isinstance(r, Exception)]
+        for f in failed:
+            logger.error(f"Не удалось подготовить фото {f}")
+        logger.info(f"Фото подготовлены: {len(files) - len(failed)} из {len(files)} "
+                    f"за {time.perf_counter() - started:.1f}с")
+
+    async def start(self):
+        async with aiosqlite.connect(DB_PATH) as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS photo_file_ids (
+                    cache_key TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    created_at INTEGER
+                );
+            """)
+            await db.commit()
+            cursor = await db.execute("SELECT cache_key, file_id FROM photo_file_ids")
+            self._file_ids.update(await cursor.fetchall())
+        if not imaging.available():
+            logger.warning("Pillow не установлен: фото отправляются без размытия и сжатия.")
+        from sharding import CURRENT_SHARD
+
+        # Кэш на диске общий: заранее собирает первый шард, остальные — по первому обращению
+        if PHOTO_PREBUILD and CURRENT_SHARD[0] == 0:
+            self._prebuild_task = asyncio.create_task(self._prebuild())
+
+    async def stop(self):
+        if self._prebuild_task:
+            self._prebuild_task.cancel()
+            self._prebuild_task = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+photo_pipeline = PhotoPipeline()
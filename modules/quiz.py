@@ -0,0 +1,383 @@
+# modules/quiz.py
+#
+# Викторина для всей группы («quiz night») на фотографиях из дуэлей: бот
+# публикует фото, отвечать может любой участник чата, очки — за скорость
+# (POINTS_BASE - секунды с начала раунда, как в дуэли, но не меньше 1).
+#
+# В большом чате в одну секунду приходят сотни ответов, поэтому:
+#   - ответы раунда заранее сведены в frozenset ключей имён (name_keys), проверка
+#     сообщения — name_key (под lru_cache) и один поиск в множестве, без нечёткого
+#     сравнения и без БД;
+#   - очки раунда копятся в памяти, в БД (quiz_leaderboard) уходит одна пачка
+#     executemany по окончании раунда;
+#   - на каждый верный ответ бот не отвечает: табло раунда — одно сообщение,
+#     которое редактируется не чаще раза в SCOREBOARD_EDIT_INTERVAL секунд
+#     (все ответы за это время попадают в одну правку).
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from typing import Optional
+
+import aiosqlite
+from aiogram import Router, types, F
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.filters import Command, CommandObject
+
+from bot import bot
+from config import DB_PATH, BASE_DIR
+from modules.data_registry import data_registry
+from modules.dispatch_index import dispatch_index
+from modules.duel import POINTS_BASE, active_duel_chats, mention
+from modules.game_log import game_log
+from modules.logs import log_event
+from modules.name_keys import name_key
+from modules.photos import photo_pipeline
+from modules.rating import rating
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+QUIZ_ROUNDS = 10
+QUIZ_MAX_ROUNDS = 30
+QUIZ_ROUND_TIME = 20  # сек на раунд
+QUIZ_PAUSE = 4  # сек между раундами
+SCOREBOARD_EDIT_INTERVAL = 2.0  # сек: не чаще одной правки табло
+SCOREBOARD_LINES = 15  # сколько угадавших показывать на табло
+
+
+class QuizGame:
+    __slots__ = ("quiz_id", "chat_id", "starter", "total_rounds", "players", "created_at", "task",
+                 "round", "answer_keys", "answer_name", "round_started", "round_scores",
+                 "totals", "correct", "names",
+                 "board_message_id", "board_version", "board_shown", "board_edited_at", "board_task")
+
+    def __init__(self, chat_id: int, starter: int, players: list[dict]):
+        self.quiz_id = f"{chat_id}_{uuid.uuid4().hex[:8]}"
+        self.chat_id = chat_id
+        self.starter = starter
+        self.total_rounds = len(players)
+        self.players = players
+        self.created_at = int(time.time())
+        self.task: Optional[asyncio.Task] = None
+        # Текущий раунд; пустой answer_keys — ответы не принимаются
+        self.round = 0
+        self.answer_keys: frozenset[str] = frozenset()
+        self.answer_name = ""
+        self.round_started = 0.0
+        self.round_scores: dict[int, int] = {}  # user_id -> очки, в порядке ответов
+        # Итоги всей викторины
+        self.totals: dict[int, int] = {}
+        self.correct: dict[int, int] = {}
+        self.names: dict[int, str] = {}
+        # Табло раунда
+        self.board_message_id: Optional[int] = None
+        self.board_version = 0
+        self.board_shown = 0
+        self.board_edited_at = 0.0
+        self.board_task: Optional[asyncio.Task] = None
+
+
+active_quizzes: dict[int, QuizGame] = {}  # chat_id -> идущая викторина
+_unsaved: dict[tuple[int, int], list[int]] = {}  # (chat_id, user_id) -> [очки, угадано], ещё не в БД
+
+
+async def init_quiz_db() -> None:
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS quiz_leaderboard (
+                chat_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                points INTEGER NOT NULL DEFAULT 0,
+                correct_answers INTEGER NOT NULL DEFAULT 0,
+                updated_at INTEGER,
+                PRIMARY KEY (chat_id, user_id)
+            );
+        """)
+        await db.commit()
+
+
+@router.startup()
+async def on_startup_quiz():
+    await init_quiz_db()
+
+
+@router.shutdown()
+async def on_shutdown_quiz():
+    games = list(active_quizzes.values())
+    tasks = [game.task for game in games if game.task]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for game in games:
+        _finish(game, "canceled")
+
+
+# --- Табло ---
+
+def _board_text(game: QuizGame, final: bool = False) -> str:
+    lines = [f"📋 <b>Раунд {game.round}/{game.total_rounds}</b>"]
+    if final:
+        lines.append(f"Ответ: <b>{game.answer_name}</b>")
+    if not game.round_scores:
+        lines.append("Пока никто не угадал." if not final else "Никто не угадал.")
+    for place, (user_id, pts) in enumerate(list(game.round_scores.items())[:SCOREBOARD_LINES], 1):
+        lines.append(f"{place}. {mention(user_id, game.names[user_id])} — +{pts}")
+    if len(game.round_scores) > SCOREBOARD_LINES:
+        lines.append(f"…и ещё {len(game.round_scores) - SCOREBOARD_LINES}")
+    return "\n".join(lines)
+
+
+async def _edit_board(game: QuizGame, final: bool = False):
+    if game.board_message_id is None:
+        return
+    version = game.board_version
+    try:
+        await bot.edit_message_text(_board_text(game, final), chat_id=game.chat_id,
+                                    message_id=game.board_message_id, parse_mode=ParseMode.HTML)
+    except TelegramRetryAfter as e:
+        # Флуд-контроль: подождём и покажем табло следующей правкой
+        game.board_edited_at = time.monotonic() + e.retry_after
+        return
+    except TelegramBadRequest:
+        pass  # «message is not modified» и т.п.
+    game.board_shown = version
+    game.board_edited_at = time.monotonic()
+
+
+async def _refresh_board(game: QuizGame):
+    """Правит табло, пока в нём есть непоказанные ответы, не чаще SCOREBOARD_EDIT_INTERVAL."""
+    try:
+        while game.board_shown != game.board_version:
+            delay = game.board_edited_at + SCOREBOARD_EDIT_INTERVAL - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await _edit_board(game)
+    except Exception as e:
+        logger.warning(f"Викторина {game.quiz_id}: не удалось обновить табло: {e}")
+    finally:
+        game.board_task = None
+
+
+def _touch_board(game: QuizGame):
+    game.board_version += 1
+    if game.board_task is None:
+        game.board_task = asyncio.create_task(_refresh_board(game))
+
+
+# --- Раунды ---
+
+async def _save_round(game: QuizGame):
+    """
+    Очки раунда — одной пачкой в quiz_leaderboard и в общий рейтинг. Если БД
+    занята, приращения остаются в _unsaved и уходят вместе со следующим раундом.
+    """
+    for user_id, pts in game.round_scores.items():
+        rating.add_points(user_id, pts, "quiz")
+        delta = _unsaved.setdefault((game.chat_id, user_id), [0, 0])
+        delta[0] += pts
+        delta[1] += 1
+    if not _unsaved:
+        return
+    batch = list(_unsaved.items())
+    _unsaved.clear()
+    now = int(time.time())
+    try:
+        async with aiosqlite.connect(DB_PATH) as db:
+            await db.executemany(
+                "INSERT INTO quiz_leaderboard (chat_id, user_id, points, correct_answers, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(chat_id, user_id) DO UPDATE SET "
+                "points=points+excluded.points, correct_answers=correct_answers+excluded.correct_answers, "
+                "updated_at=excluded.updated_at",
+                [(chat_id, user_id, pts, correct, now) for (chat_id, user_id), (pts, correct) in batch])
+            await db.commit()
+    except Exception as e:
+        logger.error(f"Викторина {game.quiz_id}: не удалось сохранить раунд {game.round} ({len(batch)} записей): {e}")
+        for key, (pts, correct) in batch:
+            delta = _unsaved.setdefault(key, [0, 0])
+            delta[0] += pts
+            delta[1] += correct
+
+
+async def _play_round(game: QuizGame, current_round: int):
+    player = game.players[current_round - 1]
+    game.round = current_round
+    game.answer_name = (player.get("aliases") or [player["canonical_name"]])[0].title()
+    game.round_scores = {}
+    game_log.append("quiz", game.quiz_id, "round", round=current_round, word=player["canonical_name"].lower())
+
+    caption = (f"🎤 <b>Викторина — раунд {current_round}/{game.total_rounds}</b>\n"
+               f"Кто это? Отвечают все, {QUIZ_ROUND_TIME} сек!")
+    photo_file = player["photo_file"]
+    if (BASE_DIR / "footphoto" / photo_file).exists():
+        await photo_pipeline.send_photo(game.chat_id, photo_file, caption=caption, parse_mode=ParseMode.HTML)
+    else:
+        logger.warning(f"Фото не найдено для викторины: {photo_file}")
+        await bot.send_message(game.chat_id, f"{caption}\n(Ошибка: не удалось загрузить фото)",
+                               parse_mode=ParseMode.HTML)
+    board = await bot.send_message(game.chat_id, _board_text(game), parse_mode=ParseMode.HTML)
+    game.board_message_id = board.message_id
+    game.board_version = game.board_shown = 0
+    game.board_edited_at = time.monotonic()
+
+    game.round_started = time.monotonic()
+    game.answer_keys = frozenset(player["keys"])
+    try:
+        await asyncio.sleep(QUIZ_ROUND_TIME)
+    finally:
+        # И при /quiz_stop посреди раунда: уже набранные очки не теряем
+        game.answer_keys = frozenset()
+        if game.board_task:
+            game.board_task.cancel()
+            game.board_task = None
+        await _save_round(game)
+        game_log.append("quiz", game.quiz_id, "round_end", round=current_round, correct=len(game.round_scores))
+
+    await _edit_board(game, final=True)
+
+
+def _standings(game: QuizGame, title: str) -> str:
+    lines = [title]
+    if not game.totals:
+        lines.append("Никто не набрал очков.")
+    medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+    ranked = sorted(game.totals.items(), key=lambda item: (-item[1], -game.correct[item[0]]))
+    for place, (user_id, pts) in enumerate(ranked[:10], 1):
+        lines.append(f"{medals.get(place, f'{place}.')} {mention(user_id, game.names[user_id])} — "
+                     f"<b>{pts}</b> очк. ({game.correct[user_id]} угад.)")
+    return "\n".join(lines)
+
+
+def _finish(game: QuizGame, status: str) -> Optional[int]:
+    winner = max(game.totals, key=game.totals.get) if game.totals else None
+    ended_at = int(time.time())
+    game_log.append("quiz", game.quiz_id, "result", winner, status=status, rounds=game.round,
+                    players=len(game.totals))
+    game_log.finish("quiz", game.quiz_id, game.chat_id, game.starter, None, status, winner,
+                    game.created_at, ended_at)
+    if active_quizzes.get(game.chat_id) is game:
+        del active_quizzes[game.chat_id]
+    return winner
+
+
+async def _run_quiz(game: QuizGame):
+    try:
+        for current_round in range(1, game.total_rounds + 1):
+            await _play_round(game, current_round)
+            if current_round < game.total_rounds:
+                await asyncio.sleep(QUIZ_PAUSE)
+        _finish(game, "finished")
+        await bot.send_message(game.chat_id, _standings(game, "🏁 <b>Викторина окончена!</b>\n"),
+                               parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Викторина {game.quiz_id} прервана ошибкой: {e}", exc_info=True)
+        _finish(game, "canceled")
+        await bot.send_message(game.chat_id, "Произошла внутренняя ошибка. Викторина прервана.")
+
+
+# --- Команды ---
+
+@router.message(Command("quiz"))
+async def cmd_quiz(message: types.Message, command: CommandObject):
+    """/quiz [раундов] — викторина для всего чата."""
+    if message.chat.type not in ("group", "supergroup"):
+        return await message.answer("❌ Викторина доступна только в группах.")
+    chat_id = message.chat.id
+    if chat_id in active_quizzes:
+        return await message.answer("❌ В этом чате уже идёт викторина. Остановить: /quiz_stop.")
+    if chat_id in active_duel_chats:
+        return await message.answer("❌ В этом чате идёт дуэль — дождитесь её окончания.")
+
+    rounds = QUIZ_ROUNDS
+    if command.args:
+        if not command.args.strip().isdigit() or not 1 <= int(command.args) <= QUIZ_MAX_ROUNDS:
+            return await message.answer(f"Использование: /quiz [число раундов от 1 до {QUIZ_MAX_ROUNDS}]")
+        rounds = int(command.args)
+    words = data_registry.get("duel_words")
+    if not words:
+        return await message.answer("❌ Ошибка сервера: не загружены игроки для викторины. Сообщите администратору.")
+
+    game = QuizGame(chat_id, message.from_user.id, random.sample(words, k=min(rounds, len(words))))
+    active_quizzes[chat_id] = game
+    game_log.append("quiz", game.quiz_id, "start", game.starter, rounds=game.total_rounds,
+                    words=[p["canonical_name"] for p in game.players])
+    await message.answer(
+        f"🎤 <b>Викторина!</b> {game.total_rounds} раундов по {QUIZ_ROUND_TIME} сек.\n"
+        f"Бот показывает фото — пишите фамилию футболиста. Отвечать может каждый, "
+        f"чем быстрее, тем больше очков (до {POINTS_BASE}).\n"
+        f"Первый раунд через 3 секунды…",
+        parse_mode=ParseMode.HTML)
+    await asyncio.sleep(3)
+    if active_quizzes.get(chat_id) is game:
+        game.task = asyncio.create_task(_run_quiz(game))
+
+
+@router.message(Command("quiz_stop"))
+async def cmd_quiz_stop(message: types.Message):
+    game = active_quizzes.get(message.chat.id)
+    if not game:
+        return await message.answer("В этом чате нет викторины.")
+    if message.from_user.id != game.starter:
+        return await message.answer("Остановить викторину может только тот, кто её начал.")
+    if game.task:
+        # Сначала даём раунду доиграть свой finally (сохранение очков, round_end),
+        # и только потом пишем в журнал завершающее событие
+        game.task.cancel()
+        await asyncio.gather(game.task, return_exceptions=True)
+    if active_quizzes.get(message.chat.id) is not game:
+        return  # викторина уже закончилась сама или её остановили параллельно
+    _finish(game, "canceled")
+    await message.answer(_standings(game, f"⏹ <b>Викторина остановлена</b> на раунде {game.round}.\n"),
+                         parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+
+
+@router.message(Command("quiz_top"))
+async def cmd_quiz_top(message: types.Message):
+    async with aiosqlite.connect(DB_PATH) as db:
+        cursor = await db.execute(
+            "SELECT user_id, points, correct_answers FROM quiz_leaderboard WHERE chat_id=? "
+            "ORDER BY points DESC LIMIT 10", (message.chat.id,))
+        rows = await cursor.fetchall()
+    if not rows:
+        return await message.answer("🏆 В этом чате ещё не было викторин. Начать: /quiz")
+    medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+    lines = ["🏆 <b>Викторина: лучшие в этом чате</b>\n"]
+    for place, (user_id, points, correct) in enumerate(rows, 1):
+        try:
+            user = await bot.get_chat(user_id)
+            name_mention = mention(user.id, user.full_name)
+        except TelegramBadRequest:
+            name_mention = f"Игрок <code>{user_id}</code>"
+        lines.append(f"{medals.get(place, f'{place}.')} {name_mention} — <b>{points}</b> очк. ({correct} угад.)")
+    await message.answer("\n".join(lines), parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+
+
+# --- Ответы ---
+
+@router.message(F.text & ~F.text.startswith('/'), lambda message: message.chat.id in active_quizzes)
+async def on_quiz_answer(message: types.Message):
+    """Ответ в чате с викториной: O(1) — ключ имени и поиск в множестве ответов раунда."""
+    game = active_quizzes.get(message.chat.id)
+    user = message.from_user
+    if (game is None or user is None or not game.answer_keys
+            or user.id in game.round_scores or name_key(message.text) not in game.answer_keys):
+        if message.chat.id in active_duel_chats:
+            raise SkipHandler()  # дуэль, принятая во время викторины, читает ответы дальше по цепочке
+        return
+    elapsed = int(time.monotonic() - game.round_started)
+    pts = max(1, POINTS_BASE - elapsed)
+    game.round_scores[user.id] = pts
+    game.totals[user.id] = game.totals.get(user.id, 0) + pts
+    game.correct[user.id] = game.correct.get(user.id, 0) + 1
+    game.names[user.id] = user.full_name
+    log_event(logger, "quiz.correct", logging.DEBUG, quiz=game.quiz_id, round=game.round,
+              place=len(game.round_scores), elapsed=elapsed)
+    _touch_board(game)
+
+dispatch_index.chat_game(active_quizzes, on_quiz_answer)
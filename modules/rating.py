@@ -0,0 +1,256 @@
+# modules/rating.py
+#
+# Общий рейтинг игрока по всем режимам. У каждого пользователя:
+#   elo    — Elo по матчам один на один (дуэли и Club Connect, общий для обоих),
+#   points — очки за одиночные режимы (победа в Footle, верные ответы Solo Guess).
+# Итоговый рейтинг — round(elo) + points; по нему считается место в /rating.
+#
+# Игры не ходят в БД: результаты кладутся в очередь (record_match / add_points),
+# очередь разбирается пачками — Elo и места пересчитываются в памяти, в БД раз в
+# FLUSH_INTERVAL секунд уходит один executemany с приращениями
+# (modules/batching.py). Место считает
+# дерево Фенвика по значениям рейтинга: O(log R) на обновление и на запрос,
+# где R — разброс рейтингов, а не число пользователей.
+#
+# Старые таблицы (user_rating, duel_leaderboard, ttt_leaderboard) не трогаем —
+# по ним работают прежние команды и тексты.
+
+import logging
+import time
+from typing import Optional
+
+import aiosqlite
+from aiogram import Router, types
+from aiogram.enums import ParseMode
+from aiogram.filters import Command
+
+from config import DB_PATH
+from modules.batching import DeltaBatcher, add_delta, with_pending
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+BASE_ELO = 1000.0
+K_NEW = 40.0  # первые PROVISIONAL_GAMES матчей рейтинг меняется быстрее
+K = 20.0
+PROVISIONAL_GAMES = 20
+FOOTLE_WIN_POINTS = 10
+SOLO_ANSWER_POINTS = 2
+FLUSH_INTERVAL = 2.0  # сек
+RELOAD_INTERVAL = 60.0  # сек: как часто шарды подтягивают чужие обновления
+
+
+class Fenwick:
+    """Дерево Фенвика над счётчиками «сколько пользователей с рейтингом r»."""
+
+    def __init__(self, size: int):
+        self._tree = [0] * (size + 1)
+
+    def __len__(self) -> int:
+        return len(self._tree) - 1
+
+    def add(self, index: int, delta: int):
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index: int) -> int:
+        """Сумма счётчиков с 0 по index включительно."""
+        i, total = min(index, len(self) - 1) + 1, 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+
+def expected_score(rating: float, opponent: float) -> float:
+    return 1.0 / (1.0 + 10 ** ((opponent - rating) / 400.0))
+
+
+class RatingService(DeltaBatcher):
+    label = "Рейтинг"
+    delta_attrs = ("_dirty",)
+    flush_interval = FLUSH_INTERVAL
+    reload_interval = RELOAD_INTERVAL
+
+    def __init__(self):
+        super().__init__()
+        self._elo: dict[int, float] = {}
+        self._points: dict[int, int] = {}
+        self._games: dict[int, int] = {}
+        self._index: dict[int, int] = {}  # user_id -> позиция в дереве (итоговый рейтинг)
+        self._tree = Fenwick(4096)
+        self._queue: list[tuple] = []
+        self._dirty: dict[int, list[float]] = {}  # user_id -> [d_elo, d_points, d_games]
+
+    # --- Очередь результатов ---
+
+    def record_match(self, player1: int, player2: int, score1: float, mode: str):
+        """Результат матча: score1 — 1 победа первого, 0 поражение, 0.5 ничья."""
+        self._queue.append(("match", player1, player2, score1, mode))
+
+    def add_points(self, user_id: int, points: int, mode: str):
+        self._queue.append(("points", user_id, points, mode))
+
+    def _apply_pending(self):
+        """Разбирает очередь в памяти. Дешёво: O(log R) на событие."""
+        if not self._queue:
+            return
+        queue, self._queue = self._queue, []
+        for event in queue:
+            if event[0] == "match":
+                _, p1, p2, score1, _mode = event
+                r1, r2 = self._elo.get(p1, BASE_ELO), self._elo.get(p2, BASE_ELO)
+                e1 = expected_score(r1, r2)
+                self._change(p1, self._k(p1) * (score1 - e1), 0, 1)
+                self._change(p2, self._k(p2) * ((1 - score1) - (1 - e1)), 0, 1)
+            else:
+                _, user_id, points, _mode = event
+                self._change(user_id, 0.0, points, 0)
+
+    def _k(self, user_id: int) -> float:
+        return K_NEW if self._games.get(user_id, 0) < PROVISIONAL_GAMES else K
+
+    def _change(self, user_id: int, d_elo: float, d_points: int, d_games: int):
+        self._set(user_id, self._elo.get(user_id, BASE_ELO) + d_elo,
+                  self._points.get(user_id, 0) + d_points, self._games.get(user_id, 0) + d_games)
+        add_delta(self._dirty, user_id, [d_elo, d_points, d_games])
+
+    def _set(self, user_id: int, elo: float, points: int, games: int):
+        self._elo[user_id], self._points[user_id], self._games[user_id] = elo, points, games
+        index = max(0, round(elo) + points)
+        old = self._index.get(user_id)
+        if old == index:
+            return
+        if index >= len(self._tree):
+            self._grow(index)
+        if old is not None:
+            self._tree.add(old, -1)
+        self._tree.add(index, 1)
+        self._index[user_id] = index
+
+    def _grow(self, index: int):
+        size = len(self._tree)
+        while size <= index:
+            size *= 2
+        self._tree = Fenwick(size)
+        for position in self._index.values():
+            self._tree.add(position, 1)
+
+    # --- Запросы ---
+
+    def get(self, user_id: int) -> Optional[tuple[int, float, int, int, int]]:
+        """(рейтинг, elo, очки, место, всего игроков) или None, если пользователь ещё не играл."""
+        self._apply_pending()
+        index = self._index.get(user_id)
+        if index is None:
+            return None
+        total = len(self._index)
+        place = total - self._tree.prefix(index) + 1  # 1 + сколько рейтингов строго выше
+        return index, self._elo[user_id], self._points[user_id], place, total
+
+    # --- Запись в БД ---
+
+    async def flush(self):
+        self._apply_pending()
+        await super().flush()
+
+    async def _write(self, db: aiosqlite.Connection, dirty: dict):
+        now = int(time.time())
+        # Приращения, а не значения: шарды обновляют одних и тех же пользователей
+        await db.executemany(
+            "INSERT INTO ratings (user_id, elo, points, games, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET elo=elo+?, points=points+excluded.points, "
+            "games=games+excluded.games, updated_at=excluded.updated_at",
+            [(user_id, BASE_ELO + d_elo, d_points, d_games, now, d_elo)
+             for user_id, (d_elo, d_points, d_games) in dirty.items()])
+
+    async def _load(self):
+        async with aiosqlite.connect(DB_PATH) as db:
+            cursor = await db.execute("SELECT user_id, elo, points, games FROM ratings")
+            rows = await cursor.fetchall()
+        for user_id, *values in rows:
+            self._set(user_id, *with_pending(values, self._dirty.get(user_id)))
+
+    async def start(self):
+        await init_db()
+        await super().start()
+        logger.info(f"Рейтинг: загружено {len(self._index)} игроков")
+
+
+rating = RatingService()
+
+
+async def init_db():
+    """
+    Создаёт таблицу ratings. При первом запуске заполняет её по старым данным:
+    Elo — прогоном завершённых партий из game_history по времени, очки — по победам в Footle.
+    """
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS ratings (
+                user_id INTEGER PRIMARY KEY,
+                elo REAL NOT NULL,
+                points INTEGER NOT NULL DEFAULT 0,
+                games INTEGER NOT NULL DEFAULT 0,
+                updated_at INTEGER
+            );
+        """)
+        await db.commit()
+        cursor = await db.execute("SELECT 1 FROM ratings LIMIT 1")
+        if await cursor.fetchone():
+            return
+
+        replay = RatingService()
+        cursor = await db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN ('game_history', 'user_rating')")
+        tables = {row[0] for row in await cursor.fetchall()}
+        if "game_history" in tables:
+            cursor = await db.execute("""
+                SELECT game_type, player1, player2, winner FROM game_history
+                WHERE status = 'finished' AND player1 IS NOT NULL AND player2 IS NOT NULL
+                ORDER BY ended_at
+            """)
+            for game_type, p1, p2, winner in await cursor.fetchall():
+                replay.record_match(p1, p2, 1.0 if winner == p1 else 0.0 if winner == p2 else 0.5, game_type)
+        if "user_rating" in tables:
+            # В user_rating — баланс Footle: по 10000 за победу
+            cursor = await db.execute("SELECT user_id, points FROM user_rating WHERE points > 0")
+            for user_id, points in await cursor.fetchall():
+                replay.add_points(user_id, points // 10000 * FOOTLE_WIN_POINTS, "footle")
+        replay._apply_pending()
+        if replay._index:
+            now = int(time.time())
+            await db.executemany(
+                "INSERT OR IGNORE INTO ratings (user_id, elo, points, games, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, replay._elo[user_id], replay._points[user_id], replay._games[user_id], now)
+                 for user_id in replay._index])
+            await db.commit()
+            logger.info(f"Рейтинг: перенесены результаты {len(replay._index)} игроков")
+
+
+@router.startup()
+async def on_startup_rating():
+    await rating.start()
+
+
+@router.shutdown()
+async def on_shutdown_rating():
+    await rating.stop()
+
+
+@router.message(Command("rating"))
+async def cmd_rating(message: types.Message):
+    """/rating — общий рейтинг и место; ответ из памяти, без запросов к БД."""
+    result = rating.get(message.from_user.id)
+    if result is None:
+        await message.answer("У тебя пока нет рейтинга — сыграй дуэль, Club Connect, Footle или Solo Guess.")
+        return
+    score, elo, points, place, total = result
+    await message.answer(
+        f"🏅 <b>Твой рейтинг: {score}</b>\n"
+        f"⚔️ Матчи (дуэли, Club Connect): {round(elo)} Elo\n"
+        f"🎯 Очки за одиночные игры: {points}\n"
+        f"📊 Место: <b>{place}</b> из {total}",
+        parse_mode=ParseMode.HTML
+    )
@@ -0,0 +1,168 @@
+# modules/solo_difficulty.py
+#
+# Адаптивная сложность Solo Guess. По каждому ответу считаем статистику игрока
+# (сколько раз показан, сколько угадан, суммарное время до верного ответа) и
+# обновляем два Elo-рейтинга: сложность игрока и навык пользователя. Верный
+# быстрый ответ — «победа» пользователя над фото, промах или «сдаюсь» — поражение;
+# медленный верный ответ засчитывается частично.
+#
+# Обновление — O(1) на ответ, только в памяти. В БД раз в FLUSH_INTERVAL секунд
+# уходят накопленные приращения (attempts += ..., rating += ...), а не итоговые
+# значения (modules/batching.py), поэтому шарды, обновляющие одного и того же
+# игрока, друг друга не затирают.
+#
+# Уровни из solo_players.json задают начальную сложность (априорный рейтинг):
+# пока статистики нет, порядок вопросов такой же, как был задуман вручную.
+
+import logging
+from collections import OrderedDict
+from typing import Any, Optional
+
+import aiosqlite
+
+from config import DB_PATH
+from modules.batching import DeltaBatcher, add_delta, with_pending
+from modules.solo_streams import player_key
+
+logger = logging.getLogger(__name__)
+
+BASE_RATING = 1000.0  # навык нового пользователя и сложность игроков 1-го уровня
+LEVEL_STEP = 150.0  # на столько сложнее каждый следующий уровень (и априори, и при подборе)
+K_PLAYER = 16.0
+K_USER_NEW = 32.0  # первые USER_PROVISIONAL ответов навык меняется быстрее
+K_USER = 16.0
+USER_PROVISIONAL = 30
+FAST_ANSWER = 10.0  # сек: верный ответ быстрее — полная победа
+SLOW_ANSWER = 60.0  # сек: верный ответ медленнее — половина победы
+SKILL_CACHE_SIZE = 10_000
+FLUSH_INTERVAL = 2.0  # сек
+
+
+def expected_score(skill: float, difficulty: float) -> float:
+    """Вероятность, что пользователь с навыком skill угадает игрока сложности difficulty."""
+    return 1.0 / (1.0 + 10 ** ((difficulty - skill) / 400.0))
+
+
+def answer_score(correct: bool, elapsed: float) -> float:
+    if not correct:
+        return 0.0
+    slowness = min(1.0, max(0.0, (elapsed - FAST_ANSWER) / (SLOW_ANSWER - FAST_ANSWER)))
+    return 1.0 - 0.5 * slowness
+
+
+class SoloDifficulty(DeltaBatcher):
+    label = "Solo: статистика ответов"
+    delta_attrs = ("_player_delta", "_skill_delta")
+    flush_interval = FLUSH_INTERVAL
+    reload_interval = FLUSH_INTERVAL  # сложность игроков меняют все шарды — подтягиваем на каждой записи
+
+    def __init__(self):
+        super().__init__()
+        # player_key -> [attempts, solved, time_total, rating]
+        self._players: dict[str, list[float]] = {}
+        self._player_delta: dict[str, list[float]] = {}  # ещё не записанные приращения
+        self._prior: dict[str, float] = {}  # априорная сложность по уровню из solo_players.json
+        self._prior_source: Any = None
+        self._skills: OrderedDict[int, list[float]] = OrderedDict()  # user_id -> [rating, answers]
+        self._skill_delta: dict[int, list[float]] = {}
+
+    # --- Рейтинги ---
+
+    def sync_levels(self, solo_players: dict[str, list[dict[str, Any]]]):
+        """Пересчитывает априорную сложность, если solo_players.json перезагрузили."""
+        if solo_players is self._prior_source:
+            return
+        self._prior = {player_key(p): BASE_RATING + (int(level) - 1) * LEVEL_STEP
+                       for level, level_players in solo_players.items() for p in level_players}
+        self._prior_source = solo_players
+
+    def difficulty(self, player: dict[str, Any]) -> float:
+        key = player_key(player)
+        stats = self._players.get(key)
+        return stats[3] if stats else self._prior.get(key, BASE_RATING)
+
+    async def skill(self, user_id: int) -> float:
+        """Навык пользователя; в БД идём, только если его нет в памяти."""
+        cached = self._skills.get(user_id)
+        if cached is None:
+            async with aiosqlite.connect(DB_PATH) as db:
+                cursor = await db.execute("SELECT rating, answers FROM solo_user_skill WHERE user_id=?", (user_id,))
+                row = await cursor.fetchone()
+            cached = with_pending(row if row else (BASE_RATING, 0), self._skill_delta.get(user_id))
+            self._cache_skill(user_id, cached)
+        else:
+            self._skills.move_to_end(user_id)
+        return cached[0]
+
+    def _cache_skill(self, user_id: int, value: list[float]):
+        self._skills[user_id] = value
+        self._skills.move_to_end(user_id)
+        while len(self._skills) > SKILL_CACHE_SIZE:
+            self._skills.popitem(last=False)
+
+    def target(self, skill: float, level: int) -> float:
+        """Сложность вопросов, которую подбираем пользователю на уровне level."""
+        return skill + (level - 1) * LEVEL_STEP
+
+    def record(self, user_id: int, player: dict[str, Any], correct: bool, elapsed: float):
+        """Учитывает один ответ. Вызывается на каждый ответ, без обращений к БД."""
+        key = player_key(player)
+        stats = self._players.get(key)
+        if stats is None:
+            stats = self._players[key] = [0, 0, 0.0, self._prior.get(key, BASE_RATING)]
+        # Если навык успели вытеснить из кэша, считаем от базового: в БД всё равно уходит только приращение
+        skill = self._skills.get(user_id)
+        if skill is None:
+            skill = [BASE_RATING, USER_PROVISIONAL]
+            self._cache_skill(user_id, skill)
+
+        surprise = answer_score(correct, elapsed) - expected_score(skill[0], stats[3])
+        user_change = (K_USER_NEW if skill[1] < USER_PROVISIONAL else K_USER) * surprise
+        player_change = -K_PLAYER * surprise
+        solved_time = elapsed if correct else 0.0
+
+        stats[0] += 1
+        stats[1] += int(correct)
+        stats[2] += solved_time
+        stats[3] += player_change
+        skill[0] += user_change
+        skill[1] += 1
+
+        add_delta(self._player_delta, key, [1, int(correct), solved_time, player_change])
+        add_delta(self._skill_delta, user_id, [user_change, 1])
+
+    def player_stats(self, player: dict[str, Any]) -> Optional[tuple[int, float, Optional[float]]]:
+        """(показов, доля угаданных, среднее время верного ответа) или None, если статистики нет."""
+        stats = self._players.get(player_key(player))
+        if not stats or not stats[0]:
+            return None
+        return int(stats[0]), stats[1] / stats[0], stats[2] / stats[1] if stats[1] else None
+
+    # --- Запись в БД ---
+
+    async def _write(self, db: aiosqlite.Connection, players: dict, skills: dict):
+        await db.executemany(
+            "INSERT INTO solo_player_stats (player_key, attempts, solved, time_total, rating) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(player_key) DO UPDATE SET "
+            "attempts=attempts+excluded.attempts, solved=solved+excluded.solved, "
+            "time_total=time_total+excluded.time_total, rating=rating+?",
+            [(key, a, s, t, self._prior.get(key, BASE_RATING) + r, r) for key, (a, s, t, r) in players.items()])
+        await db.executemany(
+            "INSERT INTO solo_user_skill (user_id, rating, answers) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET rating=rating+?, answers=answers+excluded.answers",
+            [(user_id, BASE_RATING + r, n, r) for user_id, (r, n) in skills.items()])
+
+    async def _load(self):
+        async with aiosqlite.connect(DB_PATH) as db:
+            cursor = await db.execute("SELECT player_key, attempts, solved, time_total, rating FROM solo_player_stats")
+            rows = await cursor.fetchall()
+        for key, *stats in rows:
+            # Поверх значений из БД — то, что накопилось в памяти и ещё не записано
+            self._players[key] = with_pending(stats, self._player_delta.get(key))
+
+    async def start(self, solo_players: dict[str, list[dict[str, Any]]]):
+        self.sync_levels(solo_players)
+        await super().start()
+
+
+solo_difficulty = SoloDifficulty()
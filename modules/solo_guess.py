@@ -3,8 +3,16 @@
 import logging
 import random
 import asyncio
+import time
 
+from modules.data_registry import data_registry
+from modules.dispatch_index import dispatch_index
 from modules.database import get_solo_level, set_solo_level
+from modules.name_keys import name_key, player_keys
+from modules.photos import photo_pipeline
+from modules.rating import rating, SOLO_ANSWER_POINTS
+from modules.solo_difficulty import solo_difficulty
+from modules.solo_streams import solo_streams
 from aiogram.types import ReplyKeyboardRemove
 from typing import Optional  # для аннотаций
 from aiogram import Router, types, F
@@ -19,23 +27,44 @@ from aiogram.types import (
 from aiogram.exceptions import TelegramBadRequest
 
 from bot import bot
-from config import SOLO_PLAYERS_JSON, BASE_DIR  # пути к данным :contentReference[oaicite:0]{index=0}
+from config import SOLO_PLAYERS_JSON  # пути к данным :contentReference[oaicite:0]{index=0}
 from utils import load_json, is_match
-from aiogram.types import FSInputFile
 # Конфигурация
-PHOTOS_DIR = BASE_DIR / "footphoto"
 TOTAL_QUESTIONS_PER_LEVEL = 5
 FUZZY_THRESHOLD = 75  # тот же порог, что был в оригинале :contentReference[oaicite:1]{index=1}
+# Стадии открытия фото (варианты из modules/imaging.py), от самой сложной к самой понятной.
+# Уровень задаёт стартовую стадию, каждая подсказка открывает следующую.
+REVEAL_STAGES = ("pixel", "blur_3", "blur_2", "blur_1")
+LEVEL_START_STAGE = {1: 2, 2: 1}  # остальные уровни — с самой сложной стадии
 
 router = Router()
 logger = logging.getLogger(__name__)
 
 # Загрузка данных
-try:
-    SOLO_PLAYERS_DATA = load_json(SOLO_PLAYERS_JSON)
-except Exception as e:
-    SOLO_PLAYERS_DATA = {}
-    logger.error(f"Ошибка загрузки {SOLO_PLAYERS_JSON}: {e}")
+def build_solo_players() -> dict:
+    levels = load_json(SOLO_PLAYERS_JSON)
+    if not isinstance(levels, dict) or not any(levels.values()):
+        raise ValueError(f"в {SOLO_PLAYERS_JSON} нет уровней с игроками")
+    # Ключи имён (латиница/кириллица) считаем один раз при загрузке, а не на каждый ответ
+    for players in levels.values():
+        for p in players:
+            p["keys"] = player_keys(p)
+    return levels
+
+
+data_registry.register("solo_players", [SOLO_PLAYERS_JSON], build_solo_players, fallback=dict)
+
+
+@router.startup()
+async def on_startup_solo():
+    await solo_streams.start()
+    await solo_difficulty.start(data_registry.get("solo_players") or {})
+
+
+@router.shutdown()
+async def on_shutdown_solo():
+    await solo_streams.stop()
+    await solo_difficulty.stop()
 
 # Тексты
 CORRECT_ANSWER_PHRASES = [
@@ -94,7 +123,7 @@ def get_game_keyboard_no_hint() -> InlineKeyboardMarkup:
 
 def get_level_complete_keyboard(next_level: int) -> ReplyKeyboardMarkup:
     buttons = []
-    if str(next_level) in SOLO_PLAYERS_DATA:
+    if str(next_level) in data_registry.get("solo_players"):
         buttons.append(KeyboardButton(text=f"Уровень {next_level}"))
     buttons.append(KeyboardButton(text="Footle"))
     return ReplyKeyboardMarkup(
@@ -116,19 +145,44 @@ async def start_solo_game(
         saved = await get_solo_level(message.from_user.id)
         level = saved or 1
 
-    if str(level) not in SOLO_PLAYERS_DATA:
+    solo_players = data_registry.get("solo_players")
+    if str(level) not in solo_players:
         await message.answer(
             "🎉 Поздравляю, ты прошёл все уровни!",
             reply_markup=get_solo_end_reply_keyboard()
         )
         return
 
+    # Вопросы подбираем под навык пользователя из всех игроков: уровень сдвигает целевую
+    # сложность, а не ограничивает пул. Без повторов, пока не пройдены все игроки.
+    solo_difficulty.sync_levels(solo_players)
+    target = solo_difficulty.target(await solo_difficulty.skill(message.from_user.id), level)
+    level_players = await solo_streams.next_questions(
+        message.from_user.id,
+        [p for players in solo_players.values() for p in players],
+        TOTAL_QUESTIONS_PER_LEVEL,
+        prefer=lambda p: abs(solo_difficulty.difficulty(p) - target)
+    )
+    # Фото уровня проверяем и готовим один раз здесь, а не перед каждым вопросом
+    missing = await photo_pipeline.prepare([p["photo_file"] for p in level_players])
+    if missing:
+        logger.error(f"Solo: уровень {level} не запущен, нет фото: {', '.join(missing)}")
+        await message.answer(
+            "😞 Упс, не удалось загрузить вопрос. Пожалуйста, попробуйте чуть позже.",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return
+
     # Сохраняем прогресс в БД
     await set_solo_level(message.from_user.id, level)
 
-    # Инициализируем FSM-данные
+    # Инициализируем FSM-данные. Список игроков уровня копируем в FSM,
+    # чтобы перезагрузка data/ не поменяла вопросы посреди уровня.
     await state.set_state(SoloGuessStates.in_game)
-    await state.update_data(level=level, question_index=0, score=0)
+    await state.update_data(
+        level=level, question_index=0, score=0,
+        level_players=level_players
+    )
 
     # Приветственное сообщение
     await message.answer(
@@ -149,29 +203,33 @@ async def ask_question(
     idx   = data["question_index"]
 
     try:
-        p = SOLO_PLAYERS_DATA[str(level)][idx]
+        p = data["level_players"][idx]
         answers = [p["canonical_name"].lower()] + [a.lower() for a in p.get("aliases", [])]
-        await state.update_data(
-            correct_answers=answers,
-            position=p.get("position"),
-            nationality=p.get("nationality")
-        )
-
-        photo_path = PHOTOS_DIR / p["photo_file"]
-        if not photo_path.exists():
-            raise FileNotFoundError(f"Photo not found: {photo_path}")
 
         caption = (f"{feedback_text}\n\n" if feedback_text else "") + \
                   f"{random.choice(QUESTION_PHRASES)} ({idx+1}/{TOTAL_QUESTIONS_PER_LEVEL})"
 
-        sent = await bot.send_photo(
-            chat_id=message.chat.id,
-            photo=FSInputFile(str(photo_path), filename=photo_path.name),
+        stage = LEVEL_START_STAGE.get(level, 0)
+        sent = await photo_pipeline.send_photo(
+            message.chat.id,
+            p["photo_file"],
+            REVEAL_STAGES[stage],
             caption=caption,
             reply_markup=get_game_keyboard(),
             parse_mode=ParseMode.HTML
         )
-        await state.update_data(photo_message_id=sent.message_id)
+        await state.update_data(
+            correct_answers=answers,
+            answer_keys=p.get("keys") or player_keys(p),
+            position=p.get("position"),
+            nationality=p.get("nationality"),
+            photo_message_id=sent.message_id, photo_file=p["photo_file"],
+            photo_caption=caption, reveal_stage=stage, asked_at=time.time()
+        )
+
+        # Пока игрок думает, готовим фото следующего вопроса
+        if idx + 1 < min(TOTAL_QUESTIONS_PER_LEVEL, len(data["level_players"])):
+            photo_pipeline.prefetch(data["level_players"][idx + 1]["photo_file"], REVEAL_STAGES[stage])
 
     except Exception:
         logger.exception(f"ask_question error on level {level}, idx {idx}")
@@ -182,36 +240,75 @@ async def ask_question(
         await state.clear()
 
 
+async def _remove_photo_keyboard(chat_id: int, photo_message_id: Optional[int]):
+    if not photo_message_id:
+        return
+    try:
+        await bot.edit_message_reply_markup(chat_id=chat_id, message_id=photo_message_id, reply_markup=None)
+    except TelegramBadRequest:
+        pass
+
+
+def _record_answer(user_id: int, data: dict, correct: bool):
+    """Учитывает ответ в статистике сложности (только память, в БД — пачкой)."""
+    try:
+        player = data["level_players"][data["question_index"]]
+    except (KeyError, IndexError):
+        return
+    solo_difficulty.record(user_id, player, correct, time.time() - data.get("asked_at", time.time()))
+
+
 # Обработка ответов
 @router.message(StateFilter(SoloGuessStates.in_game))
 async def handle_guess(message: types.Message, state: FSMContext):
     text = message.text or ""
     data = await state.get_data()
-    # проверка fuzzy через utils.is_match
-    correct = any(is_match(text, variant, FUZZY_THRESHOLD) for variant in data.get("correct_answers", []))
-    # снимаем inline-клавиатуру с фото
-    if data.get("photo_message_id"):
-        try:
-            await bot.edit_message_reply_markup(
-                chat_id=message.chat.id,
-                message_id=data["photo_message_id"],
-                reply_markup=None
-            )
-        except TelegramBadRequest:
-            pass
+    # сначала ключ имени (любой алфавит, ё, удвоенные буквы), потом fuzzy через utils.is_match
+    correct = name_key(text) in data.get("answer_keys", ()) or \
+        any(is_match(text, variant, FUZZY_THRESHOLD) for variant in data.get("correct_answers", []))
+    _record_answer(message.from_user.id, data, correct)
 
     # обновляем счёт и статус
     await state.update_data(
         previous_round_status = "correct" if correct else "incorrect",
         score = data.get("score", 0) + (1 if correct else 0)
     )
-    await proceed_to_next_question(message, state)
+    # снимаем inline-клавиатуру с фото параллельно со следующим вопросом:
+    # от ответа до нового фото — один запрос к API
+    await asyncio.gather(
+        _remove_photo_keyboard(message.chat.id, data.get("photo_message_id")),
+        proceed_to_next_question(message, state)
+    )
+
+dispatch_index.state(SoloGuessStates.in_game, handle_guess)
 
 # Hint & Give Up
 @router.callback_query(F.data=="solo_hint", StateFilter(SoloGuessStates.in_game))
 async def cb_hint(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
     data = await state.get_data()
+    # Каждая подсказка открывает фото на стадию понятнее; на последней добавляем текст
+    stage = min(data.get("reveal_stage", len(REVEAL_STAGES) - 1) + 1, len(REVEAL_STAGES) - 1)
+    last_stage = stage == len(REVEAL_STAGES) - 1
+    media_replaced = False
+    if data.get("photo_message_id") and data.get("photo_file") and stage != data.get("reveal_stage"):
+        try:
+            await photo_pipeline.edit_photo(
+                callback.message.chat.id,
+                data["photo_message_id"],
+                data["photo_file"],
+                REVEAL_STAGES[stage],
+                caption=data.get("photo_caption"),
+                parse_mode=ParseMode.HTML,
+                reply_markup=get_game_keyboard_no_hint() if last_stage else get_game_keyboard()
+            )
+            media_replaced = True
+        except TelegramBadRequest:
+            pass
+        await state.update_data(reveal_stage=stage)
+        if not last_stage:
+            return
+
     pos_icon = {"Нападающий":"⚽","Защитник":"🛡️","Полузащитник":"🎯","Вратарь":"🧤"}.get(data.get("position"),"ℹ️")
     flag = {
         "Аргентина":"🇦🇷","Португалия":"🇵🇹","Бразилия":"🇧🇷","Франция":"🇫🇷",
@@ -219,12 +316,12 @@ async def cb_hint(callback: types.CallbackQuery, state: FSMContext):
     await callback.message.answer(
         f"{random.choice(HINT_PHRASES)}\n\n{pos_icon} Позиция: <b>{data.get('position')}</b>\n{flag} Национальность: <b>{data.get('nationality')}</b>"
     )
-    # убираем кнопку «Подсказка»
-    if data.get("photo_message_id"):
+    # убираем кнопку «Подсказка» (если не убрали вместе с заменой фото)
+    if data.get("photo_message_id") and not media_replaced:
         try:
             await bot.edit_message_reply_markup(
-                callback.message.chat.id,
-                data["photo_message_id"],
+                chat_id=callback.message.chat.id,
+                message_id=data["photo_message_id"],
                 reply_markup=get_game_keyboard_no_hint()
             )
         except TelegramBadRequest:
@@ -235,17 +332,12 @@ async def cb_give_up(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
     # удаляем клавиатуру и переходим дальше
     data = await state.get_data()
-    if data.get("photo_message_id"):
-        try:
-            await bot.edit_message_reply_markup(
-                callback.message.chat.id,
-                data["photo_message_id"],
-                reply_markup=None
-            )
-        except TelegramBadRequest:
-            pass
+    _record_answer(callback.from_user.id, data, False)
     await state.update_data(previous_round_status="gave_up")
-    await proceed_to_next_question(callback.message, state)
+    await asyncio.gather(
+        _remove_photo_keyboard(callback.message.chat.id, data.get("photo_message_id")),
+        proceed_to_next_question(callback.message, state)
+    )
 
 # Логика перехода между вопросами и завершения уровня
 async def proceed_to_next_question(message: types.Message, state: FSMContext):
@@ -262,7 +354,6 @@ async def proceed_to_next_question(message: types.Message, state: FSMContext):
     if next_idx >= TOTAL_QUESTIONS_PER_LEVEL:
         if feedback:
             await message.answer(feedback)
-        await asyncio.sleep(1)
         await show_level_complete_menu(message, state)
     else:
         await state.update_data(question_index=next_idx)
@@ -278,6 +369,8 @@ async def show_level_complete_menu(
 
     # Сохраняем, на каком уровне игрок теперь будет стартовать в следующий раз
     await set_solo_level(message.from_user.id, next_lvl)
+    if score:
+        rating.add_points(message.from_user.id, score * SOLO_ANSWER_POINTS, "solo")
 
     # Выбираем сообщение-фидбек
     if score == TOTAL_QUESTIONS_PER_LEVEL:
@@ -322,12 +415,16 @@ async def handle_next_level_button(message: types.Message, state: FSMContext):
     except:
         await message.answer("Неверная команда. Попробуйте снова.")
 
+dispatch_index.state(SoloGuessStates.waiting_for_choice, handle_next_level_button, lambda text: text.startswith("Уровень"))
+
 @router.message(StateFilter(SoloGuessStates.waiting_for_choice), F.text=="Footle")
 async def handle_to_footle(message: types.Message, state: FSMContext):
     await state.clear()
     from modules.footle import cmd_footle
     await cmd_footle(message)
 
+dispatch_index.state(SoloGuessStates.waiting_for_choice, handle_to_footle, lambda text: text == "Footle")
+
 @router.message(lambda msg: msg.text == "🔄 Начать Solo Guess заново")
 async def cmd_restart_solo(message: types.Message, state: FSMContext):
     await message.answer(
@@ -336,6 +433,8 @@ async def cmd_restart_solo(message: types.Message, state: FSMContext):
     )
     await start_solo_game(message, state, level=1)
 
+dispatch_index.button("🔄 Начать Solo Guess заново", cmd_restart_solo)
+
 @router.message(lambda msg: msg.text == "🔙 Вернуться в Footle")
 async def cmd_back_to_footle(message: types.Message, state: FSMContext):
     await message.answer(
@@ -344,3 +443,5 @@ async def cmd_back_to_footle(message: types.Message, state: FSMContext):
     )
     from modules.footle import cmd_footle
     await cmd_footle(message)
+
+dispatch_index.button("🔙 Вернуться в Footle", cmd_back_to_footle)
@@ -0,0 +1,154 @@
+# modules/solo_streams.py
+#
+# Порядок вопросов Solo Guess для каждого пользователя. Пул — все игроки Solo:
+# вопросы берутся случайно из полосы игроков, чья сложность ближе всего к
+# уровню, и не повторяются, пока пользователь не увидел весь пул; после этого
+# начинается новый круг.
+#
+# Что пользователь уже видел, хранится битовой маской: у каждого игрока есть
+# короткий числовой id (таблица player_ids, id выдаёт SQLite — общий для всех
+# шардов), бит с этим номером в маске пользователя — «уже был». Маска лежит в
+# solo_seen как BLOB: на тысячу игроков — 125 байт на пользователя. В памяти
+# держим маски недавно игравших (LRU), остальные читаются из БД по запросу.
+# Изменённые маски пишутся в БД пачкой раз в FLUSH_INTERVAL секунд.
+
+import asyncio
+import heapq
+import logging
+import random
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import aiosqlite
+
+from config import DB_PATH
+from modules.data_registry import data_registry
+
+logger = logging.getLogger(__name__)
+
+SEEN_CACHE_SIZE = 10_000  # масок в памяти
+FLUSH_INTERVAL = 2.0  # сек
+DIFFICULTY_BAND = 4  # из скольких ближайших по сложности (на один вопрос) выбираем случайно
+
+
+def player_key(player: dict[str, Any]) -> str:
+    return player["canonical_name"].lower()
+
+
+def _to_blob(mask: int) -> bytes:
+    return mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+
+
+def _choose(entries: list[tuple[int, dict[str, Any]]], count: int,
+            prefer: Optional[Callable[[dict[str, Any]], float]]) -> list[tuple[int, dict[str, Any]]]:
+    if prefer and len(entries) > count:
+        # Полоса ближайших по prefer, внутри неё — случайная выборка: у пользователей одного
+        # уровня разные вопросы, даже когда сложности игроков почти не совпадают.
+        # Перемешивание до nsmallest — чтобы равные значения попадали в полосу случайно.
+        shuffled = random.sample(entries, len(entries))
+        entries = heapq.nsmallest(count * DIFFICULTY_BAND, shuffled, key=lambda entry: prefer(entry[1]))
+    return random.sample(entries, count)
+
+
+class SoloStreams:
+    def __init__(self):
+        self._pids: dict[str, int] = {}
+        self._seen: OrderedDict[int, int] = OrderedDict()  # user_id -> маска
+        self._dirty: dict[int, int] = {}  # ещё не записанные маски
+        self._task: Optional[asyncio.Task] = None
+
+    async def _intern(self, db: aiosqlite.Connection, keys: list[str]):
+        missing = [k for k in keys if k not in self._pids]
+        if not missing:
+            return
+        await db.executemany("INSERT OR IGNORE INTO player_ids (player_key) VALUES (?)", [(k,) for k in missing])
+        await db.commit()  # не держим блокировку записи до конца выбора вопросов
+        placeholders = ",".join("?" * len(missing))
+        cursor = await db.execute(f"SELECT player_key, pid FROM player_ids WHERE player_key IN ({placeholders})",
+                                  missing)
+        self._pids.update(await cursor.fetchall())
+
+    async def _load_seen(self, db: aiosqlite.Connection, user_id: int) -> int:
+        cursor = await db.execute("SELECT seen FROM solo_seen WHERE user_id=?", (user_id,))
+        row = await cursor.fetchone()
+        return int.from_bytes(row[0], "little") if row else 0
+
+    def _cache(self, user_id: int, mask: int):
+        self._seen[user_id] = mask
+        self._seen.move_to_end(user_id)
+        while len(self._seen) > SEEN_CACHE_SIZE:
+            self._seen.popitem(last=False)
+
+    async def next_questions(self, user_id: int, players: list[dict[str, Any]], count: int,
+                             prefer: Optional[Callable[[dict[str, Any]], float]] = None) -> list[dict[str, Any]]:
+        """
+        Выбирает count игроков из пула: сначала те, кого пользователь ещё не видел;
+        если их не хватает, круг начинается заново. Отмечает выбранных как увиденных.
+        prefer — чем меньше значение, тем охотнее берём игрока: выбор идёт случайно среди
+        count * DIFFICULTY_BAND игроков с наименьшим prefer.
+        """
+        keys = [player_key(p) for p in players]
+        mask = self._dirty.get(user_id, self._seen.get(user_id))
+        if mask is None or any(k not in self._pids for k in keys):
+            # В БД идём, только если маски нет в памяти или в пуле новый игрок
+            async with aiosqlite.connect(DB_PATH) as db:
+                await self._intern(db, keys)
+                if mask is None:
+                    mask = await self._load_seen(db, user_id)
+
+        pool = [(self._pids[k], p) for k, p in zip(keys, players)]
+        unseen = [entry for entry in pool if not mask >> entry[0] & 1]
+        if len(unseen) >= count:
+            picked = _choose(unseen, count, prefer)
+        else:
+            # Пул исчерпан: добираем оставшихся непоказанных и начинаем новый круг
+            picked = _choose(unseen, len(unseen), prefer)
+            for pid, _ in pool:
+                mask &= ~(1 << pid)
+            picked_pids = {pid for pid, _ in picked}
+            rest = [entry for entry in pool if entry[0] not in picked_pids]
+            picked += _choose(rest, min(count - len(picked), len(rest)), prefer)
+        for pid, _ in picked:
+            mask |= 1 << pid
+
+        self._cache(user_id, mask)
+        self._dirty[user_id] = mask
+        return [player for _, player in picked]
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        try:
+            async with aiosqlite.connect(DB_PATH) as db:
+                await db.executemany(
+                    "INSERT INTO solo_seen (user_id, seen) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET seen=excluded.seen",
+                    [(user_id, _to_blob(mask)) for user_id, mask in dirty.items()])
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Solo: не удалось сохранить {len(dirty)} масок просмотренных игроков: {e}")
+            for user_id, mask in dirty.items():
+                self._dirty.setdefault(user_id, mask)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flush()
+
+    async def start(self):
+        # Сразу выдаём id всем игрокам из solo_players.json, чтобы в хэндлерах не ходить за ними в БД
+        keys = [player_key(p) for level_players in (data_registry.get("solo_players") or {}).values()
+                for p in level_players]
+        async with aiosqlite.connect(DB_PATH) as db:
+            await self._intern(db, keys)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+solo_streams = SoloStreams()
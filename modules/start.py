@@ -15,6 +15,7 @@ from config import SALAM_DIR
 from modules.footle import cmd_footle  # команда Footle
 from aiogram.fsm.context import FSMContext # <-- ДОБАВЬ ЭТОТ ИМПОРТ
 from modules.solo_guess import start_solo_game # <-- ДОБАВЬ ЭТОТ ИМПОРТ
+from modules.dispatch_index import dispatch_index
 
 router = Router()
 
@@ -97,6 +98,8 @@ async def on_text_footle(message: types.Message):
     # Запускаем Footle – показывает пустую доску, и бот ждёт ввод первой попытки
     await cmd_footle(message)
 
+dispatch_index.button("Footle", on_text_footle)
+
 
 @router.message(lambda m: m.text == "Solo Guess")
 async def on_text_solo(message: types.Message, state: FSMContext):  # <-- ДОБАВЬ state: FSMContext
@@ -107,3 +110,5 @@ async def on_text_solo(message: types.Message, state: FSMContext):  # <-- ДОБ
 
     # Сразу запускаем игру с первого уровня
     await start_solo_game(message, state, level=1)
+
+dispatch_index.button("Solo Guess", on_text_solo)
@@ -0,0 +1,167 @@
+# modules/ttt_ai.py
+#
+# Бот-соперник для Club Connect. Ход в игре — выбрать клетку и назвать игрока,
+# который играл за оба клуба; не назвал — ход переходит сопернику, поле не
+# меняется. Поэтому сила хода зависит от того, насколько клетка «лёгкая»:
+#   p(клетка) = 1 - (1 - knowledge) ** n, где n — сколько подходящих игроков
+#   есть в CLUB_PLAYERS, knowledge — вероятность вспомнить каждого из них.
+# Для бота knowledge — настройка сложности, для человека — TTT_AI_HUMAN_KNOWLEDGE.
+#
+# Бот выбирает клетку expectimax-поиском по полю 3x3: свой ход — максимум по
+# клеткам, ход человека — минимум, результат ответа — ожидание по p. Промах
+# возвращает то же поле с ходом соперника, то есть в графе позиций есть циклы;
+# значения «ход бота»/«ход человека» для одного поля находятся итерацией по
+# стратегиям до неподвижной точки (дочерние поля всегда содержат больше фишек,
+# их значения уже посчитаны).
+#
+# Из-за промахов достижимы почти все 3^9 полей, поэтому сетку решаем целиком:
+# один проход по всем позициям от полных к пустой, значения — в плоских массивах
+# по троичному индексу позиции (ttt_board.position_index). Это таблица
+# транспозиций сетки: одна на одинаковые вероятности и общая для всех партий,
+# после решения любой ход — чтение по индексу. Решение — ~0.1 с процессора,
+# поэтому идёт в пуле процессов, как сборка фото, и не тормозит цикл событий.
+
+import asyncio
+import logging
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+from config import TTT_AI_WORKERS
+from modules import ttt_board
+
+logger = logging.getLogger(__name__)
+
+GRID_CACHE_SIZE = 32  # сколько решённых сеток держим в памяти (~0.3 МБ на сетку)
+_ITERATIONS = 20  # предел проходов итерации по стратегиям (на практике 2-3)
+_POSITIONS = 3 ** ttt_board.CELLS
+_POW3 = tuple(3 ** cell for cell in range(ttt_board.CELLS))
+
+# Значения — вероятность победы бота (ничья — половина)
+_WIN, _DRAW, _LOSS = 1.0, 0.5, 0.0
+
+Grid = tuple[tuple[float, ...], tuple[float, ...]]  # (вероятности бота, вероятности человека) по клеткам
+
+
+def success_probabilities(answer_counts: list[int], knowledge: float) -> tuple[float, ...]:
+    """Вероятность назвать подходящего игрока для каждой клетки."""
+    return tuple(1.0 - (1.0 - knowledge) ** n if n > 0 else 0.0 for n in answer_counts)
+
+
+@lru_cache(maxsize=2)
+def _positions(bot_symbol: str) -> tuple[array, list[tuple[int, tuple[int, ...]]]]:
+    """
+    Не зависящая от сетки часть: значения конечных позиций (победа, поражение, ничья или
+    «линию не собрать никому») и незаконченные позиции в порядке убывания числа фишек.
+    """
+    terminal = array("d", [_DRAW]) * _POSITIONS
+    ongoing = []
+    for x in range(ttt_board.FULL + 1):
+        free = ttt_board.FULL & ~x
+        o = free
+        while True:  # все подмаски свободных клеток
+            index = ttt_board.position_index(x, o)
+            outcome = ttt_board.outcome(x, o)
+            result = outcome & ttt_board.RESULT_MASK
+            if result in (ttt_board.X_WINS, ttt_board.O_WINS):
+                terminal[index] = _WIN if (result == ttt_board.X_WINS) == (bot_symbol == "X") else _LOSS
+            elif outcome != ttt_board.ONGOING and result == ttt_board.ONGOING:
+                cells = tuple(c for c in range(ttt_board.CELLS) if ttt_board.is_free(x, o, c))
+                ongoing.append((ttt_board.CELLS - len(cells), index, cells))
+            if o == 0:
+                break
+            o = (o - 1) & free
+    ongoing.sort(reverse=True)
+    return terminal, [(index, cells) for _, index, cells in ongoing]
+
+
+def solve_grid(grid: Grid, bot_symbol: str = "O") -> tuple[array, array, bytes]:
+    """
+    Решает сетку целиком: (значение при ходе бота, при ходе человека, лучшая клетка бота)
+    для каждой позиции по её троичному индексу. Чистая функция — выполняется в пуле процессов.
+    """
+    bot_p, human_p = grid
+    terminal, ongoing = _positions(bot_symbol)
+    bot_step = 2 if bot_symbol == "O" else 1  # цифра символа в троичной записи позиции
+    human_step = 3 - bot_step
+    on_bot_move, on_human_move = array("d", terminal), array("d", terminal)
+    best = bytearray(_POSITIONS)
+
+    for index, cells in ongoing:
+        # Значения полей после удачного ответа — в них больше фишек, они уже посчитаны
+        after_bot = [(c, on_human_move[index + bot_step * _POW3[c]]) for c in cells]
+        after_human = [(c, on_bot_move[index + human_step * _POW3[c]]) for c in cells]
+
+        # Неподвижная точка: bot = max_c(p*после + (1-p)*human), human = min_c(q*после + (1-q)*bot).
+        # Итерация по стратегиям: при выбранных клетках система линейная и решается точно,
+        # после этого клетки выбираются заново.
+        human_value = _DRAW
+        bot_cell = human_cell = None
+        for _ in range(_ITERATIONS):
+            bot_value, new_bot_cell = max((bot_p[c] * v + (1 - bot_p[c]) * human_value, c) for c, v in after_bot)
+            _, new_human_cell = min((human_p[c] * v + (1 - human_p[c]) * bot_value, c) for c, v in after_human)
+            if (new_bot_cell, new_human_cell) == (bot_cell, human_cell):
+                break
+            bot_cell, human_cell = new_bot_cell, new_human_cell
+            p, q = bot_p[bot_cell], human_p[human_cell]
+            win = on_human_move[index + bot_step * _POW3[bot_cell]]
+            loss = on_bot_move[index + human_step * _POW3[human_cell]]
+            stay = (1 - p) * (1 - q)  # оба промахнулись — снова та же позиция
+            bot_value = (p * win + (1 - p) * q * loss) / (1 - stay) if stay < 1 else _DRAW
+            human_value = q * loss + (1 - q) * bot_value
+        on_bot_move[index], on_human_move[index], best[index] = bot_value, human_value, bot_cell
+    return on_bot_move, on_human_move, bytes(best)
+
+
+class ExpectimaxAI:
+    def __init__(self, bot_symbol: str = "O"):
+        self.bot_symbol = bot_symbol
+        self._tables: OrderedDict[Grid, tuple[array, array, bytes]] = OrderedDict()
+        self._pending: dict[Grid, asyncio.Future] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=TTT_AI_WORKERS)
+        return self._executor
+
+    async def prepare(self, grid: Grid):
+        """Решает сетку, если её ещё нет в памяти. Одновременные запросы одной сетки ждут одно решение."""
+        if grid in self._tables:
+            self._tables.move_to_end(grid)
+            return
+        future = self._pending.get(grid)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._pool(), solve_grid, grid, self.bot_symbol)
+            self._pending[grid] = future
+            future.add_done_callback(lambda f: self._on_solved(grid, f))
+        # shield: отмена хода одной партии не должна отменять решение, которое ждут другие
+        await asyncio.shield(future)
+
+    def _on_solved(self, grid: Grid, future: asyncio.Future):
+        self._pending.pop(grid, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._tables[grid] = future.result()
+        while len(self._tables) > GRID_CACHE_SIZE:
+            self._tables.popitem(last=False)
+
+    def best_cell(self, grid: Grid, x_mask: int, o_mask: int) -> int:
+        """Клетка, которую бот выбирает в незаконченной позиции. Сетка должна быть решена (prepare)."""
+        return self._tables[grid][2][ttt_board.position_index(x_mask, o_mask)]
+
+    def win_chance(self, grid: Grid, x_mask: int, o_mask: int, bot_to_move: bool = True) -> float:
+        """Вероятность победы бота (ничья — половина). Сетка должна быть решена (prepare)."""
+        on_bot_move, on_human_move, _ = self._tables[grid]
+        index = ttt_board.position_index(x_mask, o_mask)
+        return on_bot_move[index] if bot_to_move else on_human_move[index]
+
+    async def stop(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+ai = ExpectimaxAI()
@@ -0,0 +1,146 @@
+# modules/ttt_board.py
+#
+# Ядро поля Club Connect на битовых масках. Поле NxN — две маски по N*N бит
+# (клетки крестиков и клетки ноликов), бит i — клетка i (строка * N + столбец).
+# Ход — одно ИЛИ, проверка занятости — одно И. Побеждает тот, кто собрал
+# WIN_LENGTH[N] своих фишек подряд по строке, столбцу или диагонали.
+#
+# Для каждого размера заранее посчитаны все выигрышные линии (GEOMETRIES).
+# Для 3x3 исход любой позиции к тому же посчитан в таблице OUTCOME на 3^9 позиций
+# (индекс — позиция в троичной записи: 0 пусто, 1 X, 2 O). В ячейке — кто
+# выиграл / ничья / игра идёт и флаги «X ещё может собрать линию», «O ещё может».
+# Для больших полей таблица не помещается (3^16, 3^25), там исход — проход по
+# линиям поля, несколько десятков И. Если линию не может собрать никто, партия
+# заведомо кончится ничьей — её можно закончить раньше.
+#
+# В БД и журнале поле по-прежнему хранится строкой из N*N символов ("_", "X", "O"):
+# to_string/from_string нужны только на границе с хранилищем.
+
+from typing import Optional
+
+SIZE = 3  # размер по умолчанию; на него же рассчитаны OUTCOME и бот (modules/ttt_ai.py)
+CELLS = SIZE * SIZE
+FULL = (1 << CELLS) - 1
+
+# Размер поля -> сколько фишек подряд нужно собрать
+WIN_LENGTH = {3: 3, 4: 4, 5: 4}
+BOARD_SIZES = tuple(WIN_LENGTH)
+
+
+class Geometry:
+    """Всё, что зависит только от размера поля: число клеток, маска поля, выигрышные линии."""
+    __slots__ = ("size", "cells", "full", "win_masks")
+
+    def __init__(self, size: int, length: int):
+        self.size = size
+        self.cells = size * size
+        self.full = (1 << self.cells) - 1
+        lines = []
+        for r in range(size):
+            for c in range(size):
+                # Линии длины length, начинающиеся в (r, c): вправо, вниз и по двум диагоналям
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_r, end_c = r + dr * (length - 1), c + dc * (length - 1)
+                    if 0 <= end_r < size and 0 <= end_c < size:
+                        lines.append(sum(1 << ((r + dr * i) * size + c + dc * i) for i in range(length)))
+        self.win_masks: tuple[int, ...] = tuple(lines)
+
+
+GEOMETRIES: dict[int, Geometry] = {size: Geometry(size, length) for size, length in WIN_LENGTH.items()}
+
+# Все выигрышные линии 3x3: строки, столбцы, две диагонали
+WIN_MASKS: tuple[int, ...] = GEOMETRIES[SIZE].win_masks
+
+# Коды исхода (младшие два бита) и флаги «ещё может выиграть»
+ONGOING, X_WINS, O_WINS, DRAW = 0, 1, 2, 3
+RESULT_MASK = 3
+X_CAN_WIN = 4
+O_CAN_WIN = 8
+
+# Маска -> её вклад в троичный индекс позиции (сумма 3^i по установленным битам)
+_TERNARY: tuple[int, ...] = tuple(sum(3 ** i for i in range(CELLS) if m >> i & 1) for m in range(1 << CELLS))
+
+
+def _evaluate(x: int, o: int, geometry: Geometry = GEOMETRIES[SIZE]) -> int:
+    if any(x & w == w for w in geometry.win_masks):
+        return X_WINS
+    if any(o & w == w for w in geometry.win_masks):
+        return O_WINS
+    if x | o == geometry.full:
+        return DRAW
+    code = ONGOING
+    # Линию ещё можно собрать, если в ней нет чужих фишек
+    if any(not w & o for w in geometry.win_masks):
+        code |= X_CAN_WIN
+    if any(not w & x for w in geometry.win_masks):
+        code |= O_CAN_WIN
+    return code
+
+
+def _build_outcomes() -> bytes:
+    table = bytearray(3 ** CELLS)
+    for x in range(1 << CELLS):
+        free = FULL & ~x
+        o = free
+        while True:  # все подмаски свободных клеток
+            table[_TERNARY[x] + 2 * _TERNARY[o]] = _evaluate(x, o)
+            if o == 0:
+                break
+            o = (o - 1) & free
+    return bytes(table)
+
+
+OUTCOME: bytes = _build_outcomes()
+
+
+def position_index(x: int, o: int) -> int:
+    return _TERNARY[x] + 2 * _TERNARY[o]
+
+
+def outcome(x: int, o: int, size: int = SIZE) -> int:
+    if size == SIZE:
+        return OUTCOME[_TERNARY[x] + 2 * _TERNARY[o]]
+    return _evaluate(x, o, GEOMETRIES[size])
+
+
+def winner(x: int, o: int, size: int = SIZE) -> Optional[str]:
+    """'X' / 'O', если линия собрана, иначе None."""
+    result = outcome(x, o, size) & RESULT_MASK
+    return "X" if result == X_WINS else "O" if result == O_WINS else None
+
+
+def is_full(x: int, o: int, size: int = SIZE) -> bool:
+    return x | o == GEOMETRIES[size].full
+
+
+def is_dead(x: int, o: int, size: int = SIZE) -> bool:
+    """Игра идёт, но собрать линию не может уже никто — итог только ничья."""
+    return outcome(x, o, size) == ONGOING
+
+
+def is_free(x: int, o: int, cell: int) -> bool:
+    return not (x | o) >> cell & 1
+
+
+def place(x: int, o: int, cell: int, symbol: str) -> tuple[int, int]:
+    bit = 1 << cell
+    return (x | bit, o) if symbol == "X" else (x, o | bit)
+
+
+def cell_symbol(x: int, o: int, cell: int) -> str:
+    return "X" if x >> cell & 1 else "O" if o >> cell & 1 else "_"
+
+
+def to_string(x: int, o: int, size: int = SIZE) -> str:
+    return "".join(cell_symbol(x, o, i) for i in range(size * size))
+
+
+def from_string(board: str) -> tuple[int, int]:
+    """Маски из строки любого размера (размер поля — корень из длины строки)."""
+    x = o = 0
+    for i, symbol in enumerate(board):
+        if symbol == "X":
+            x |= 1 << i
+        elif symbol == "O":
+            o |= 1 << i
+    return x, o
@@ -0,0 +1,57 @@
+# scripts/build_photos.py
+#
+# Заранее собирает все варианты фото из solo_players.json и duel_words.json
+# в кэш PHOTO_CACHE_DIR (например, при сборке образа), чтобы бот при старте
+# только проверил, что файлы на месте.
+#
+# Пример:
+#   python scripts/build_photos.py --workers 4
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config import (  # noqa: E402
+    BASE_DIR, SOLO_PLAYERS_JSON, DUEL_WORDS_JSON, PHOTO_CACHE_DIR, PHOTO_WORKERS, PHOTO_MAX_SIDE, PHOTO_JPEG_QUALITY,
+)
+from modules import imaging  # noqa: E402
+from utils import load_json  # noqa: E402
+
+
+def referenced_photos() -> set[str]:
+    files = set()
+    for path in (SOLO_PLAYERS_JSON, DUEL_WORDS_JSON):
+        for level_players in load_json(path).values():
+            files.update(p["photo_file"] for p in level_players if p.get("photo_file"))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка вариантов фото игроков")
+    parser.add_argument("--workers", type=int, default=PHOTO_WORKERS)
+    args = parser.parse_args()
+
+    if not imaging.available():
+        print("Pillow не установлен — собирать нечего, бот будет отправлять исходные фото.")
+        return 1
+
+    photos_dir = BASE_DIR / "footphoto"
+    files = sorted(f for f in referenced_photos() if (photos_dir / f).exists())
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        jobs = [pool.submit(imaging.build_variants, str(photos_dir / f), tuple(imaging.VARIANTS),
+                            str(PHOTO_CACHE_DIR), PHOTO_MAX_SIDE, PHOTO_JPEG_QUALITY) for f in files]
+        for f, job in zip(files, jobs):
+            job.result()
+            print(f"{f}: {len(imaging.VARIANTS)} вариантов")
+    print(f"Готово: {len(files)} фото за {time.perf_counter() - started:.1f}с, кэш: {PHOTO_CACHE_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+# scripts/fake_telegram_api.py
+#
+# Локальная замена Telegram Bot API для нагрузочных тестов.
+# Реализует getUpdates, sendMessage, sendPhoto, editMessageText,
+# editMessageReplyMarkup, deleteMessage, getChat и несколько вспомогательных
+# методов. Апдейты подкладываются через push_update(), а исходящие сообщения
+# бота доставляются подписчикам чата (виртуальным пользователям).
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, defaultdict
+from typing import Any, Optional
+
+from aiohttp import web
+
+# id совпадает с числом до двоеточия в токене нагрузочного теста — как у настоящих ботов
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "RetroBall", "username": "retroball_test_bot"}
+
+# Поля, которые aiogram отправляет в form-data как JSON-строку
+_JSON_PARAMS = {"reply_markup", "allowed_updates", "media", "entities", "caption_entities", "reply_parameters"}
+
+
+class FakeTelegramAPI:
+    def __init__(self):
+        self.updates: asyncio.Queue[dict] = asyncio.Queue()
+        self.users: dict[int, dict] = {BOT_USER["id"]: BOT_USER}
+        self.chats: dict[int, dict] = {}
+        self.messages: dict[tuple[int, int], dict] = {}
+        self.photo_names: dict[tuple[int, int], str] = {}  # (chat, message_id) -> имя загруженного файла
+        self.file_names: dict[str, str] = {}  # file_id -> имя файла, с которым его загрузили
+        self.listeners: dict[int, list[asyncio.Queue]] = defaultdict(list)
+        self.calls: Counter = Counter()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+
+    # --- Управление из теста ---
+
+    def add_user(self, user_id: int, first_name: str) -> dict:
+        user = {"id": user_id, "is_bot": False, "first_name": first_name}
+        self.users[user_id] = user
+        self.chats.setdefault(user_id, {"id": user_id, "type": "private", "first_name": first_name})
+        return user
+
+    def add_group(self, chat_id: int, title: str) -> dict:
+        chat = {"id": chat_id, "type": "supergroup", "title": title}
+        self.chats[chat_id] = chat
+        return chat
+
+    def subscribe(self, chat_id: int) -> asyncio.Queue:
+        """Очередь, в которую будут приходить (метод, сообщение) от бота в этот чат."""
+        q: asyncio.Queue = asyncio.Queue()
+        self.listeners[chat_id].append(q)
+        return q
+
+    def push_update(self, kind: str, payload: dict) -> int:
+        update_id = next(self._update_ids)
+        self.updates.put_nowait({"update_id": update_id, kind: payload})
+        return update_id
+
+    def user_message(self, chat_id: int, user_id: int, text: str, reply_to: Optional[dict] = None) -> dict:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": self.chats[chat_id],
+            "from": self.users[user_id],
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        if reply_to:
+            message["reply_to_message"] = reply_to
+        self.messages[(chat_id, message["message_id"])] = message
+        return message
+
+    def send_text(self, chat_id: int, user_id: int, text: str, reply_to: Optional[dict] = None) -> int:
+        return self.push_update("message", self.user_message(chat_id, user_id, text, reply_to))
+
+    def press_button(self, user_id: int, message: dict, data: str) -> int:
+        return self.push_update("callback_query", {
+            "id": str(next(self._update_ids)),
+            "from": self.users[user_id],
+            "chat_instance": str(message["chat"]["id"]),
+            "message": message,
+            "data": data,
+        })
+
+    # --- HTTP ---
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_route("POST", "/bot{token}/{method}", self._handle)
+        app.router.add_route("GET", "/bot{token}/{method}", self._handle)
+        return app
+
+    async def _params(self, request: web.Request) -> dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        params: dict[str, Any] = {}
+        for key, value in (await request.post()).items():
+            if isinstance(value, web.FileField):
+                params[key] = value
+                params["_filename"] = value.filename
+            elif key in _JSON_PARAMS:
+                params[key] = json.loads(value)
+            else:
+                params[key] = value
+        return params
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params = await self._params(request)
+        handler = getattr(self, f"m_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    def _notify(self, chat_id: int, method: str, message: dict):
+        for q in self.listeners.get(chat_id, ()):
+            q.put_nowait((method, message))
+
+    def _bot_message(self, chat_id: int, **fields) -> dict:
+        # В объекте сообщения Telegram возвращает только inline-клавиатуру
+        if "inline_keyboard" not in (fields.get("reply_markup") or {}):
+            fields.pop("reply_markup", None)
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": self.chats.setdefault(chat_id, {"id": chat_id, "type": "private", "first_name": "?"}),
+            "from": BOT_USER,
+            **{k: v for k, v in fields.items() if v is not None},
+        }
+        self.messages[(chat_id, message["message_id"])] = message
+        return message
+
+    # --- Методы Bot API ---
+
+    async def m_getMe(self, params):
+        return {**BOT_USER, "can_join_groups": True, "can_read_all_group_messages": True,
+                "supports_inline_queries": True}
+
+    async def m_getUpdates(self, params):
+        limit = int(params.get("limit", 100))
+        timeout = float(params.get("timeout", 0))
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self.updates.get(), timeout=max(timeout, 0.01)))
+        except asyncio.TimeoutError:
+            return []
+        while len(batch) < limit and not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return batch
+
+    async def m_sendMessage(self, params):
+        chat_id = int(params["chat_id"])
+        message = self._bot_message(chat_id, text=params.get("text", ""), reply_markup=params.get("reply_markup"))
+        self._notify(chat_id, "sendMessage", message)
+        return message
+
+    async def m_sendPhoto(self, params):
+        chat_id = int(params["chat_id"])
+        if isinstance(params.get("photo"), str):
+            file_id = params["photo"]
+        else:
+            file_id = f"photo-{next(self._file_ids)}"
+            self.file_names[file_id] = params.get("_filename", "")
+        photo = [{"file_id": file_id, "file_unique_id": file_id, "width": 640, "height": 640}]
+        message = self._bot_message(chat_id, photo=photo, caption=params.get("caption"),
+                                    reply_markup=params.get("reply_markup"))
+        self.photo_names[(chat_id, message["message_id"])] = self.file_names.get(file_id, "")
+        self._notify(chat_id, "sendPhoto", message)
+        return message
+
+    async def _edit(self, params, method: str, **changes):
+        if "inline_message_id" in params:
+            return True
+        chat_id, message_id = int(params["chat_id"]), int(params["message_id"])
+        message = self.messages.get((chat_id, message_id)) or self._bot_message(chat_id)
+        if "inline_keyboard" not in (changes.get("reply_markup") or {}):
+            changes["reply_markup"] = None
+        for key, value in changes.items():
+            if value is None:
+                message.pop(key, None)  # как в Telegram: не переданная клавиатура снимается
+            else:
+                message[key] = value
+        self._notify(chat_id, method, message)
+        return message
+
+    async def m_editMessageText(self, params):
+        return await self._edit(params, "editMessageText", text=params.get("text", ""),
+                                reply_markup=params.get("reply_markup"))
+
+    async def m_editMessageReplyMarkup(self, params):
+        return await self._edit(params, "editMessageReplyMarkup", reply_markup=params.get("reply_markup"))
+
+    async def m_editMessageCaption(self, params):
+        return await self._edit(params, "editMessageCaption", caption=params.get("caption"),
+                                reply_markup=params.get("reply_markup"))
+
+    async def m_editMessageMedia(self, params):
+        media = params.get("media") or {}
+        if isinstance(media, str):
+            media = json.loads(media)
+        file_id = media.get("media", "")
+        if file_id.startswith("attach://"):  # новый файл: выдаём file_id, как sendPhoto
+            file_id = f"photo-{next(self._file_ids)}"
+            self.file_names[file_id] = params.get("_filename", "")
+        photo = [{"file_id": file_id, "file_unique_id": file_id, "width": 640, "height": 640}]
+        return await self._edit(params, "editMessageMedia", photo=photo, caption=media.get("caption"),
+                                reply_markup=params.get("reply_markup"))
+
+    async def m_deleteMessage(self, params):
+        self.messages.pop((int(params["chat_id"]), int(params["message_id"])), None)
+        return True
+
+    async def m_getChat(self, params):
+        chat_id = int(params["chat_id"])
+        chat = self.chats.get(chat_id) or self.users.get(chat_id) or {"id": chat_id, "type": "private", "first_name": "?"}
+        return {
+            "type": "private", **{k: v for k, v in chat.items() if k != "is_bot"},
+            "accent_color_id": 0, "max_reaction_count": 11,
+            "accepted_gift_types": {"unlimited_gifts": False, "limited_gifts": False, "unique_gifts": False,
+                                    "premium_subscription": False, "gifts_from_channels": False},
+        }
+
+
+async def serve(api: FakeTelegramAPI, host: str = "127.0.0.1", port: int = 8081) -> web.AppRunner:
+    runner = web.AppRunner(api.make_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+if __name__ == "__main__":
+    # Отдельный запуск: бот с TELEGRAM_API_SERVER = "http://127.0.0.1:8081" будет ходить сюда
+    web.run_app(FakeTelegramAPI().make_app(), host="127.0.0.1", port=8081)
@@ -0,0 +1,64 @@
+# scripts/fake_webhook_client.py
+#
+# Локальная проверка вебхука: шлёт синтетические апдейты Telegram на WEBHOOK_PATH.
+# Запуск: USE_WEBHOOK = True в config.py, python main.py, затем
+#   python scripts/fake_webhook_client.py --count 500 --concurrency 50
+
+import argparse
+import asyncio
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from config import WEBAPP_PORT, WEBHOOK_PATH, WEBHOOK_SECRET  # noqa: E402
+
+
+def make_text_update(update_id: int, user_id: int, text: str) -> dict:
+    """Апдейт с текстовым сообщением из личного чата, как его присылает Telegram."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": text,
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Фейковый клиент Telegram для вебхука")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{WEBAPP_PORT}{WEBHOOK_PATH}")
+    parser.add_argument("--secret", default=WEBHOOK_SECRET)
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--text", default="/footle")
+    args = parser.parse_args()
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+    statuses: Counter = Counter()
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        async def post(i: int):
+            async with sem:
+                update = make_text_update(i, 100000 + i % 1000, args.text)
+                async with session.post(args.url, json=update) as resp:
+                    statuses[resp.status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(1, args.count + 1)))
+        elapsed = time.perf_counter() - started
+
+    print(f"Отправлено {args.count} апдейтов за {elapsed:.2f}с ({args.count / elapsed:.0f}/с)")
+    for status, n in sorted(statuses.items()):
+        print(f"  HTTP {status}: {n}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,488 @@
+# scripts/load_test.py
+#
+# Нагрузочный тест бота. Поднимает фейковый Bot API (scripts/fake_telegram_api.py),
+# запускает бота в этом же процессе (long polling против фейкового сервера,
+# отдельная временная БД) и гоняет виртуальных пользователей, которые играют
+# в Footle, Solo Guess, Duel, Club Connect и викторину с паузами «на подумать».
+#
+# Пример:
+#   python scripts/load_test.py --users 2000 --duration 120 --fail-p95-ms 250
+#
+# В конце печатает p50/p95/p99 задержки хэндлеров и ответа бота, пропускную
+# способность и число операций SQLite на апдейт. С --fail-p95-ms возвращает
+# код 1, если p95 хэндлеров выше порога (для проверки перед деплоем).
+
+import argparse
+import asyncio
+import contextvars
+import csv
+import json
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Callable, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import config  # noqa: E402
+from fake_telegram_api import FakeTelegramAPI, serve  # noqa: E402
+
+EXPECT_TIMEOUT = 40  # сколько ждём ответа бота, прежде чем засчитать таймаут
+QUIZ_GROUP_SIZE = 100  # участников в одной группе с викториной
+TURN_RE = re.compile(r'Ход: <a href="tg://user\?id=(\d+)"')
+LETTERS_RE = re.compile(r"из (\d+) букв")
+
+
+# --- Сбор статистики ---
+
+class Stats:
+    def __init__(self):
+        self.handler_ms: list[float] = []
+        self.response_ms: list[float] = []
+        self.db_ops: list[int] = []
+        self.games: Counter = Counter()
+        self.timeouts: Counter = Counter()
+        self.errors = 0
+
+
+stats = Stats()
+_db_ops: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("loadtest_db_ops", default=None)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def count_sqlite_calls():
+    """Считает вызовы aiosqlite внутри обработки апдейта (через contextvar)."""
+    import aiosqlite
+
+    for name in ("execute", "executemany", "executescript", "commit"):
+        original = getattr(aiosqlite.Connection, name)
+
+        def wrapper(self, *args, _original=original, **kwargs):
+            ops = _db_ops.get()
+            if ops is not None:
+                ops[0] += 1
+            return _original(self, *args, **kwargs)
+
+        setattr(aiosqlite.Connection, name, wrapper)
+
+
+async def measure_update(handler, event, data):
+    ops = [0]
+    token = _db_ops.set(ops)
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    except Exception:
+        stats.errors += 1
+        raise
+    finally:
+        stats.handler_ms.append((time.perf_counter() - started) * 1000)
+        stats.db_ops.append(ops[0])
+        _db_ops.reset(token)
+
+
+# --- Что «знают» виртуальные игроки ---
+
+def load_knowledge() -> dict:
+    words_by_len = defaultdict(list)
+    with open(ROOT / "data" / "footle_list.csv", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            ru = row["ru"].strip().lower()
+            if ru and " " not in ru:
+                words_by_len[len(ru)].append(ru)
+    answers_by_photo = {}
+    for path in (config.SOLO_PLAYERS_JSON, config.DUEL_WORDS_JSON):
+        with open(path, encoding="utf-8") as f:
+            for players in json.load(f).values():
+                for p in players:
+                    answers_by_photo[p["photo_file"]] = [p["canonical_name"]] + p.get("aliases", [])
+    all_answers = [a for answers in answers_by_photo.values() for a in answers]
+    return {"words_by_len": words_by_len, "answers_by_photo": answers_by_photo, "all_answers": all_answers}
+
+
+# --- Виртуальные пользователи ---
+
+def text_of(msg: dict) -> str:
+    return msg.get("text") or msg.get("caption") or ""
+
+
+def buttons(msg: dict) -> list[str]:
+    markup = msg.get("reply_markup") or {}
+    return [b.get("callback_data", "") for row in markup.get("inline_keyboard", []) for b in row]
+
+
+class ChatView:
+    """Всё, что бот пишет в один чат, глазами виртуальных пользователей."""
+
+    def __init__(self, api: FakeTelegramAPI, chat_id: int):
+        self.api = api
+        self.chat_id = chat_id
+        self.inbox = api.subscribe(chat_id)
+
+    async def expect(self, pred: Callable[[dict], bool], timeout: float = EXPECT_TIMEOUT) -> Optional[dict]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                _, msg = await asyncio.wait_for(self.inbox.get(), remaining)
+            except asyncio.TimeoutError:
+                return None
+            if pred(msg):
+                return msg
+
+    async def ask(self, scenario: str, send: Callable[[], object], pred: Callable[[dict], bool],
+                  timeout: float = EXPECT_TIMEOUT) -> Optional[dict]:
+        """Отправляет апдейт и ждёт подходящий ответ, замеряя время ответа бота."""
+        started = time.perf_counter()
+        send()
+        msg = await self.expect(pred, timeout)
+        if msg is None:
+            stats.timeouts[scenario] += 1
+        else:
+            stats.response_ms.append((time.perf_counter() - started) * 1000)
+        return msg
+
+
+class Simulation:
+    def __init__(self, api: FakeTelegramAPI, args, knowledge: dict):
+        self.api = api
+        self.args = args
+        self.k = knowledge
+        self.stop = asyncio.Event()
+
+    async def think(self):
+        await asyncio.sleep(random.uniform(self.args.think_min, self.args.think_max))
+
+    def answer_for(self, photo_name: str) -> str:
+        correct = self.k["answers_by_photo"].get(photo_name)
+        if correct and random.random() < self.args.skill:
+            return random.choice(correct)
+        return random.choice(self.k["all_answers"])
+
+    # Footle: личный чат, угадываем слова нужной длины
+    async def footle(self, uid: int):
+        chat = ChatView(self.api, uid)
+        while not self.stop.is_set():
+            msg = await chat.ask("footle", lambda: self.api.send_text(uid, uid, "Footle"),
+                                 lambda m: LETTERS_RE.search(text_of(m)) or "уже активная" in text_of(m))
+            if msg is None:
+                continue
+            if "уже активная" in text_of(msg):
+                await chat.ask("footle", lambda: self.api.press_button(uid, msg, "giveup_footle"),
+                               lambda m: "сдались" in text_of(m))
+                continue
+            length = int(LETTERS_RE.search(text_of(msg)).group(1))
+            words = self.k["words_by_len"].get(length) or ["?" * length]
+            for _ in range(6):
+                await self.think()
+                word = random.choice(words)
+                reply = await chat.ask("footle", lambda: self.api.send_text(uid, uid, word),
+                                       lambda m: any(s in text_of(m) for s in ("Осталось ходов", "ПОБЕДА", "Поражение")))
+                if reply is None or "Осталось ходов" not in text_of(reply):
+                    break
+            stats.games["footle"] += 1
+            await self.think()
+
+    # Solo Guess: личный чат, отвечаем на 5 фото уровня
+    async def solo(self, uid: int):
+        chat = ChatView(self.api, uid)
+        while not self.stop.is_set():
+            photo = await chat.ask("solo", lambda: self.api.send_text(uid, uid, "Solo Guess"),
+                                   lambda m: "photo" in m)
+            while photo is not None and not self.stop.is_set():
+                await self.think()
+                if random.random() < 0.3:  # иногда берём подсказку: фото открывается на стадию
+                    hinted = photo
+                    await chat.ask("solo", lambda: self.api.press_button(uid, hinted, "solo_hint"),
+                                   lambda m: m["message_id"] == hinted["message_id"] or "Позиция" in text_of(m))
+                answer = self.answer_for(self.api.photo_names.get((uid, photo["message_id"]), ""))
+                last_id = photo["message_id"]
+                photo = await chat.ask("solo", lambda: self.api.send_text(uid, uid, answer),
+                                       lambda m: ("photo" in m and m["message_id"] != last_id) or "пройден" in text_of(m))
+                if photo is not None and "photo" not in photo:
+                    stats.games["solo"] += 1
+                    break
+            await self.think()
+
+    async def _challenge(self, scenario: str, gid: int, a: int, b: int, command: str, accept_prefix: str) -> Optional[dict]:
+        """B что-то пишет в чат, A отвечает на это командой, B принимает вызов."""
+        chat = ChatView(self.api, gid)
+        target = self.api.user_message(gid, b, "го сыграем?")
+        self.api.push_update("message", target)
+        invite = await chat.ask(scenario, lambda: self.api.send_text(gid, a, command, reply_to=target),
+                                lambda m: any(d.startswith(accept_prefix) for d in buttons(m)))
+        if invite is None:
+            return None
+        data = next(d for d in buttons(invite) if d.startswith(accept_prefix))
+        self.api.press_button(b, invite, data)
+        return {"chat": chat}
+
+    # Duel: группа на двоих, раунды по фото
+    async def duel(self, gid: int, a: int, b: int):
+        while not self.stop.is_set():
+            game = await self._challenge("duel", gid, a, b, "/duel", "duel_accept:")
+            if game is None:
+                await self.think()
+                continue
+            chat = game["chat"]
+            while not self.stop.is_set():
+                msg = await chat.expect(lambda m: ("photo" in m and "Раунд" in text_of(m)) or "завершена" in text_of(m))
+                if msg is None:
+                    stats.timeouts["duel"] += 1
+                    break
+                if "завершена" in text_of(msg):
+                    stats.games["duel"] += 1
+                    break
+                photo_name = self.api.photo_names.get((gid, msg["message_id"]), "")
+                for _ in range(4):
+                    await self.think()
+                    player, answer = random.choice((a, b)), self.answer_for(photo_name)
+                    # На неверный ответ бот молчит, поэтому тут молчание — не таймаут
+                    sent_at = time.perf_counter()
+                    self.api.send_text(gid, player, answer)
+                    reply = await chat.expect(lambda m: "угадал" in text_of(m) or "никто не успел" in text_of(m),
+                                              timeout=self.args.think_max)
+                    if reply is not None:
+                        stats.response_ms.append((time.perf_counter() - sent_at) * 1000)
+                        break
+            await self.think()
+
+    # Club Connect: группа на двоих, крестики-нолики по клубам
+    async def ttt(self, gid: int, a: int, b: int):
+        from modules import club_connect
+
+        while not self.stop.is_set():
+            command = random.choice(["/ttt", "/ttt", "/ttt 4", "/ttt 5"])
+            game = await self._challenge("ttt", gid, a, b, command, "ttt_accept:")
+            if game is None:
+                await self.think()
+                continue
+            chat = game["chat"]
+            board = await chat.expect(lambda m: TURN_RE.search(text_of(m)) and buttons(m))
+            while board is not None and not self.stop.is_set():
+                player = int(TURN_RE.search(text_of(board)).group(1))
+                cells = [d for d in buttons(board) if d.startswith("ttt_cell_")]
+                if not cells:
+                    break
+                await self.think()
+                cell = random.choice(cells)
+                picked = await chat.ask("ttt", lambda: self.api.press_button(player, board, cell),
+                                        lambda m: "Введите фамилию" in text_of(m))
+                if picked is None:
+                    break
+                await self.think()
+                name = random.choice(self.k["all_answers"])
+                state = club_connect.active_ttt_games.get(gid)
+                if state and random.random() < self.args.skill:
+                    valid = club_connect._unused_answers(
+                        state, int(cell.split("_")[2]) * state["board_size"] + int(cell.split("_")[3]))
+                    if valid:
+                        name = random.choice(valid)
+                board = await chat.ask("ttt", lambda: self.api.send_text(gid, player, name),
+                                       lambda m: (TURN_RE.search(text_of(m)) and buttons(m))
+                                       or "Победа" in text_of(m) or "Ничья" in text_of(m))
+                if board is not None and not buttons(board):
+                    stats.games["ttt"] += 1
+                    break
+            await self.think()
+
+    # Club Connect против бота: один пользователь в группе, бот ходит сам
+    async def ttt_ai(self, gid: int, uid: int):
+        from modules import club_connect
+
+        chat = ChatView(self.api, gid)
+        my_turn = f'Ход: <a href="tg://user?id={uid}"'
+        while not self.stop.is_set():
+            board = await chat.ask("ttt_ai", lambda: self.api.send_text(gid, uid, "/ttt_ai"),
+                                   lambda m: my_turn in text_of(m) and buttons(m))
+            while board is not None and not self.stop.is_set():
+                cells = [d for d in buttons(board) if d.startswith("ttt_cell_")]
+                if not cells:
+                    break
+                await self.think()
+                cell = random.choice(cells)
+                picked = await chat.ask("ttt_ai", lambda: self.api.press_button(uid, board, cell),
+                                        lambda m: "Введите фамилию" in text_of(m))
+                if picked is None:
+                    break
+                await self.think()
+                name = random.choice(self.k["all_answers"])
+                state = club_connect.active_ttt_games.get(gid)
+                if state and random.random() < self.args.skill:
+                    valid = club_connect._unused_answers(
+                        state, int(cell.split("_")[2]) * state["board_size"] + int(cell.split("_")[3]))
+                    if valid:
+                        name = random.choice(valid)
+                board = await chat.ask("ttt_ai", lambda: self.api.send_text(gid, uid, name),
+                                       lambda m: (my_turn in text_of(m) and buttons(m))
+                                       or "Победа" in text_of(m) or "Ничья" in text_of(m))
+                if board is not None and not buttons(board):
+                    stats.games["ttt_ai"] += 1
+                    break
+            await self.think()
+
+    # Quiz: одна группа на много пользователей, на каждое фото отвечают все сразу
+    async def quiz(self, gid: int, uids: list[int]):
+        chat = ChatView(self.api, gid)
+
+        async def answer(uid: int, photo_name: str):
+            await self.think()
+            self.api.send_text(gid, uid, self.answer_for(photo_name))
+
+        while not self.stop.is_set():
+            command = random.choice(["/quiz 1", "/quiz 2"])
+            start = await chat.ask("quiz", lambda: self.api.send_text(gid, uids[0], command),
+                                   lambda m: "раундов по" in text_of(m) or "уже идёт" in text_of(m))
+            if start is None or "уже идёт" in text_of(start):
+                await self.think()
+                continue
+            while not self.stop.is_set():
+                msg = await chat.expect(lambda m: ("photo" in m and "Викторина" in text_of(m))
+                                        or "окончена" in text_of(m))
+                if msg is None:
+                    stats.timeouts["quiz"] += 1
+                    break
+                if "окончена" in text_of(msg):
+                    stats.games["quiz"] += 1
+                    break
+                photo_name = self.api.photo_names.get((gid, msg["message_id"]), "")
+                await asyncio.gather(*(answer(uid, photo_name) for uid in uids))
+            await self.think()
+
+
+async def run(args):
+    tmp = Path(tempfile.mkdtemp(prefix="retro_loadtest_"))
+    config.API_TOKEN = "123456:LOADTEST"
+    config.TELEGRAM_API_SERVER = f"http://127.0.0.1:{args.port}"
+    config.DB_PATH = tmp / "loadtest.db"
+    config.ARCHIVE_DB_PATH = tmp / "loadtest_archive.db"  # архиватор не должен трогать настоящий архив
+    config.DATA_RELOAD_INTERVAL = 0
+    config.PERF_ENABLED = not args.no_perf
+    config.PERF_METRICS_PORT = 0
+
+    from bot import bot, dp
+    from main import setup_dispatcher
+
+    setup_dispatcher(dp)
+    count_sqlite_calls()
+    dp.update.outer_middleware(measure_update)
+
+    api = FakeTelegramAPI()
+    runner = await serve(api, port=args.port)
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False))
+
+    sim = Simulation(api, args, load_knowledge())
+    mix = dict(part.split("=") for part in args.mix.split(","))
+    weights = {name: float(w) for name, w in mix.items()}
+    total_w = sum(weights.values())
+    tasks = []
+    next_uid, next_gid = 10_000_000, -1_000_000_000_000
+
+    async def delayed(coro):
+        await asyncio.sleep(random.uniform(0, args.ramp_up))
+        await coro
+
+    for name, w in weights.items():
+        n = int(args.users * w / total_w)
+        if name in ("footle", "solo"):
+            for _ in range(n):
+                api.add_user(next_uid, f"vu{next_uid}")
+                tasks.append(asyncio.create_task(delayed(getattr(sim, name)(next_uid))))
+                next_uid += 1
+        elif name == "ttt_ai":
+            for _ in range(n):
+                api.add_user(next_uid, f"vu{next_uid}")
+                api.add_group(next_gid, f"group{-next_gid}")
+                tasks.append(asyncio.create_task(delayed(sim.ttt_ai(next_gid, next_uid))))
+                next_uid += 1
+                next_gid -= 1
+        elif name == "quiz":
+            for _ in range(max(1, n // QUIZ_GROUP_SIZE) if n else 0):
+                uids = list(range(next_uid, next_uid + QUIZ_GROUP_SIZE))
+                for uid in uids:
+                    api.add_user(uid, f"vu{uid}")
+                api.add_group(next_gid, f"group{-next_gid}")
+                tasks.append(asyncio.create_task(delayed(sim.quiz(next_gid, uids))))
+                next_uid += QUIZ_GROUP_SIZE
+                next_gid -= 1
+        else:
+            for _ in range(n // 2):
+                a, b = next_uid, next_uid + 1
+                api.add_user(a, f"vu{a}")
+                api.add_user(b, f"vu{b}")
+                api.add_group(next_gid, f"group{-next_gid}")
+                tasks.append(asyncio.create_task(delayed(getattr(sim, name)(next_gid, a, b))))
+                next_uid += 2
+                next_gid -= 1
+
+    print(f"Запущено {len(tasks)} сценариев ({args.users} виртуальных пользователей), БД: {config.DB_PATH}")
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    sim.stop.set()
+    elapsed = time.perf_counter() - started
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await dp.stop_polling()
+    await polling
+    # Гасим оставшиеся таймеры игр, чтобы они не стучались в уже остановленный API
+    leftovers = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    for t in leftovers:
+        t.cancel()
+    await asyncio.gather(*leftovers, return_exceptions=True)
+    await runner.cleanup()
+
+    updates = len(stats.handler_ms)
+    print(f"\nДлительность: {elapsed:.1f}с, апдейтов: {updates} ({updates / elapsed:.1f}/с), ошибок: {stats.errors}")
+    for title, values in (("Хэндлеры, мс", stats.handler_ms), ("Ответ бота, мс", stats.response_ms)):
+        print(f"{title}: p50={percentile(values, 50):.1f} p95={percentile(values, 95):.1f} "
+              f"p99={percentile(values, 99):.1f} max={max(values, default=0):.1f}")
+    mean_db = sum(stats.db_ops) / updates if updates else 0
+    print(f"SQLite-операций на апдейт: {mean_db:.2f}")
+    print("Вызовы Bot API: " + ", ".join(f"{m}={n}" for m, n in api.calls.most_common()))
+    print("Сыграно игр: " + ", ".join(f"{g}={n}" for g, n in stats.games.items()))
+    if +stats.timeouts:
+        print("Таймауты ожидания ответа: " + ", ".join(f"{g}={n}" for g, n in (+stats.timeouts).items()))
+    if config.PERF_ENABLED:
+        from modules import perf
+        print("\nПо хэндлерам, мс:\n" + perf.format_report())
+
+    if args.fail_p95_ms and percentile(stats.handler_ms, 95) > args.fail_p95_ms:
+        print(f"❌ p95 хэндлеров выше порога {args.fail_p95_ms} мс")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест RetroBall-бота на фейковом Bot API")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--ramp-up", type=float, default=10, help="за сколько секунд подключаются все пользователи")
+    parser.add_argument("--mix", default="footle=4,solo=3,duel=1.5,ttt=1.5")
+    parser.add_argument("--think-min", type=float, default=1.0)
+    parser.add_argument("--think-max", type=float, default=5.0)
+    parser.add_argument("--skill", type=float, default=0.6, help="вероятность правильного ответа")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--fail-p95-ms", type=float, default=0)
+    parser.add_argument("--no-perf", action="store_true", help="без замеров modules/perf.py (оценка их накладных расходов)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# sharding.py
+#
+# Многопроцессный режим: фронт-процесс забирает апдейты у Telegram и раскладывает
+# их по N воркерам через multiprocessing-очереди. Воркер выбирается консистентным
+# хэшем chat_id, поэтому все апдейты одного чата (и вся его игровая память:
+# sessions, active_ttt_games, таймеры, FSM) живут в одном процессе.
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+from typing import Any, Optional
+
+from config import SHARD_VNODES, SHARD_REPORT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# (номер шарда, всего шардов) текущего процесса; (0, 1) — обычный режим
+CURRENT_SHARD: tuple[int, int] = (0, 1)
+_current_ring: Optional["HashRing"] = None
+
+
+class HashRing:
+    """Кольцо консистентного хэширования с виртуальными узлами."""
+
+    def __init__(self, nodes: int, vnodes: int = SHARD_VNODES):
+        points = []
+        for node in range(nodes):
+            for v in range(vnodes):
+                points.append((self._hash(f"worker-{node}#{v}"), node))
+        points.sort()
+        self._keys = [p[0] for p in points]
+        self._nodes = [p[1] for p in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def node_for(self, chat_id: int) -> int:
+        pos = bisect.bisect(self._keys, self._hash(str(chat_id)))
+        return self._nodes[pos % len(self._nodes)]
+
+
+def owns_chat(chat_id: int) -> bool:
+    """Обслуживает ли текущий процесс этот чат (в обычном режиме — всегда да)."""
+    index, count = CURRENT_SHARD
+    if count <= 1 or _current_ring is None:
+        return True
+    return _current_ring.node_for(chat_id) == index
+
+
+def extract_chat_id(update: dict[str, Any]) -> int:
+    """Достаёт из сырого апдейта id чата, по которому шардируем."""
+    for key in ("message", "edited_message", "channel_post", "edited_channel_post",
+                "my_chat_member", "chat_member", "chat_join_request"):
+        if key in update:
+            return update[key]["chat"]["id"]
+    if "callback_query" in update:
+        cq = update["callback_query"]
+        if cq.get("message"):
+            return cq["message"]["chat"]["id"]
+        return cq["from"]["id"]
+    for key in ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query"):
+        if key in update:
+            return update[key]["from"]["id"]
+    if "poll_answer" in update and update["poll_answer"].get("user"):
+        return update["poll_answer"]["user"]["id"]
+    return 0
+
+
+# --- Воркер ---
+
+async def _worker_loop(index: int, in_queue: mp.Queue, report_queue: mp.Queue):
+    from bot import bot, dp
+    from main import setup_dispatcher
+
+    setup_dispatcher(dp)
+    loop = asyncio.get_running_loop()
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    processed = 0
+    busy_time = 0.0
+    in_flight: set[asyncio.Task] = set()
+    chats: set[int] = set()
+    last_report = time.monotonic()
+
+    async def _handle(update: dict):
+        nonlocal processed, busy_time
+        started = time.perf_counter()
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception:
+            logger.exception(f"Шард {index}: ошибка обработки апдейта {update.get('update_id')}")
+        finally:
+            processed += 1
+            busy_time += time.perf_counter() - started
+
+    def _next_batch() -> list:
+        # Ждём первый апдейт (не дольше секунды), остальное забираем без ожидания
+        try:
+            batch = [in_queue.get(True, 1.0)]
+        except queue.Empty:
+            return []
+        while batch[-1] is not None and len(batch) < 256:
+            try:
+                batch.append(in_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    stopping = False
+    try:
+        while not stopping:
+            for update in await loop.run_in_executor(None, _next_batch):
+                if update is None:
+                    stopping = True
+                    break
+                chats.add(extract_chat_id(update))
+                task = asyncio.create_task(_handle(update))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+
+            now = time.monotonic()
+            if now - last_report >= SHARD_REPORT_INTERVAL:
+                report_queue.put({
+                    "worker": index,
+                    "processed": processed,
+                    "in_flight": len(in_flight),
+                    "avg_ms": busy_time / processed * 1000 if processed else 0.0,
+                    "chats": len(chats),
+                    "period": now - last_report,
+                })
+                processed, busy_time, last_report = 0, 0.0, now
+                chats.clear()
+    finally:
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=10)
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+
+
+def worker_main(index: int, count: int, in_queue: mp.Queue, report_queue: mp.Queue):
+    global CURRENT_SHARD, _current_ring
+    CURRENT_SHARD = (index, count)
+    _current_ring = HashRing(count)
+    from modules.logs import setup_logging
+
+    setup_logging(shard=index)
+    asyncio.run(_worker_loop(index, in_queue, report_queue))
+
+
+# --- Фронт ---
+
+def _log_reports(report_queue: mp.Queue, stop: threading.Event):
+    """Читает отчёты воркеров (в отдельном потоке, чтобы не блокировать цикл фронта)."""
+    while not stop.is_set():
+        try:
+            r = report_queue.get(timeout=1.0)
+        except queue.Empty:
+            continue
+        logger.info(
+            f"Шард {r['worker']}: {r['processed'] / r['period']:.1f} апд/с, "
+            f"в работе {r['in_flight']}, среднее {r['avg_ms']:.1f} мс, чатов {r['chats']}"
+        )
+
+
+async def _front_loop(ring: HashRing, queues: list[mp.Queue], report_queue: mp.Queue):
+    from bot import bot, dp
+    from main import setup_dispatcher
+
+    # Сам фронт апдейты не обрабатывает: диспетчер нужен, чтобы узнать используемые типы апдейтов
+    allowed_updates = setup_dispatcher(dp).resolve_used_update_types()
+    stop = threading.Event()
+    reporter = asyncio.create_task(asyncio.to_thread(_log_reports, report_queue, stop))
+
+    offset = None
+    await bot.delete_webhook(drop_pending_updates=True)
+    try:
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+            except Exception as e:
+                logger.error(f"Фронт: ошибка getUpdates: {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                raw = update.model_dump(mode="json", by_alias=True, exclude_none=True)
+                queues[ring.node_for(extract_chat_id(raw))].put(raw)
+    finally:
+        stop.set()
+        await reporter
+        await bot.session.close()
+
+
+def run_sharded(workers: int):
+    ctx = mp.get_context("spawn")
+    ring = HashRing(workers)
+    queues = [ctx.Queue() for _ in range(workers)]
+    report_queue = ctx.Queue()
+    processes = [
+        ctx.Process(target=worker_main, args=(i, workers, queues[i], report_queue), name=f"shard-{i}", daemon=True)
+        for i in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    logger.info(f"Запущено {workers} воркеров, фронт начинает получать апдейты.")
+    try:
+        asyncio.run(_front_loop(ring, queues, report_queue))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for q in queues:
+            q.put(None)
+        for p in processes:
+            p.join(timeout=15)
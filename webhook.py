@@ -0,0 +1,100 @@
+# webhook.py
+import asyncio
+import logging
+from typing import Any
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from config import (
+    WEBHOOK_BASE_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBAPP_HOST,
+    WEBAPP_PORT,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedRequestHandler(SimpleRequestHandler):
+    """
+    Принимает апдейт, кладёт его в ограниченную очередь и сразу отвечает Telegram.
+    Апдейты разбирают WEBHOOK_WORKERS фоновых воркеров. Если очередь заполнена,
+    отвечаем 503 — Telegram повторит доставку позже (backpressure).
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str | None = None,
+                 queue_size: int = WEBHOOK_QUEUE_SIZE, workers: int = WEBHOOK_WORKERS, **data: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=queue_size)
+        self.workers_count = workers
+        self._workers: list[asyncio.Task] = []
+        self.rejected = 0  # сколько апдейтов отбили из-за переполнения
+
+    def register(self, app: web.Application, /, path: str, **kwargs: Any) -> None:
+        app.on_startup.append(self._start_workers)
+        super().register(app, path=path, **kwargs)
+
+    async def _start_workers(self, *a: Any, **kw: Any) -> None:
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers_count)]
+        logger.info(f"Вебхук: запущено {self.workers_count} воркеров, очередь на {self.queue.maxsize} апдейтов.")
+
+    async def _worker(self) -> None:
+        while True:
+            update = await self.queue.get()
+            try:
+                await self._background_feed_update(bot=self.bot, update=update)
+            except Exception:
+                logger.exception(f"Вебхук: ошибка обработки апдейта {update.get('update_id')}")
+            finally:
+                self.queue.task_done()
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        try:
+            update = await request.json(loads=bot.session.json_loads)
+        except ValueError:
+            return web.Response(status=400, text="Bad Request")
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Вебхук: очередь заполнена ({self.queue.qsize()}), апдейт {update.get('update_id')} отклонён.")
+            return web.Response(status=503, text="Busy")
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def close(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        self._workers = []
+        await super().close()
+
+
+async def on_webhook_startup(bot: Bot, dispatcher: Dispatcher) -> None:
+    if not WEBHOOK_BASE_URL:
+        logger.warning("Вебхук: WEBHOOK_BASE_URL не задан, setWebhook пропущен (локальный режим).")
+        return
+    await bot.set_webhook(
+        f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET or None,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+        drop_pending_updates=True,
+    )
+    logger.info(f"Вебхук установлен: {WEBHOOK_BASE_URL}{WEBHOOK_PATH}")
+
+
+def build_webhook_app(dispatcher: Dispatcher, bot: Bot) -> web.Application:
+    app = web.Application()
+    handler = QueuedRequestHandler(dispatcher, bot, secret_token=WEBHOOK_SECRET or None)
+    handler.register(app, path=WEBHOOK_PATH)
+    app["webhook_handler"] = handler
+    dispatcher.startup.register(on_webhook_startup)
+    setup_application(app, dispatcher, bot=bot)
+    return app
+
+
+def run_webhook(dispatcher: Dispatcher, bot: Bot) -> None:
+    web.run_app(build_webhook_app(dispatcher, bot), host=WEBAPP_HOST, port=WEBAPP_PORT)